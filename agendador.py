@@ -0,0 +1,269 @@
+"""
+Módulo de agendamento das chamadas ao modelo
+Controla os limites de requisições por minuto (RPM) e tokens por minuto (TPM)
+do Groq com baldes de tokens, fila por prioridade e contrapressão
+"""
+
+import os
+import re
+import time
+import asyncio
+import heapq
+import itertools
+import threading
+from typing import Optional
+
+
+# Prioridades (menor = atendido primeiro)
+PRIORIDADE_INTERATIVA = 0    # resposta ao usuário e guardrails do turno
+PRIORIDADE_LOTE = 1          # map-reduce de uma pergunta
+PRIORIDADE_SEGUNDO_PLANO = 2 # resumos construídos após o carregamento
+
+# Limites padrão da conta (podem ser alterados por variável de ambiente)
+LIMITE_RPM = int(os.getenv('NANDABOT_GROQ_RPM', '30'))
+LIMITE_TPM = int(os.getenv('NANDABOT_GROQ_TPM', '12000'))
+
+# Pedidos aguardando na fila antes de recusar novos (contrapressão)
+MAX_FILA = int(os.getenv('NANDABOT_MAX_FILA', '100'))
+
+# Tempo máximo de espera na fila (segundos)
+TIMEOUT_FILA = float(os.getenv('NANDABOT_TIMEOUT_FILA', '120'))
+
+# Intervalo máximo entre verificações de um pedido assíncrono na fila (segundos)
+INTERVALO_ASYNC = 0.05
+
+
+class FilaCheiaError(RuntimeError):
+    """A fila de chamadas ao modelo está cheia ou o tempo de espera esgotou."""
+
+
+class BaldeTokens:
+    """
+    Balde de tokens com reposição contínua.
+
+    Args:
+        capacidade: Quantidade máxima acumulada (limite por minuto)
+        por_segundo: Reposição por segundo
+    """
+
+    def __init__(self, capacidade: float, por_segundo: float):
+        self.capacidade = capacidade
+        self.por_segundo = por_segundo
+        self.disponivel = capacidade
+        self.atualizado = time.monotonic()
+
+    def _repor(self, agora: float):
+        self.disponivel = min(self.capacidade, self.disponivel + (agora - self.atualizado) * self.por_segundo)
+        self.atualizado = agora
+
+    def espera(self, quantidade: float, agora: float) -> float:
+        """Segundos até haver `quantidade` disponível (0 se já houver)."""
+        self._repor(agora)
+        # Pedidos maiores que a capacidade são atendidos quando o balde estiver cheio
+        quantidade = min(quantidade, self.capacidade)
+        if self.disponivel >= quantidade:
+            return 0.0
+        return (quantidade - self.disponivel) / self.por_segundo
+
+    def consumir(self, quantidade: float, agora: float):
+        self._repor(agora)
+        self.disponivel -= quantidade
+
+    def limitar(self, restante: float, agora: float):
+        """Ajusta o saldo ao valor informado pelo servidor, se for menor."""
+        self._repor(agora)
+        self.disponivel = min(self.disponivel, restante)
+
+
+def converter_duracao(valor: str) -> Optional[float]:
+    """
+    Converte durações dos cabeçalhos do Groq ("1m2.5s", "450ms", "7.66s", "3") em segundos.
+
+    Returns:
+        Optional[float]: Segundos ou None se o formato for desconhecido
+    """
+    if valor is None:
+        return None
+    valor = valor.strip()
+    try:
+        return float(valor)
+    except ValueError:
+        pass
+
+    partes = re.findall(r'(\d+(?:\.\d+)?)(ms|h|m|s)', valor)
+    if not partes:
+        return None
+    fatores = {'h': 3600.0, 'm': 60.0, 's': 1.0, 'ms': 0.001}
+    return sum(float(numero) * fatores[unidade] for numero, unidade in partes)
+
+
+class Agendador:
+    """
+    Agendador central das chamadas ao modelo.
+
+    Cada chamada informa uma estimativa de tokens e uma prioridade; a chamada
+    só é liberada quando é a primeira da fila e há saldo de requisições e
+    tokens. Após a chamada, o uso real corrige a estimativa, e os cabeçalhos
+    de limite do servidor ajustam os saldos.
+
+    Args:
+        rpm: Requisições por minuto
+        tpm: Tokens por minuto
+        max_fila: Tamanho máximo da fila (contrapressão)
+    """
+
+    def __init__(self, rpm: int = LIMITE_RPM, tpm: int = LIMITE_TPM, max_fila: int = MAX_FILA):
+        self.requisicoes = BaldeTokens(rpm, rpm / 60.0)
+        self.tokens = BaldeTokens(tpm, tpm / 60.0)
+        self.max_fila = max_fila
+        self.pausado_ate = 0.0
+
+        self._condicao = threading.Condition()
+        self._fila = []
+        self._sequencia = itertools.count()
+
+    def _entrar_na_fila(self, prioridade: int):
+        """Coloca um pedido na fila (chamar com a trava adquirida)."""
+        if len(self._fila) >= self.max_fila:
+            raise FilaCheiaError(f"Fila de chamadas ao modelo cheia ({len(self._fila)} pedidos). Tente novamente em instantes.")
+        pedido = (prioridade, next(self._sequencia))
+        heapq.heappush(self._fila, pedido)
+        return pedido
+
+    def _sair_da_fila(self, pedido):
+        """Remove o pedido da fila e acorda os demais (chamar com a trava adquirida)."""
+        self._fila.remove(pedido)
+        heapq.heapify(self._fila)
+        self._condicao.notify_all()
+
+    def _tentar(self, pedido, tokens_estimados: int, agora: float) -> float:
+        """
+        Libera o pedido se for a vez dele e houver saldo (chamar com a trava adquirida).
+
+        Returns:
+            float: 0 se liberado, senão segundos até a próxima verificação
+        """
+        if self._fila[0] != pedido:
+            return float('inf')
+        espera = max(
+            self.pausado_ate - agora,
+            self.requisicoes.espera(1, agora),
+            self.tokens.espera(tokens_estimados, agora),
+        )
+        if espera <= 0:
+            self.requisicoes.consumir(1, agora)
+            self.tokens.consumir(tokens_estimados, agora)
+            return 0.0
+        return espera
+
+    def adquirir(self, tokens_estimados: int, prioridade: int = PRIORIDADE_INTERATIVA,
+                 timeout: float = TIMEOUT_FILA):
+        """
+        Aguarda a vez e o saldo para uma chamada.
+
+        Args:
+            tokens_estimados: Tokens previstos (entrada + saída)
+            prioridade: Prioridade da chamada (menor = antes)
+            timeout: Tempo máximo de espera em segundos
+
+        Raises:
+            FilaCheiaError: Se a fila estiver cheia ou o tempo de espera esgotar
+        """
+        limite = time.monotonic() + timeout
+        with self._condicao:
+            pedido = self._entrar_na_fila(prioridade)
+            try:
+                while True:
+                    agora = time.monotonic()
+                    espera = self._tentar(pedido, tokens_estimados, agora)
+                    if espera == 0:
+                        return
+                    if agora >= limite:
+                        raise FilaCheiaError("Tempo de espera por capacidade do modelo esgotado.")
+                    self._condicao.wait(min(espera, limite - agora))
+            finally:
+                self._sair_da_fila(pedido)
+
+    async def adquirir_async(self, tokens_estimados: int, prioridade: int = PRIORIDADE_INTERATIVA,
+                             timeout: float = TIMEOUT_FILA):
+        """
+        Versão assíncrona de `adquirir`: espera com asyncio.sleep, sem bloquear o loop.
+
+        Divide a mesma fila com as chamadas síncronas; como o loop não recebe os
+        avisos da Condition, o pedido é reavaliado a cada INTERVALO_ASYNC segundos.
+        """
+        limite = time.monotonic() + timeout
+        with self._condicao:
+            pedido = self._entrar_na_fila(prioridade)
+        try:
+            while True:
+                with self._condicao:
+                    agora = time.monotonic()
+                    espera = self._tentar(pedido, tokens_estimados, agora)
+                if espera == 0:
+                    return
+                if agora >= limite:
+                    raise FilaCheiaError("Tempo de espera por capacidade do modelo esgotado.")
+                await asyncio.sleep(min(espera, limite - agora, INTERVALO_ASYNC))
+        finally:
+            with self._condicao:
+                self._sair_da_fila(pedido)
+
+    def registrar_uso(self, tokens_estimados: int, tokens_reais: Optional[int]):
+        """Corrige o saldo de tokens com o uso real informado pela resposta."""
+        if tokens_reais is None:
+            return
+        with self._condicao:
+            self.tokens.consumir(tokens_reais - tokens_estimados, time.monotonic())
+            self._condicao.notify_all()
+
+    def pausar(self, segundos: float):
+        """Suspende todas as chamadas por alguns segundos (ex.: após um 429)."""
+        with self._condicao:
+            self.pausado_ate = max(self.pausado_ate, time.monotonic() + segundos)
+            self._condicao.notify_all()
+
+    def atualizar_de_cabecalhos(self, cabecalhos):
+        """
+        Ajusta os saldos a partir dos cabeçalhos de limite do Groq.
+
+        x-ratelimit-limit-tokens / x-ratelimit-remaining-tokens referem-se ao
+        limite por minuto de tokens; retry-after (em respostas 429) pausa a fila.
+
+        Args:
+            cabecalhos: Cabeçalhos HTTP da resposta (mapeamento)
+        """
+        agora = time.monotonic()
+        with self._condicao:
+            limite = cabecalhos.get('x-ratelimit-limit-tokens')
+            if limite and limite.isdigit() and int(limite) > 0:
+                self.tokens.capacidade = int(limite)
+                self.tokens.por_segundo = int(limite) / 60.0
+
+            restante = cabecalhos.get('x-ratelimit-remaining-tokens')
+            if restante and restante.isdigit():
+                self.tokens.limitar(int(restante), agora)
+
+            espera = converter_duracao(cabecalhos.get('retry-after'))
+            if espera:
+                self.pausado_ate = max(self.pausado_ate, agora + espera)
+
+            self._condicao.notify_all()
+
+    @property
+    def tamanho_fila(self) -> int:
+        return len(self._fila)
+
+
+# Uma instância por modelo, compartilhada por todo o processo (todas as sessões):
+# o Groq aplica os limites de RPM/TPM separadamente a cada modelo
+_agendadores = {}
+_trava_agendadores = threading.Lock()
+
+
+def obter_agendador(modelo: str) -> Agendador:
+    """Agendador do modelo (criado na primeira chamada)."""
+    with _trava_agendadores:
+        if modelo not in _agendadores:
+            _agendadores[modelo] = Agendador()
+        return _agendadores[modelo]
@@ -0,0 +1,476 @@
+"""
+API HTTP assíncrona do NandaBot
+Serve muitas conversas em um único processo: as chamadas ao modelo são
+assíncronas e a extração de documentos roda em pools limitados (processos
+para PDFs, threads para sites e vídeos)
+
+Uso:
+    python api.py --porta 8000
+
+Rotas:
+    POST   /sessoes                        cria uma sessão
+    GET    /sessoes/{id}                   estado da sessão
+    DELETE /sessoes/{id}                   encerra a sessão
+    POST   /sessoes/{id}/documento         carrega um documento (JSON ou PDF no corpo)
+    POST   /sessoes/{id}/perguntas         faz uma pergunta ("stream": true para NDJSON)
+    GET    /saude                          estado do servidor
+    GET    /estatisticas                   latência, tokens e custo por estágio
+    GET    /metricas                       métricas no formato do Prometheus (NANDABOT_METRICAS=1)
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import tempfile
+import multiprocessing
+from urllib.parse import urlparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+from aiohttp import web
+from bot import resposta_bot_async, transmitir_resposta_bot, MAX_CARACTERES_CONTEXTO
+from guardrails import sanitizar_entrada_usuario, validar_conteudo_entrada_async, validar_resposta_saida_async
+from indice import IndiceSecoes
+from armazenamento import armazenar_documento, DocumentoEmDisco, ReservaMemoria
+from lote import carregar_fonte, detectar_tipo, LIMITES_WORKERS
+from resumos import ConstrucaoResumos, RESUMOS_ATIVOS, precisa_resumos
+from roteamento import roteador
+from agendador import FilaCheiaError
+from seguranca import MAX_FILE_SIZE
+from metricas import exportar_prometheus
+
+
+# Sessões simultâneas e tempo de inatividade até a sessão expirar (segundos)
+MAX_SESSOES = int(os.getenv('NANDABOT_MAX_SESSOES', '1000'))
+TTL_SESSAO = float(os.getenv('NANDABOT_TTL_SESSAO', '3600'))
+
+# Processos para extração de PDFs (CPU) e threads para sites/vídeos (rede)
+PROCESSOS_PDF = int(os.getenv('NANDABOT_PROCESSOS_PDF', str(min(4, os.cpu_count() or 1))))
+THREADS_CARGA = int(os.getenv('NANDABOT_THREADS_CARGA', str(4 * (LIMITES_WORKERS['site'] + LIMITES_WORKERS['youtube']))))
+
+# Páginas visitadas no máximo por um site carregado pela API
+MAX_PAGINAS = int(os.getenv('NANDABOT_MAX_PAGINAS_API', '50'))
+
+TIPO_NDJSON = 'application/x-ndjson'
+
+# Respostas em trechos: o texto é moderado em blocos de pelo menos este
+# tamanho (cortados em parágrafos ou frases) antes de ser enviado ao cliente
+TAMANHO_BLOCO_MODERACAO = int(os.getenv('NANDABOT_BLOCO_MODERACAO', '600'))
+FIM_DE_FRASE = re.compile(r'[.!?:;]\s')
+
+
+class Sessao:
+    """
+    Estado de uma conversa: documento, índice, resumos e histórico.
+
+    As perguntas de uma mesma sessão são atendidas em ordem (trava por sessão);
+    sessões diferentes são atendidas em paralelo.
+    """
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.documento = None  # str ou DocumentoEmDisco (acima do orçamento de memória)
+        self.reserva: Optional[ReservaMemoria] = None  # reserva do documento em memória
+        self.tipo: Optional[str] = None
+        self.origem: Optional[str] = None
+        self.indice: Optional[IndiceSecoes] = None
+        self.resumos: Optional[ConstrucaoResumos] = None
+        self.mensagens = []
+        self.usada = time.monotonic()
+        self.trava = asyncio.Lock()
+
+    @property
+    def arvore(self):
+        return self.resumos.arvore if self.resumos else None
+
+    def encerrar(self):
+        """Interrompe a construção dos resumos do documento atual (sessão encerrada ou documento trocado)."""
+        if self.resumos:
+            self.resumos.cancelar()
+
+    def para_dict(self) -> dict:
+        return {
+            'sessao': self.id,
+            'tipo': self.tipo,
+            'origem': self.origem,
+            'caracteres': len(self.documento) if self.documento else 0,
+            'em_disco': isinstance(self.documento, DocumentoEmDisco),
+            'mensagens': len(self.mensagens),
+            'resumos_prontos': bool(self.resumos and self.resumos.pronta),
+        }
+
+
+def _erro(status: int, mensagem: str, **cabecalhos) -> web.Response:
+    return web.json_response({'erro': mensagem}, status=status, headers=cabecalhos or None)
+
+
+def _sessao(request) -> Sessao:
+    sessao = request.app['sessoes'].get(request.match_info['id'])
+    if sessao is None:
+        raise web.HTTPNotFound(text=json.dumps({'erro': 'Sessão não encontrada'}), content_type='application/json')
+    sessao.usada = time.monotonic()
+    return sessao
+
+
+async def criar_sessao(request):
+    sessoes = request.app['sessoes']
+    if len(sessoes) >= MAX_SESSOES:
+        return _erro(503, 'Limite de sessões atingido. Tente novamente mais tarde.', **{'Retry-After': '60'})
+    sessao = Sessao()
+    sessoes[sessao.id] = sessao
+    return web.json_response(sessao.para_dict(), status=201)
+
+
+async def ver_sessao(request):
+    return web.json_response(_sessao(request).para_dict())
+
+
+async def encerrar_sessao(request):
+    sessao = _sessao(request)
+    del request.app['sessoes'][sessao.id]
+    sessao.encerrar()
+    return web.json_response({'sessao': sessao.id, 'encerrada': True})
+
+
+async def _receber_pdf(request) -> str:
+    """Grava o PDF enviado no corpo em um arquivo temporário, respeitando MAX_FILE_SIZE."""
+    fd, caminho = tempfile.mkstemp(suffix='.pdf')
+    tamanho = 0
+    try:
+        with os.fdopen(fd, 'wb') as arquivo:
+            async for parte in request.content.iter_chunked(64 * 1024):
+                tamanho += len(parte)
+                if tamanho > MAX_FILE_SIZE:
+                    raise web.HTTPRequestEntityTooLarge(max_size=MAX_FILE_SIZE, actual_size=tamanho)
+                arquivo.write(parte)
+    except BaseException:
+        os.unlink(caminho)
+        raise
+    return caminho
+
+
+async def carregar_documento(request):
+    """
+    Carrega o documento da sessão.
+
+    Corpo JSON: {"origem": "https://...", "tipo": "site|youtube" (opcional), "max_paginas": 10}
+    ou o próprio PDF com Content-Type: application/pdf.
+
+    No JSON só são aceitas URLs http(s): caminhos locais leriam arquivos do
+    próprio servidor. PDFs são aceitos apenas no corpo da requisição.
+    """
+    sessao = _sessao(request)
+    temporario = None
+
+    if request.content_type == 'application/pdf':
+        temporario = await _receber_pdf(request)
+        fonte = {'tipo': 'pdf', 'origem': temporario}
+    else:
+        try:
+            dados = await request.json()
+        except json.JSONDecodeError:
+            return _erro(400, 'Corpo JSON inválido')
+        if not isinstance(dados, dict):
+            return _erro(400, 'O corpo JSON deve ser um objeto')
+        origem = dados.get('origem')
+        if not isinstance(origem, str) or not origem.strip():
+            return _erro(400, 'Informe a "origem" do documento')
+        origem = origem.strip()
+        url = urlparse(origem)
+        if url.scheme not in ('http', 'https') or not url.netloc:
+            return _erro(400, 'A "origem" deve ser uma URL http(s)')
+        tipo = dados.get('tipo') or detectar_tipo(origem)
+        if tipo == 'pdf':
+            return _erro(400, 'Envie o PDF no corpo da requisição, com Content-Type: application/pdf')
+        if tipo not in ('site', 'youtube'):
+            return _erro(400, f'Tipo de documento não suportado pela API: {tipo}')
+        max_paginas = dados.get('max_paginas', 20)
+        if isinstance(max_paginas, bool) or not isinstance(max_paginas, int) or not 1 <= max_paginas <= MAX_PAGINAS:
+            return _erro(400, f'"max_paginas" deve ser um inteiro entre 1 e {MAX_PAGINAS}')
+        fonte = {'tipo': tipo, 'origem': origem, 'max_paginas': max_paginas}
+
+    loop = asyncio.get_running_loop()
+    pool = request.app['pool_pdf'] if fonte['tipo'] == 'pdf' else request.app['pool_carga']
+    try:
+        resultado = await loop.run_in_executor(pool, carregar_fonte, fonte)
+    finally:
+        if temporario:
+            os.unlink(temporario)
+
+    if not resultado['documento']:
+        return _erro(422, resultado['erro'] or 'Nenhum conteúdo carregado')
+
+    # Documentos acima do orçamento de memória ficam em disco, lidos sob demanda
+    documento, reserva = await asyncio.to_thread(armazenar_documento, resultado.pop('documento'))
+    indice = None
+    if len(documento) > MAX_CARACTERES_CONTEXTO:
+        # Índice BM25 montado uma única vez, fora do loop
+        indice = await asyncio.to_thread(IndiceSecoes, documento)
+
+    async with sessao.trava:
+        sessao.encerrar()
+        sessao.documento = documento
+        sessao.reserva = reserva
+        sessao.tipo = fonte['tipo']
+        sessao.origem = 'upload.pdf' if temporario else fonte['origem']
+        sessao.indice = indice
+        sessao.resumos = ConstrucaoResumos(documento) if RESUMOS_ATIVOS and precisa_resumos(documento) else None
+        sessao.mensagens = []
+
+    return web.json_response({**sessao.para_dict(), 'avisos': resultado['avisos'],
+                              'segundos': round(resultado['segundos'], 3)})
+
+
+def _status_erro(e: Exception) -> int:
+    return 503 if isinstance(e, FilaCheiaError) else 502
+
+
+async def perguntar(request):
+    """
+    Responde a uma pergunta da sessão.
+
+    Corpo JSON: {"pergunta": "...", "stream": false}. Com "stream": true a
+    resposta é NDJSON: eventos "trecho" à medida que o texto gerado é
+    aprovado pela moderação (em blocos de parágrafos ou frases) e, ao final,
+    "moderacao" (resultado da validação) e "fim". Se um bloco for reprovado,
+    a geração é interrompida e "moderacao" traz a resposta substituta.
+
+    A resposta só começa a ser gerada depois que a pergunta é aprovada.
+    """
+    sessao = _sessao(request)
+    if sessao.documento is None:
+        return _erro(409, 'Carregue um documento antes de perguntar')
+
+    try:
+        dados = await request.json()
+    except json.JSONDecodeError:
+        return _erro(400, 'Corpo JSON inválido')
+    if not isinstance(dados, dict):
+        return _erro(400, 'O corpo JSON deve ser um objeto')
+    pergunta = sanitizar_entrada_usuario(str(dados.get('pergunta') or ''))
+    if not pergunta:
+        return _erro(400, 'Informe a "pergunta"')
+
+    async with sessao.trava:
+        if dados.get('stream'):
+            return await _perguntar_stream(request, sessao, pergunta)
+        return await _perguntar_json(sessao, pergunta)
+
+
+async def _perguntar_json(sessao: Sessao, pergunta: str) -> web.Response:
+    tempos = {}
+    inicio = time.perf_counter()
+    sessao.mensagens.append(('user', pergunta))
+
+    # Perguntas bloqueadas não chegam ao modelo de resposta (nem gastam a cota dele)
+    seguro, motivo = await validar_conteudo_entrada_async(pergunta)
+    tempos['moderacao_entrada'] = time.perf_counter() - inicio
+    if not seguro:
+        sessao.mensagens.pop()
+        return web.json_response({'bloqueada': True, 'motivo': motivo, 'tempos': _arredondar(tempos)})
+
+    try:
+        texto = await resposta_bot_async(list(sessao.mensagens), sessao.documento,
+                                         indice=sessao.indice, arvore=sessao.arvore)
+    except Exception as e:
+        sessao.mensagens.pop()
+        status = _status_erro(e)
+        cabecalhos = {'Retry-After': '5'} if status == 503 else {}
+        return _erro(status, f'Erro ao processar: {e}', **cabecalhos)
+    tempos['resposta'] = time.perf_counter() - inicio
+
+    marca = time.perf_counter()
+    seguro_resposta, resposta_final = await validar_resposta_saida_async(texto)
+    tempos['moderacao_saida'] = time.perf_counter() - marca
+    tempos['total'] = time.perf_counter() - inicio
+
+    if seguro_resposta:
+        sessao.mensagens.append(('assistant', resposta_final))
+    else:
+        # Não adiciona resposta filtrada ao histórico
+        sessao.mensagens.pop()
+
+    return web.json_response({'bloqueada': False, 'resposta': resposta_final, 'segura': seguro_resposta,
+                              'tempos': _arredondar(tempos)})
+
+
+def _cortar_bloco(texto: str, final: bool = False) -> int:
+    """
+    Posição até onde o texto pode ser moderado e enviado (0 se ainda não há bloco completo).
+
+    O bloco termina no último parágrafo ou, sem parágrafo, na última frase
+    depois de TAMANHO_BLOCO_MODERACAO caracteres; no fim da resposta, vai até o fim.
+    """
+    if final:
+        return len(texto)
+    if len(texto) < TAMANHO_BLOCO_MODERACAO:
+        return 0
+    paragrafo = texto.rfind('\n\n', TAMANHO_BLOCO_MODERACAO // 2)
+    if paragrafo > 0:
+        return paragrafo + 2
+    frases = [m.end() for m in FIM_DE_FRASE.finditer(texto, TAMANHO_BLOCO_MODERACAO // 2)]
+    if frases:
+        return frases[-1]
+    # Texto sem pontuação: evita segurar a resposta inteira
+    return len(texto) if len(texto) >= 4 * TAMANHO_BLOCO_MODERACAO else 0
+
+
+async def _perguntar_stream(request, sessao: Sessao, pergunta: str) -> web.StreamResponse:
+    tempos = {}
+    inicio = time.perf_counter()
+    resposta = web.StreamResponse(headers={'Content-Type': TIPO_NDJSON, 'Cache-Control': 'no-cache'})
+    await resposta.prepare(request)
+
+    async def enviar(evento: dict):
+        await resposta.write((json.dumps(evento, ensure_ascii=False) + '\n').encode('utf-8'))
+
+    sessao.mensagens.append(('user', pergunta))
+
+    # Perguntas bloqueadas não chegam ao modelo de resposta (nem gastam a cota dele)
+    seguro, motivo = await validar_conteudo_entrada_async(pergunta)
+    tempos['moderacao_entrada'] = time.perf_counter() - inicio
+    if not seguro:
+        sessao.mensagens.pop()
+        await enviar({'evento': 'bloqueada', 'motivo': motivo})
+        await resposta.write_eof()
+        return resposta
+
+    gerador = transmitir_resposta_bot(list(sessao.mensagens), sessao.documento,
+                                      indice=sessao.indice, arvore=sessao.arvore)
+
+    # Cada bloco é moderado enquanto o modelo continua gerando os seguintes;
+    # os blocos são enviados em ordem, só depois de aprovados
+    enviados = []
+    pendentes = []  # (bloco, tarefa da moderação)
+    reprovada = None
+
+    async def liberar(esperar: bool) -> bool:
+        """Envia os blocos já aprovados (todos, se `esperar`); False se um bloco for reprovado."""
+        nonlocal reprovada
+        while pendentes and (esperar or pendentes[0][1].done()):
+            bloco, tarefa = pendentes.pop(0)
+            seguro_bloco, substituta = await tarefa
+            if not seguro_bloco:
+                reprovada = substituta
+                return False
+            if not enviados:
+                tempos['primeiro_trecho'] = time.perf_counter() - inicio
+            enviados.append(bloco)
+            await enviar({'evento': 'trecho', 'texto': bloco})
+        return True
+
+    texto = ''
+    try:
+        terminou = False
+        async for trecho in gerador:
+            texto += trecho
+            corte = _cortar_bloco(texto)
+            if corte:
+                pendentes.append((texto[:corte], asyncio.create_task(validar_resposta_saida_async(texto[:corte]))))
+                texto = texto[corte:]
+            if not await liberar(esperar=False):
+                break
+        else:
+            terminou = True
+        if terminou:
+            tempos['resposta'] = time.perf_counter() - inicio
+            if texto.strip():
+                pendentes.append((texto, asyncio.create_task(validar_resposta_saida_async(texto))))
+            marca = time.perf_counter()
+            await liberar(esperar=True)
+            tempos['moderacao_saida'] = time.perf_counter() - marca
+    except Exception as e:
+        sessao.mensagens.pop()
+        await enviar({'evento': 'erro', 'mensagem': f'Erro ao processar: {e}', 'status': _status_erro(e)})
+        return resposta
+    finally:
+        for _, tarefa in pendentes:
+            tarefa.cancel()
+        await gerador.aclose()
+    tempos['total'] = time.perf_counter() - inicio
+
+    if reprovada is None:
+        sessao.mensagens.append(('assistant', ''.join(enviados)))
+    else:
+        # Não adiciona resposta filtrada ao histórico
+        sessao.mensagens.pop()
+
+    await enviar({'evento': 'moderacao', 'segura': reprovada is None, 'resposta': reprovada})
+    await enviar({'evento': 'fim', 'tempos': _arredondar(tempos)})
+    await resposta.write_eof()
+    return resposta
+
+
+def _arredondar(tempos: dict) -> dict:
+    return {estagio: round(segundos, 3) for estagio, segundos in tempos.items()}
+
+
+async def saude(request):
+    return web.json_response({'status': 'ok', 'sessoes': len(request.app['sessoes'])})
+
+
+async def estatisticas(request):
+    return web.json_response(roteador.relatorio())
+
+
+async def metricas(request):
+    return web.Response(text=exportar_prometheus(), content_type='text/plain', charset='utf-8')
+
+
+async def _expirar_sessoes(app):
+    """Remove periodicamente as sessões inativas há mais de TTL_SESSAO segundos."""
+    while True:
+        await asyncio.sleep(min(60.0, TTL_SESSAO))
+        limite = time.monotonic() - TTL_SESSAO
+        for id_sessao in [i for i, s in app['sessoes'].items() if s.usada < limite]:
+            sessao = app['sessoes'].pop(id_sessao, None)
+            if sessao is not None:
+                sessao.encerrar()
+
+
+async def _iniciar(app):
+    app['expiracao'] = asyncio.create_task(_expirar_sessoes(app))
+
+
+async def _encerrar(app):
+    app['expiracao'].cancel()
+    app['pool_pdf'].shutdown(wait=False, cancel_futures=True)
+    app['pool_carga'].shutdown(wait=False, cancel_futures=True)
+
+
+def criar_app() -> web.Application:
+    """Monta a aplicação aiohttp com as rotas, os pools de extração e o armazenamento de sessões."""
+    app = web.Application(client_max_size=MAX_FILE_SIZE)
+    app['sessoes'] = {}
+    # spawn: o processo principal já tem threads (agendador, resumos) quando o pool é usado
+    app['pool_pdf'] = ProcessPoolExecutor(max_workers=PROCESSOS_PDF, mp_context=multiprocessing.get_context('spawn'))
+    app['pool_carga'] = ThreadPoolExecutor(max_workers=THREADS_CARGA, thread_name_prefix='carga')
+
+    app.router.add_post('/sessoes', criar_sessao)
+    app.router.add_get('/sessoes/{id}', ver_sessao)
+    app.router.add_delete('/sessoes/{id}', encerrar_sessao)
+    app.router.add_post('/sessoes/{id}/documento', carregar_documento)
+    app.router.add_post('/sessoes/{id}/perguntas', perguntar)
+    app.router.add_get('/saude', saude)
+    app.router.add_get('/estatisticas', estatisticas)
+    app.router.add_get('/metricas', metricas)
+
+    app.on_startup.append(_iniciar)
+    app.on_cleanup.append(_encerrar)
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='API HTTP assíncrona do NandaBot.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8000)
+    args = parser.parse_args(argv)
+
+    web.run_app(criar_app(), host=args.host, port=args.porta)
+
+
+if __name__ == "__main__":
+    main()
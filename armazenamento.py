@@ -0,0 +1,358 @@
+"""
+Módulo de armazenamento dos documentos carregados
+Aplica um orçamento de memória por sessão e por processo: documentos que não
+cabem no orçamento são gravados em disco, em páginas comprimidas (zlib) de um
+arquivo mapeado em memória (mmap), e lidos sob demanda página a página
+
+Documentos dentro do orçamento continuam sendo strings comuns; o espaço que
+ocupam fica em uma ReservaMemoria guardada junto com o documento e é devolvido
+ao orçamento do processo quando a sessão a descarta.
+
+PDFs grandes podem ir para o disco durante a extração (ver
+carregadores.carregar_pdf_arquivo): as páginas passam por PaginasComprimidas
+e o documento em disco é gravado página a página, sem montar a string inteira.
+"""
+
+import os
+import sys
+import mmap
+import zlib
+import bisect
+import hashlib
+import tempfile
+import threading
+import weakref
+from array import array
+from collections import OrderedDict
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+from indice import PADRAO_SECAO, dividir_secoes
+
+
+MB = 1024 * 1024
+
+# Maior documento mantido em memória por uma sessão (acima disso vai para o disco)
+ORCAMENTO_SESSAO = int(float(os.getenv('NANDABOT_MEMORIA_SESSAO_MB', '16')) * MB)
+
+# Memória total dos documentos mantidos em memória por todas as sessões do processo
+ORCAMENTO_PROCESSO = int(float(os.getenv('NANDABOT_MEMORIA_PROCESSO_MB', '256')) * MB)
+
+# Diretório dos arquivos de páginas (removidos quando o documento é descartado)
+DIRETORIO_PAGINAS = os.getenv('NANDABOT_PAGINAS_DIR') or None
+
+# Tamanho máximo de uma página em disco (caracteres) e nível de compressão (zlib)
+TAMANHO_PAGINA = 16_000
+NIVEL_COMPRESSAO = 1  # rápido: a carga não espera a compressão
+
+# Páginas descomprimidas mantidas em memória por documento
+CACHE_PAGINAS = 8
+
+
+class OrcamentoMemoria:
+    """
+    Orçamento de memória compartilhado pelas sessões do processo.
+
+    Args:
+        limite: Bytes disponíveis para documentos em memória
+    """
+
+    def __init__(self, limite: int = ORCAMENTO_PROCESSO):
+        self.limite = limite
+        self.em_uso = 0
+        self._trava = threading.Lock()
+
+    def reservar(self, tamanho: int) -> bool:
+        """Reserva `tamanho` bytes; retorna False (sem reservar) se o orçamento não comportar."""
+        with self._trava:
+            if self.em_uso + tamanho > self.limite:
+                return False
+            self.em_uso += tamanho
+            return True
+
+    def liberar(self, tamanho: int):
+        with self._trava:
+            self.em_uso = max(0, self.em_uso - tamanho)
+
+
+# Instância compartilhada por todo o processo
+orcamento_processo = OrcamentoMemoria()
+
+
+class ReservaMemoria:
+    """
+    Bytes de um documento em memória reservados no orçamento do processo.
+
+    Guardada junto com o documento (ex.: na fonte da sessão); a reserva é
+    devolvida ao orçamento quando o objeto é coletado (sessão encerrada ou
+    documento trocado).
+
+    Args:
+        tamanho: Bytes reservados
+        orcamento: Orçamento onde a reserva foi feita
+    """
+
+    def __init__(self, tamanho: int, orcamento: OrcamentoMemoria):
+        self.tamanho = tamanho
+        weakref.finalize(self, orcamento.liberar, tamanho)
+
+
+class PaginasComprimidas:
+    """
+    Páginas de texto guardadas comprimidas em um arquivo temporário, na ordem.
+
+    Usada entre as duas passagens da redução de um PDF (ver
+    reducao.reduzir_paginas_em_fluxo): só a página atual fica em memória.
+    Pode ser percorrida várias vezes; o arquivo é removido ao fechar o processo
+    ou quando o objeto é coletado.
+
+    `tamanho` estima os bytes que as páginas ocupariam juntas em uma única
+    string, separadas por quebra de linha (a mesma medida de sys.getsizeof
+    usada pelo orçamento de memória).
+    """
+
+    def __init__(self, diretorio: Optional[str] = DIRETORIO_PAGINAS):
+        self._arquivo = tempfile.TemporaryFile(dir=diretorio, prefix='nandabot-')
+        self._deslocamentos = array('Q', [0])
+        self.caracteres = 0
+        self._maior = 0
+
+    def adicionar(self, pagina: str):
+        self._arquivo.seek(self._deslocamentos[-1])
+        self._arquivo.write(zlib.compress(pagina.encode('utf-8'), NIVEL_COMPRESSAO))
+        self._deslocamentos.append(self._arquivo.tell())
+        self.caracteres += len(pagina)
+        if pagina and not pagina.isascii():
+            self._maior = max(self._maior, ord(max(pagina)))
+
+    @property
+    def tamanho(self) -> int:
+        # A str do CPython usa 1, 2 ou 4 bytes por caractere, conforme o maior caractere
+        largura = 1 if self._maior < 0x100 else 2 if self._maior < 0x10000 else 4
+        caracteres = self.caracteres + max(0, len(self) - 1)
+        return sys.getsizeof(chr(self._maior)) + (caracteres - 1) * largura
+
+    def __len__(self):
+        return len(self._deslocamentos) - 1
+
+    def __iter__(self) -> Iterator[str]:
+        for inicio, fim in zip(self._deslocamentos, self._deslocamentos[1:]):
+            self._arquivo.seek(inicio)
+            yield zlib.decompress(self._arquivo.read(fim - inicio)).decode('utf-8')
+
+    def fechar(self):
+        self._arquivo.close()
+
+
+def _paginas(documento: str, tamanho_pagina: int = TAMANHO_PAGINA) -> Iterator[str]:
+    """
+    Divide o documento em páginas de armazenamento.
+
+    As páginas começam nos marcadores de seção (=== PÁGINA/TRECHO/FONTE ===);
+    trechos maiores que `tamanho_pagina` são cortados na última quebra de
+    linha antes do limite. Juntas, as páginas reproduzem o documento exato.
+    """
+    inicios = [marcador.start() for marcador in PADRAO_SECAO.finditer(documento) if marcador.start() > 0]
+    for inicio, fim in zip([0] + inicios, inicios + [len(documento)]):
+        while fim - inicio > tamanho_pagina:
+            corte = documento.rfind('\n', inicio + 1, inicio + tamanho_pagina)
+            corte = corte if corte > inicio else inicio + tamanho_pagina
+            yield documento[inicio:corte]
+            inicio = corte
+        if fim > inicio:
+            yield documento[inicio:fim]
+
+
+def _paginas_partes(partes: Iterable[str], tamanho_pagina: int = TAMANHO_PAGINA) -> Iterator[str]:
+    """Páginas de armazenamento de um documento recebido em partes (ex.: página a página)."""
+    acumulado = []
+    tamanho = 0
+    for parte in partes:
+        acumulado.append(parte)
+        tamanho += len(parte)
+        if tamanho >= tamanho_pagina:
+            yield from _paginas(''.join(acumulado), tamanho_pagina)
+            acumulado, tamanho = [], 0
+    if acumulado:
+        yield from _paginas(''.join(acumulado), tamanho_pagina)
+
+
+def _remover_arquivo(mapa: mmap.mmap, caminho: str):
+    mapa.close()
+    try:
+        os.unlink(caminho)
+    except OSError:
+        pass
+
+
+class SecoesEmDisco:
+    """
+    Seções (cabecalho, texto) de um DocumentoEmDisco, lidas sob demanda.
+
+    Tem a mesma interface da lista devolvida por indice.dividir_secoes
+    (len, índice e iteração), sem manter o documento inteiro em memória.
+    """
+
+    def __init__(self, documento: 'DocumentoEmDisco'):
+        self.documento = documento
+        self._pagina_atual = (-1, [])
+
+    def __len__(self):
+        return self.documento._secoes_acumuladas[-1] if self.documento.paginas else 0
+
+    def _secoes_da_pagina(self, pagina: int) -> List[Tuple[str, str]]:
+        numero, secoes = self._pagina_atual
+        if numero != pagina:
+            secoes = dividir_secoes(self.documento.pagina(pagina))
+            self._pagina_atual = (pagina, secoes)
+        return secoes
+
+    def __getitem__(self, i: int) -> Tuple[str, str]:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        acumuladas = self.documento._secoes_acumuladas
+        pagina = bisect.bisect_right(acumuladas, i)
+        anteriores = acumuladas[pagina - 1] if pagina else 0
+        return self._secoes_da_pagina(pagina)[i - anteriores]
+
+    def __iter__(self):
+        for pagina in range(self.documento.paginas):
+            yield from dividir_secoes(self.documento.pagina(pagina))
+
+
+class DocumentoEmDisco:
+    """
+    Documento gravado em disco em páginas comprimidas, lido sob demanda.
+
+    Aceito no lugar da string do documento por bot, índice e resumos:
+    `len()` é a quantidade de caracteres, fatias (`documento[:n]`) leem só as
+    páginas necessárias e `indice.dividir_secoes` devolve as seções sob
+    demanda. `str(documento)` reconstrói o texto inteiro em memória.
+    Diferente da string, uma seção nunca atravessa páginas: as partes de
+    textos sem marcadores (PDFs) são cortadas também no limite das páginas.
+
+    Args:
+        documento: Texto completo ou suas partes, em ordem (gravadas à medida que chegam)
+        diretorio: Diretório do arquivo de páginas
+        tamanho_pagina: Tamanho máximo de uma página (caracteres)
+
+    Atributos:
+        caminho: Arquivo das páginas (removido quando o objeto é coletado)
+        paginas: Quantidade de páginas
+        bytes_em_disco: Tamanho do arquivo (comprimido)
+        sha256: Hash do texto (o mesmo da string original, usado pelo cache de resumos)
+    """
+
+    def __init__(self, documento: Union[str, Iterable[str]], diretorio: Optional[str] = DIRETORIO_PAGINAS,
+                 tamanho_pagina: int = TAMANHO_PAGINA):
+        self._deslocamentos = array('Q', [0])
+        self._inicios = array('Q', [0])
+        self._secoes_acumuladas = array('Q')
+        hash_texto = hashlib.sha256()
+
+        with tempfile.NamedTemporaryFile(dir=diretorio, prefix='nandabot-', suffix='.paginas',
+                                         delete=False) as arquivo:
+            self.caminho = arquivo.name
+            secoes = 0
+            paginas = (_paginas(documento, tamanho_pagina) if isinstance(documento, str)
+                       else _paginas_partes(documento, tamanho_pagina))
+            for pagina in paginas:
+                dados = pagina.encode('utf-8')
+                hash_texto.update(dados)
+                arquivo.write(zlib.compress(dados, NIVEL_COMPRESSAO))
+                self._deslocamentos.append(arquivo.tell())
+                self._inicios.append(self._inicios[-1] + len(pagina))
+                secoes += len(dividir_secoes(pagina))
+                self._secoes_acumuladas.append(secoes)
+
+        self.paginas = len(self._deslocamentos) - 1
+        self.bytes_em_disco = self._deslocamentos[-1]
+        self.sha256 = hash_texto.hexdigest()
+        with open(self.caminho, 'rb') as arquivo:
+            self._mapa = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+        self._cache = OrderedDict()
+        self._trava = threading.Lock()
+        weakref.finalize(self, _remover_arquivo, self._mapa, self.caminho)
+
+    def __len__(self):
+        return self._inicios[-1]
+
+    def __repr__(self):
+        return (f"<DocumentoEmDisco {len(self)} caracteres, {self.paginas} páginas, "
+                f"{self.bytes_em_disco} bytes em {self.caminho}>")
+
+    def pagina(self, numero: int) -> str:
+        """Texto da página (descomprimido sob demanda; as mais recentes ficam em cache)."""
+        with self._trava:
+            texto = self._cache.get(numero)
+            if texto is not None:
+                self._cache.move_to_end(numero)
+                return texto
+        inicio, fim = self._deslocamentos[numero], self._deslocamentos[numero + 1]
+        texto = zlib.decompress(self._mapa[inicio:fim]).decode('utf-8')
+        with self._trava:
+            self._cache[numero] = texto
+            if len(self._cache) > CACHE_PAGINAS:
+                self._cache.popitem(last=False)
+        return texto
+
+    def secoes(self) -> SecoesEmDisco:
+        """Seções do documento, lidas sob demanda (ver indice.dividir_secoes)."""
+        return SecoesEmDisco(self)
+
+    def __getitem__(self, fatia: slice) -> str:
+        if not isinstance(fatia, slice) or fatia.step not in (None, 1):
+            raise TypeError("DocumentoEmDisco aceita apenas fatias contínuas (documento[inicio:fim])")
+        inicio, fim, _ = fatia.indices(len(self))
+        if fim <= inicio:
+            return ''
+        primeira = bisect.bisect_right(self._inicios, inicio) - 1
+        partes = []
+        for numero in range(primeira, self.paginas):
+            deslocamento = self._inicios[numero]
+            if deslocamento >= fim:
+                break
+            partes.append(self.pagina(numero)[max(0, inicio - deslocamento):fim - deslocamento])
+        return ''.join(partes)
+
+    def __str__(self):
+        return ''.join(self.pagina(numero) for numero in range(self.paginas))
+
+
+def armazenar_documento(documento: str, orcamento_sessao: int = ORCAMENTO_SESSAO,
+                        orcamento: OrcamentoMemoria = orcamento_processo
+                        ) -> Tuple[Union[str, DocumentoEmDisco], Optional[ReservaMemoria]]:
+    """
+    Decide onde a sessão mantém o documento: em memória ou em disco.
+
+    Args:
+        documento: Documento carregado (um DocumentoEmDisco é mantido como está)
+        orcamento_sessao: Maior documento (bytes) mantido em memória pela sessão
+        orcamento: Orçamento de memória do processo
+
+    Returns:
+        Tuple[Union[str, DocumentoEmDisco], Optional[ReservaMemoria]]: O
+        documento em memória, com a reserva no orçamento do processo (guarde-a
+        enquanto usar o documento), ou gravado em disco, sem reserva, se não
+        couber em um dos orçamentos
+    """
+    if not documento or not isinstance(documento, str):
+        return documento, None
+
+    tamanho = sys.getsizeof(documento)
+    if tamanho <= orcamento_sessao and orcamento.reservar(tamanho):
+        return documento, ReservaMemoria(tamanho, orcamento)
+
+    try:
+        return DocumentoEmDisco(documento), None
+    except OSError as e:
+        print(f"⚠️ Aviso: Não foi possível gravar o documento em disco, mantido em memória: {e}")
+        return documento, None
+
+
+def descrever_armazenamento(documento) -> Optional[str]:
+    """Texto curto sobre o documento em disco, para exibir ao usuário (None se estiver em memória)."""
+    if not isinstance(documento, DocumentoEmDisco):
+        return None
+    return (f"💾 Documento grande mantido em disco: {documento.paginas} páginas comprimidas "
+            f"({documento.bytes_em_disco / MB:.1f} MB), lidas sob demanda")
@@ -0,0 +1,216 @@
+"""
+Módulo de backends de modelo
+Interface comum para quem executa as chamadas: o Groq (padrão) ou um servidor
+local compatível com a API do OpenAI (ex.: llama.cpp rodando um modelo
+quantizado na CPU), escolhido por estágio do turno
+
+O LangChain, o langchain_groq e o httpx só são importados na criação do
+primeiro cliente, para que menu e interface apareçam sem esperar por eles.
+"""
+
+import os
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional
+from agendador import obter_agendador
+
+if TYPE_CHECKING:
+    from langchain_core.language_models.chat_models import BaseChatModel
+
+
+# Backend padrão de todos os estágios (groq ou local), alterado com NANDABOT_BACKEND
+# ou por estágio com NANDABOT_BACKEND_<ESTAGIO>=local
+BACKEND_PADRAO = 'groq'
+
+# Servidor local compatível com /v1/chat/completions
+URL_LOCAL = os.getenv('NANDABOT_LOCAL_URL', 'http://127.0.0.1:8080/v1')
+MODELO_LOCAL = os.getenv('NANDABOT_LOCAL_MODELO', 'local')
+
+
+def _carregar_api_key() -> str:
+    """Carrega a GROQ_API_KEY do .env (diretório do script) ou do ambiente."""
+    from dotenv import load_dotenv
+
+    env_path = Path(__file__).parent / '.env'
+    load_dotenv(dotenv_path=env_path)
+
+    api_key = os.getenv('GROQ_API_KEY')
+    if not api_key:
+        raise ValueError(
+            "GROQ_API_KEY não encontrada! "
+            "Certifique-se de criar um arquivo .env com sua API key."
+        )
+
+    os.environ['GROQ_API_KEY'] = api_key
+    return api_key
+
+
+class Backend(ABC):
+    """
+    Interface dos backends de modelo.
+
+    Atributos:
+        nome: Identificador do backend (groq, local)
+        usa_agendador: Se as chamadas passam pelo agendador de limites (RPM/TPM)
+        usa_niveis: Se o modelo é escolhido pelos níveis do roteador
+    """
+
+    nome = 'base'
+    usa_agendador = False
+    usa_niveis = False
+
+    @abstractmethod
+    def chat(self, modelo: Optional[str] = None) -> 'BaseChatModel':
+        """Modelo de chat do LangChain para o nome informado."""
+
+    @abstractmethod
+    def modelo_padrao(self) -> str:
+        """Modelo usado quando o backend não segue os níveis do roteador."""
+
+    def verificar(self) -> Optional[str]:
+        """Problema de configuração do backend, ou None se estiver pronto."""
+        return None
+
+
+class BackendGroq(Backend):
+    """Groq na nuvem: um ChatGroq por modelo, com os limites informados ao agendador."""
+
+    nome = 'groq'
+    usa_agendador = True
+    usa_niveis = True
+
+    def __init__(self):
+        self._chats = {}
+        self._trava = threading.Lock()
+
+    def chat(self, modelo: Optional[str] = None) -> 'BaseChatModel':
+        """
+        Retorna a instância compartilhada do ChatGroq do modelo (criada na primeira chamada).
+
+        O cliente HTTP informa ao agendador do modelo os cabeçalhos x-ratelimit-*
+        de cada resposta; as novas tentativas ficam a cargo de modelos.invocar.
+
+        Raises:
+            ValueError: Se a GROQ_API_KEY não estiver configurada
+        """
+        modelo = modelo or self.modelo_padrao()
+        with self._trava:
+            if modelo not in self._chats:
+                import httpx
+                from langchain_groq import ChatGroq
+
+                _carregar_api_key()
+                agendador = obter_agendador(modelo)
+
+                async def registrar_async(resposta):
+                    agendador.atualizar_de_cabecalhos(resposta.headers)
+
+                self._chats[modelo] = ChatGroq(
+                    model=modelo,
+                    max_retries=0,
+                    http_client=httpx.Client(
+                        event_hooks={'response': [lambda resposta: agendador.atualizar_de_cabecalhos(resposta.headers)]}
+                    ),
+                    http_async_client=httpx.AsyncClient(event_hooks={'response': [registrar_async]}),
+                )
+            return self._chats[modelo]
+
+    def modelo_padrao(self) -> str:
+        from roteamento import NIVEIS
+        return NIVEIS['grande']['modelo']
+
+    def verificar(self) -> Optional[str]:
+        try:
+            _carregar_api_key()
+        except ValueError as e:
+            return str(e)
+        return None
+
+
+class BackendLocal(Backend):
+    """
+    Servidor local compatível com a API do OpenAI (sem rede externa nem chave).
+
+    Args:
+        url: URL base do servidor (até /v1)
+        modelo: Nome do modelo informado ao servidor
+    """
+
+    nome = 'local'
+
+    def __init__(self, url: str = URL_LOCAL, modelo: str = MODELO_LOCAL):
+        self.url = url
+        self.modelo = modelo
+        self._chat = None
+        self._trava = threading.Lock()
+
+    def chat(self, modelo: Optional[str] = None) -> 'BaseChatModel':
+        """Instância compartilhada do ChatLocal (criada na primeira chamada)."""
+        with self._trava:
+            if self._chat is None:
+                from chat_local import ChatLocal
+                self._chat = ChatLocal(url=self.url, modelo=self.modelo)
+            return self._chat
+
+    def modelo_padrao(self) -> str:
+        return self.modelo
+
+    def verificar(self) -> Optional[str]:
+        import httpx
+
+        try:
+            httpx.get(f"{self.url.rstrip('/')}/models", timeout=2.0)
+        except httpx.HTTPError as e:
+            return f"Servidor local de modelo indisponível em {self.url}: {e}"
+        return None
+
+
+_backends = {}
+_trava_backends = threading.Lock()
+
+
+def obter_backend(nome: str) -> Backend:
+    """Instância compartilhada do backend pelo nome (groq ou local)."""
+    with _trava_backends:
+        if nome not in _backends:
+            if nome == 'groq':
+                _backends[nome] = BackendGroq()
+            elif nome == 'local':
+                _backends[nome] = BackendLocal()
+            else:
+                raise ValueError(f"Backend de modelo desconhecido: {nome} (use 'groq' ou 'local')")
+        return _backends[nome]
+
+
+def backend_estagio(estagio: str) -> Backend:
+    """Backend configurado para o estágio (NANDABOT_BACKEND_<ESTAGIO> ou NANDABOT_BACKEND)."""
+    nome = os.getenv(f'NANDABOT_BACKEND_{estagio.upper()}') or os.getenv('NANDABOT_BACKEND', BACKEND_PADRAO)
+    return obter_backend(nome.strip().lower())
+
+
+def verificar_configuracao(estagios) -> List[str]:
+    """
+    Verifica os backends usados pelos estágios.
+
+    Args:
+        estagios: Estágios do turno a verificar
+
+    Returns:
+        List[str]: Problemas encontrados (vazia se tudo estiver pronto)
+    """
+    problemas = []
+    vistos = set()
+    for estagio in estagios:
+        try:
+            backend = backend_estagio(estagio)
+        except ValueError as e:
+            problemas.append(str(e))
+            continue
+        if backend.nome in vistos:
+            continue
+        vistos.add(backend.nome)
+        problema = backend.verificar()
+        if problema:
+            problemas.append(problema)
+    return problemas
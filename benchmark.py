@@ -0,0 +1,430 @@
+"""
+Benchmarks dos caminhos críticos do NandaBot
+Mede truncamento, varredura de segurança, validação e extração de PDF,
+extração de links, rastreamento de um site local, turnos completos contra
+um modelo falso determinístico (servidor_falso), sem rede externa nem cota,
+e o tempo de importação dos pontos de entrada (menu do terminal, Streamlit, API)
+
+Uso:
+    python benchmark.py --saida resultados.json
+    python benchmark.py --rapido --apenas pdf,site
+    python benchmark.py --comparar base.json
+    python benchmark.py --apenas importacao
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import functools
+import importlib.util
+import statistics
+import subprocess
+import threading
+from datetime import datetime, timezone
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, List, Optional
+
+
+# Palavras usadas nos textos sintéticos (sem termos que a varredura de segurança rejeita)
+PALAVRAS = ('documento', 'nanda', 'produto', 'preço', 'cliente', 'entrega', 'garantia', 'página', 'seção',
+            'resumo', 'contrato', 'prazo', 'valor', 'serviço', 'pedido', 'relatório', 'análise', 'dados',
+            'empresa', 'projeto', 'equipe', 'suporte', 'pagamento', 'conta', 'cadastro', 'manual')
+
+# Variação relativa da mediana considerada regressão na comparação (--comparar)
+LIMIAR_REGRESSAO = 0.10
+
+# Módulos cujo tempo de importação é medido (pontos de entrada e módulos mais usados)
+MODULOS_IMPORTACAO = ('main', 'bot', 'carregadores', 'guardrails', 'api', 'streamlit_app')
+
+
+def gerar_texto(palavras: int, semente: int = 0) -> str:
+    """Texto sintético em frases de 12 palavras (determinístico para a semente)."""
+    aleatorio = random.Random(semente)
+    frases = []
+    for _ in range(max(1, palavras // 12)):
+        frase = ' '.join(aleatorio.choice(PALAVRAS) for _ in range(12))
+        frases.append(frase.capitalize() + '.')
+    return ' '.join(frases)
+
+
+def _escapar_pdf(texto: str) -> str:
+    return texto.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def gerar_pdf(caminho: str, paginas: int = 20, linhas_por_pagina: int = 40, semente: int = 0) -> str:
+    """
+    Monta um PDF de texto simples, sem bibliotecas externas.
+
+    Args:
+        caminho: Arquivo de saída (.pdf)
+        paginas: Quantidade de páginas
+        linhas_por_pagina: Linhas de texto por página
+        semente: Semente do texto sintético
+
+    Returns:
+        str: O caminho do arquivo gerado
+    """
+    aleatorio = random.Random(semente)
+    objetos = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # páginas, preenchido depois
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    ids_paginas = []
+    for numero in range(paginas):
+        linhas = [f"Pagina {numero + 1} - Manual do produto"]
+        linhas += [' '.join(aleatorio.choice(PALAVRAS) for _ in range(10)) for _ in range(linhas_por_pagina - 1)]
+        comandos = ["BT /F1 10 Tf 12 TL 50 780 Td"]
+        comandos += [f"({_escapar_pdf(linha)}) '" for linha in linhas]
+        comandos.append("ET")
+        conteudo = '\n'.join(comandos).encode('cp1252', errors='replace')
+
+        objetos.append(b"<< /Length %d >>\nstream\n" % len(conteudo) + conteudo + b"\nendstream")
+        objetos.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objetos)))
+        ids_paginas.append(len(objetos))
+
+    kids = ' '.join(f"{i} 0 R" for i in ids_paginas).encode()
+    objetos[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % paginas
+
+    dados = bytearray(b"%PDF-1.4\n")
+    posicoes = []
+    for i, objeto in enumerate(objetos, 1):
+        posicoes.append(len(dados))
+        dados += b"%d 0 obj\n" % i + objeto + b"\nendobj\n"
+    inicio_xref = len(dados)
+    dados += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    for posicao in posicoes:
+        dados += b"%010d 00000 n \n" % posicao
+    dados += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, inicio_xref)
+
+    with open(caminho, 'wb') as f:
+        f.write(bytes(dados))
+    return caminho
+
+
+def gerar_pagina_html(numero: int, total: int, links: int = 10, palavras: int = 400, semente: int = 0) -> str:
+    """Página HTML com menu e rodapé repetidos, texto próprio e links para outras páginas do site."""
+    aleatorio = random.Random(semente * 100003 + numero)
+    destinos = [aleatorio.randrange(total) for _ in range(links)]
+    menu = ' | '.join(f'<a href="/pagina{i}.html">Seção {i}</a>' for i in range(min(total, 5)))
+    corpo = ' '.join(f'<a href="pagina{d}.html#topo">veja também {d}</a>' for d in destinos)
+    return (f"<html><head><title>Página {numero}</title><style>body {{ margin: 0 }}</style></head><body>"
+            f"<nav>{menu}</nav><main><h1>Página {numero}</h1><p>{gerar_texto(palavras, semente + numero)}</p>"
+            f"<p>{corpo}</p></main><footer>Empresa Exemplo - todos os direitos reservados</footer></body></html>")
+
+
+def gerar_site(diretorio: str, paginas: int = 30, links: int = 10, semente: int = 0) -> str:
+    """Grava um site estático de `paginas` páginas ligadas entre si; retorna o diretório."""
+    Path(diretorio).mkdir(parents=True, exist_ok=True)
+    for numero in range(paginas):
+        Path(diretorio, f"pagina{numero}.html").write_text(gerar_pagina_html(numero, paginas, links, semente=semente),
+                                                            encoding='utf-8')
+    return diretorio
+
+
+class _ManipuladorSilencioso(SimpleHTTPRequestHandler):
+    def log_message(self, formato, *args):
+        pass
+
+
+class ServidorFixtures(ThreadingHTTPServer):
+    """
+    Servidor HTTP local que publica um diretório (fixtures do rastreamento).
+
+    Args:
+        diretorio: Diretório publicado
+        porta: Porta local (0 escolhe uma porta livre)
+    """
+
+    daemon_threads = True
+
+    def __init__(self, diretorio: str, porta: int = 0):
+        super().__init__(('127.0.0.1', porta), functools.partial(_ManipuladorSilencioso, directory=diretorio))
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def handle_error(self, request, client_address):
+        # Conexões encerradas pelo cliente (timeouts sob carga) não interessam aqui
+        pass
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True, name="servidor-fixtures").start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+
+def medir(nome: str, funcao: Callable, repeticoes: int, aquecimento: int = 1, **extra) -> dict:
+    """
+    Executa a função várias vezes e resume os tempos.
+
+    Args:
+        nome: Nome do benchmark
+        funcao: Função sem argumentos a medir
+        repeticoes: Execuções medidas
+        aquecimento: Execuções descartadas antes da medição
+        **extra: Parâmetros registrados junto ao resultado
+
+    Returns:
+        dict: nome, repetições, mediana/média/mínimo/p95/máximo (segundos) e parâmetros
+    """
+    for _ in range(aquecimento):
+        funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return _resumir_tempos(nome, tempos, extra)
+
+
+def _resumir_tempos(nome: str, tempos: List[float], extra: dict) -> dict:
+    repeticoes = len(tempos)
+    tempos = sorted(tempos)
+    resultado = {
+        'nome': nome,
+        'repeticoes': repeticoes,
+        'mediana_s': statistics.median(tempos),
+        'media_s': statistics.fmean(tempos),
+        'min_s': tempos[0],
+        'p95_s': tempos[min(len(tempos) - 1, int(round(0.95 * (len(tempos) - 1))))],
+        'max_s': tempos[-1],
+        'parametros': extra,
+    }
+    print(f"   {nome}: mediana {resultado['mediana_s'] * 1000:.2f} ms ({repeticoes}x)", file=sys.stderr)
+    return resultado
+
+
+def bench_texto(repeticoes: int) -> List[dict]:
+    """Truncamento e varredura de segurança de um documento grande."""
+    from bot import truncar_documento
+    from seguranca import escanear_conteudo_suspeito
+
+    paginas = [f"\n\n=== PÁGINA: https://exemplo.com/{i} ===\n\n{gerar_texto(400, i)}" for i in range(300)]
+    documento = ''.join(paginas)
+    return [
+        medir('truncar_documento', lambda: truncar_documento(documento), repeticoes, caracteres=len(documento)),
+        medir('escanear_conteudo_suspeito', lambda: escanear_conteudo_suspeito(documento), repeticoes,
+              caracteres=len(documento)),
+    ]
+
+
+def bench_pdf(repeticoes: int, diretorio: str, paginas: int = 50) -> List[dict]:
+    """Validação de segurança e extração de texto de um PDF gerado."""
+    from carregadores import carregar_pdf_arquivo
+    from seguranca import validar_pdf_completo
+
+    caminho = gerar_pdf(os.path.join(diretorio, 'benchmark.pdf'), paginas=paginas)
+    valido, erro = validar_pdf_completo(caminho)
+    if not valido:
+        raise RuntimeError(f"PDF de benchmark rejeitado: {erro}")
+    return [
+        medir('validar_pdf_completo', lambda: validar_pdf_completo(caminho), repeticoes, paginas=paginas),
+        medir('extrair_pdf', lambda: carregar_pdf_arquivo(caminho, validar_seguranca=False), repeticoes,
+              paginas=paginas),
+    ]
+
+
+def bench_site(repeticoes: int, diretorio: str, paginas: int = 30) -> List[dict]:
+    """Extração de links de uma página grande e rastreamento completo de um site local."""
+    from carregadores import extrair_links_internos, carregar_site_url
+
+    html_links = gerar_pagina_html(0, 1000, links=2000)
+    resultados = [medir('extrair_links_internos', lambda: extrair_links_internos('http://127.0.0.1/pagina0.html',
+                                                                                 html_links),
+                        repeticoes, links=2000)]
+
+    gerar_site(os.path.join(diretorio, 'site'), paginas=paginas)
+    with ServidorFixtures(os.path.join(diretorio, 'site')) as servidor:
+        inicio = f"{servidor.url}/pagina0.html"
+        resultados.append(medir('rastrear_site', lambda: carregar_site_url(inicio, max_paginas=paginas),
+                                max(1, repeticoes // 5), paginas=paginas))
+    return resultados
+
+
+def bench_turno(repeticoes: int, latencia: float, tokens_saida: int) -> List[dict]:
+    """Turnos completos (sanitização, guardrails e resposta) contra o modelo falso."""
+    from servidor_falso import ServidorFalso, ConfiguracaoFalha, gerar_conteudo
+
+    def gerar(mensagens):
+        conteudo = gerar_conteudo(mensagens)
+        if conteudo.startswith('Resposta simulada'):
+            conteudo = gerar_texto(tokens_saida)
+        return conteudo
+
+    with ServidorFalso(ConfiguracaoFalha(latencia=latencia), gerar=gerar) as falso:
+        os.environ['GROQ_API_BASE'] = falso.url
+        os.environ.setdefault('GROQ_API_KEY', 'benchmark')
+        from bot import resposta_bot
+        from guardrails import sanitizar_entrada_usuario, validar_conteudo_entrada, validar_resposta_saida
+
+        documento_curto = gerar_texto(3000)
+        documento_longo = ''.join(f"\n\n=== PÁGINA: https://exemplo.com/{i} ===\n\n{gerar_texto(500, i)}"
+                                  for i in range(200))
+
+        def turno(documento, pergunta):
+            def executar():
+                entrada = sanitizar_entrada_usuario(pergunta)
+                validar_conteudo_entrada(entrada)
+                resposta = resposta_bot([('user', entrada)], documento)
+                validar_resposta_saida(resposta)
+            return executar
+
+        parametros = {'latencia_modelo_s': latencia, 'tokens_saida': tokens_saida}
+        return [
+            medir('turno_documento_curto', turno(documento_curto, 'Qual o prazo de entrega?'), repeticoes,
+                  caracteres=len(documento_curto), **parametros),
+            medir('turno_documento_longo', turno(documento_longo, 'Qual o prazo de entrega do pedido?'), repeticoes,
+                  caracteres=len(documento_longo), **parametros),
+            medir('turno_mapreduce', turno(documento_longo, '/completo resuma o documento'),
+                  max(1, repeticoes // 5), caracteres=len(documento_longo), **parametros),
+        ]
+
+
+def tempo_importacao(modulo: str) -> tuple:
+    """
+    Importa o módulo em um interpretador novo (python -X importtime).
+
+    Returns:
+        tuple: (segundos da importação, [(módulo, segundos próprios), ...] dos mais lentos)
+    """
+    processo = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+                              capture_output=True, text=True, cwd=Path(__file__).parent, timeout=120)
+    if processo.returncode != 0:
+        raise RuntimeError(f"Falha ao importar {modulo}: {processo.stderr.strip().splitlines()[-1:]}")
+
+    proprios = []
+    total = None
+    for linha in processo.stderr.splitlines():
+        if not linha.startswith('import time:') or 'self [us]' in linha:
+            continue
+        proprio, cumulativo, nome = linha[len('import time:'):].split('|', 2)
+        proprios.append((nome.strip(), int(proprio) / 1e6))
+        if nome.strip() == modulo:
+            total = int(cumulativo) / 1e6
+    proprios.sort(key=lambda item: item[1], reverse=True)
+    return total, proprios[:5]
+
+
+def bench_importacao(repeticoes: int) -> List[dict]:
+    """Tempo de importação dos pontos de entrada, cada um em um interpretador novo."""
+    resultados = []
+    for modulo in MODULOS_IMPORTACAO:
+        # A interface só é medida se o Streamlit estiver instalado
+        if modulo == 'streamlit_app' and importlib.util.find_spec('streamlit') is None:
+            continue
+        tempos = []
+        mais_lentos = []
+        for _ in range(repeticoes):
+            segundos, mais_lentos = tempo_importacao(modulo)
+            tempos.append(segundos)
+        resultado = _resumir_tempos(f'importar_{modulo}', tempos,
+                                    {'mais_lentos': [f"{nome} ({segundos * 1000:.0f} ms)" for nome, segundos in mais_lentos]})
+        resultados.append(resultado)
+    return resultados
+
+
+def _commit_atual() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def comparar(atual: dict, base: dict, limiar: float = LIMIAR_REGRESSAO) -> List[str]:
+    """
+    Compara as medianas com as de uma execução anterior.
+
+    Returns:
+        List[str]: Nomes dos benchmarks que ficaram mais lentos que o limiar
+    """
+    anteriores = {r['nome']: r for r in base.get('resultados', [])}
+    regressoes = []
+    print(f"\nComparação com {base.get('commit') or 'base'}:", file=sys.stderr)
+    for resultado in atual['resultados']:
+        anterior = anteriores.get(resultado['nome'])
+        if not anterior or not anterior['mediana_s']:
+            continue
+        variacao = resultado['mediana_s'] / anterior['mediana_s'] - 1
+        marca = '❌' if variacao > limiar else ('✓' if variacao < -limiar else ' ')
+        print(f"   {marca} {resultado['nome']}: {anterior['mediana_s'] * 1000:.2f} → "
+              f"{resultado['mediana_s'] * 1000:.2f} ms ({variacao:+.0%})", file=sys.stderr)
+        if variacao > limiar:
+            regressoes.append(resultado['nome'])
+    return regressoes
+
+
+GRUPOS = ('texto', 'pdf', 'site', 'turno', 'importacao')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks dos caminhos críticos do NandaBot (sem rede externa).")
+    parser.add_argument('--saida', help="Arquivo JSON de resultados (padrão: saída padrão)")
+    parser.add_argument('--apenas', help=f"Grupos a executar, separados por vírgula ({', '.join(GRUPOS)})")
+    parser.add_argument('--repeticoes', type=int, default=20)
+    parser.add_argument('--rapido', action='store_true', help="Menos repetições (verificação rápida)")
+    parser.add_argument('--latencia', type=float, default=0.05, help="Latência do modelo falso (s)")
+    parser.add_argument('--tokens-saida', type=int, default=200, help="Tamanho das respostas do modelo falso (palavras)")
+    parser.add_argument('--comparar', help="JSON de uma execução anterior para comparar as medianas")
+    args = parser.parse_args(argv)
+
+    grupos = [g.strip() for g in args.apenas.split(',')] if args.apenas else list(GRUPOS)
+    desconhecidos = set(grupos) - set(GRUPOS)
+    if desconhecidos:
+        parser.error(f"grupos desconhecidos: {', '.join(sorted(desconhecidos))}")
+    repeticoes = 3 if args.rapido else max(1, args.repeticoes)
+
+    # Limites do agendador folgados: o benchmark mede o código, não a cota do Groq
+    os.environ.setdefault('NANDABOT_GROQ_RPM', '100000')
+    os.environ.setdefault('NANDABOT_GROQ_TPM', '100000000')
+    os.environ.setdefault('NANDABOT_BACKEND', 'groq')
+
+    resultados = []
+    print("📊 Executando benchmarks...", file=sys.stderr)
+    with tempfile.TemporaryDirectory(prefix='nandabot-benchmark-') as diretorio:
+        if 'texto' in grupos:
+            resultados += bench_texto(repeticoes)
+        if 'pdf' in grupos:
+            resultados += bench_pdf(repeticoes, diretorio)
+        if 'site' in grupos:
+            resultados += bench_site(repeticoes, diretorio)
+        if 'turno' in grupos:
+            resultados += bench_turno(repeticoes, args.latencia, args.tokens_saida)
+        if 'importacao' in grupos:
+            resultados += bench_importacao(min(repeticoes, 5))
+
+    relatorio = {
+        'commit': _commit_atual(),
+        'data': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'resultados': resultados,
+    }
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        Path(args.saida).write_text(texto + '\n', encoding='utf-8')
+        print(f"Resultados salvos em {args.saida}", file=sys.stderr)
+    else:
+        print(texto)
+
+    if args.comparar:
+        base = json.loads(Path(args.comparar).read_text(encoding='utf-8'))
+        if comparar(relatorio, base):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,34 +4,23 @@ API Key protegida através de variáveis de ambiente
 """
 
 import os
-from pathlib import Path
-from dotenv import load_dotenv
-from langchain_groq import ChatGroq
-from langchain_core.prompts import ChatPromptTemplate
+import re
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+from typing import Optional
+from indice import IndiceSecoes, dividir_secoes, juntar_secoes
+from compressao import comprimir_contexto
+from modelos import invocar, invocar_async, transmitir_async
+from agendador import PRIORIDADE_INTERATIVA, PRIORIDADE_LOTE
+from metricas import span, observar
 
-# Carrega variáveis de ambiente do arquivo .env
-# Garante que o arquivo .env seja encontrado no diretório do script
-env_path = Path(__file__).parent / '.env'
-load_dotenv(dotenv_path=env_path)
+# Limite de caracteres do documento enviado ao modelo (~15000 tokens)
+MAX_CARACTERES_CONTEXTO = 60000
 
-# Obtém a API key do ambiente (sem expor no código)
-api_key = os.getenv('GROQ_API_KEY')
 
-# Verifica se a API key foi configurada
-if not api_key:
-    raise ValueError(
-        "GROQ_API_KEY não encontrada! "
-        "Certifique-se de criar um arquivo .env com sua API key."
-    )
-
-# Configura a API key no ambiente
-os.environ['GROQ_API_KEY'] = api_key
-
-# Inicializa o chat
-chat = ChatGroq(model='llama-3.3-70b-versatile')
-
-
-def truncar_documento(documento, max_caracteres=60000):
+def truncar_documento(documento, max_caracteres=MAX_CARACTERES_CONTEXTO):
     """
     Trunca o documento de forma inteligente para caber no limite de tokens.
     
@@ -44,77 +33,430 @@ def truncar_documento(documento, max_caracteres=60000):
         str: Documento truncado
     """
     if len(documento) <= max_caracteres:
-        return documento
+        return str(documento)
     
-    # Se o documento é muito grande, tenta manter o início e partes relevantes
-    # Primeiro, divide por seções (páginas)
-    partes = documento.split('=== PÁGINA:')
+    # Se o documento é muito grande, mantém as seções (páginas/trechos) iniciais
+    secoes = dividir_secoes(documento)
     
-    if len(partes) == 1:
-        # Se não há separadores de página, apenas trunca
+    if not any(cabecalho for cabecalho, _ in secoes):
+        # Se não há separadores de seção, apenas trunca
         return documento[:max_caracteres] + "\n\n[... documento truncado por limite de tamanho ...]"
     
-    # Calcula quantas partes cabem
-    documento_truncado = ""
+    incluidas = []
     tamanho_atual = 0
     
-    # Mantém o início (primeira página completa)
-    if partes:
-        primeira_parte = partes[0] if not partes[0].startswith('===') else '=== PÁGINA:' + partes[0]
-        if tamanho_atual + len(primeira_parte) <= max_caracteres:
-            documento_truncado += primeira_parte
-            tamanho_atual += len(primeira_parte)
-    
-    # Adiciona páginas seguintes até o limite
-    for parte in partes[1:]:
-        parte_completa = '=== PÁGINA:' + parte
-        if tamanho_atual + len(parte_completa) <= max_caracteres:
-            documento_truncado += parte_completa
-            tamanho_atual += len(parte_completa)
-        else:
-            # Se não cabe mais, adiciona aviso
-            documento_truncado += f"\n\n[... documento truncado: {len(partes) - len(documento_truncado.split('=== PÁGINA:')) - 1} páginas restantes não incluídas por limite de tamanho ...]"
+    # Adiciona seções até o limite
+    for cabecalho, texto in secoes:
+        tamanho = len(cabecalho) + len(texto) + 4
+        if tamanho_atual + tamanho > max_caracteres:
             break
+        incluidas.append((cabecalho, texto))
+        tamanho_atual += tamanho
+    
+    if not incluidas:
+        # A primeira seção sozinha já excede o limite
+        cabecalho, texto = secoes[0]
+        incluidas.append((cabecalho, texto[:max_caracteres - len(cabecalho) - 4]))
     
-    return documento_truncado
+    # Se não cabe mais, adiciona aviso
+    restantes = len(secoes) - len(incluidas)
+    return juntar_secoes(incluidas) + f"\n\n[... documento truncado: {restantes} seções restantes não incluídas por limite de tamanho ...]"
 
 
-def resposta_bot(mensagens, documento):
+def selecionar_contexto(documento, pergunta, max_caracteres=MAX_CARACTERES_CONTEXTO, indice=None):
     """
-    Gera uma resposta do bot usando o modelo Groq.
+    Seleciona as seções do documento mais relevantes para a pergunta.
+    
+    Documentos que cabem no limite são enviados inteiros. Documentos maiores
+    enviam apenas as páginas/trechos relacionados à pergunta (com seus
+    cabeçalhos, incluindo os tempos dos vídeos). Se nenhuma seção tiver
+    relação com a pergunta, usa as seções iniciais (truncar_documento).
     
     Args:
-        mensagens: Lista de tuplas (role, content) com as mensagens
-        documento: String com as informações para o contexto do bot
+        documento: Documento completo
+        pergunta: Pergunta atual do usuário
+        max_caracteres: Limite de caracteres do contexto
+        indice (IndiceSecoes, optional): Índice já construído para o documento
     
     Returns:
-        str: Conteúdo da resposta gerada pelo bot
+        str: Contexto que cabe no limite
     """
-    # Trunca documento se necessário para evitar exceder limite de tokens
-    documento_truncado = truncar_documento(documento)
+    if len(documento) <= max_caracteres:
+        return str(documento)
     
-    # Se foi truncado, adiciona aviso (mas não adiciona ao documento para não consumir tokens)
-    # O aviso será mostrado apenas se necessário
-    if len(documento_truncado) < len(documento):
-        # Não adiciona aviso ao documento para economizar tokens
-        # O usuário será informado pela resposta se houver limitação
-        pass
+    if pergunta:
+        indice = indice or IndiceSecoes(documento)
+        secoes, omitidas = indice.selecionar(pergunta, max_caracteres)
+        if secoes:
+            contexto = juntar_secoes(secoes)
+            if omitidas:
+                contexto += f"\n\n[... {omitidas} seções menos relevantes para a pergunta não incluídas ...]"
+            return contexto
     
-    system_message = '''Você é Nanda, um assistente amigável do NandaBot.
+    return truncar_documento(documento, max_caracteres)
+
+
+def ultima_pergunta(mensagens):
+    """Retorna o conteúdo da última mensagem do usuário (ou '')."""
+    for role, conteudo in reversed(mensagens):
+        if role == 'user':
+            return conteudo
+    return ''
+
+
+def historico_recente(mensagens, quantidade=2):
+    """Texto das mensagens anteriores à pergunta atual (as mais recentes)."""
+    return ' '.join(conteudo for _, conteudo in mensagens[-quantidade - 1:-1])
+
+
+SYSTEM_MESSAGE = '''Você é Nanda, um assistente amigável do NandaBot.
 Você utiliza as seguintes informações para formular as suas respostas: {informacoes}
 
+Se as informações vierem de um vídeo, cada trecho começa com o intervalo de tempo
+"=== TRECHO: [HH:MM:SS - HH:MM:SS] ===". Cite o tempo do trecho usado na resposta.
+
 IMPORTANTE: Você deve sempre:
 - Ser respeitoso e profissional
 - Não fornecer instruções para atividades ilegais ou perigosas
 - Não gerar conteúdo ofensivo, discriminatório ou de ódio
 - Não expor informações pessoais sensíveis
 - Ser útil e preciso nas respostas'''
+
+# Comando que força o modo map-reduce (ex.: "/completo liste todos os preços")
+COMANDO_DOCUMENTO_INTEIRO = '/completo'
+
+# Pedidos explícitos do documento inteiro: "resuma o documento", "liste todos os preços",
+# "o documento inteiro"; "resuma a cláusula 3" ou "todos os planos têm frete?" não entram
+_DOCUMENTO = r'(documento|arquivo|pdf|site|v[ií]deo|playlist|conte[uú]do|texto|material)'
+PADRAO_DOCUMENTO_INTEIRO = re.compile(
+    r'\A\W*(resum[ao]|resumir|sumarize|sintetize)\W*\Z|'
+    r'\b(resum\w*|sumari\w*|sintetiz\w*)( (d?[oa]|d?es[st][ea]|tod[oa] [oa]|d[oa] tod[oa]))? ' + _DOCUMENTO + r'\b|'
+    r'\b(liste|listar|lista|enumere|enumerar|cite|quais s[aã]o) tod[oa]s\b|'
+    r'\b' + _DOCUMENTO + r' (inteiro|todo|completo)\b|'
+    r'\btod[oa] [oa] ' + _DOCUMENTO + r'\b',
+    re.IGNORECASE
+)
+
+# Perguntas de visão geral, respondidas pela árvore de resumos quando disponível: o pedido
+# se refere ao documento como um todo ("do que trata o documento?", "quais os principais
+# pontos?"), não a um alvo específico ("do que trata o artigo 5?")
+PADRAO_VISAO_GERAL = re.compile(
+    r'\A\W*(resum[ao]|resumir|sumarize|sintetize)\W*\Z|'
+    r'\b(resum\w*|sumari\w*|sintetiz\w*|vis[aã]o geral|panorama|principais (pontos|temas|assuntos|ideias)|'
+    r'(do )?que (se )?trata|sobre o que [eé])'
+    r'( (d?[oa]|d?es[st][ea]|tod[oa] [oa]|d[oa] tod[oa]) ' + _DOCUMENTO + r')?\W*\Z',
+    re.IGNORECASE
+)
+
+# Tamanho de cada bloco analisado em paralelo no modo map-reduce
+MAX_CARACTERES_BLOCO = 20000
+
+# Chamadas simultâneas ao modelo no modo map-reduce
+MAX_CONCORRENCIA_MAPREDUCE = int(os.getenv('NANDABOT_CONCORRENCIA_MAPREDUCE', '4'))
+
+# Quantidade de respostas parciais combinadas em cada chamada de redução
+FATOR_REDUCAO = 4
+
+SYSTEM_MAP = '''Você analisa UM TRECHO de um documento maior para responder a uma pergunta.
+Use apenas o trecho abaixo. Extraia todos os fatos, itens, valores e nomes relevantes
+para a pergunta, de forma objetiva e completa. Mantenha os cabeçalhos de página/tempo
+citados. Se o trecho não tiver nada relevante, responda apenas: NADA
+
+Trecho:
+{trecho}'''
+
+SYSTEM_REDUCE = '''Você combina respostas parciais, obtidas de partes diferentes de um documento,
+em uma única resposta para a pergunta. Una as informações sem perder itens, valores ou
+referências (páginas/tempos), remova repetições e não invente nada além das partes.
+
+Respostas parciais:
+{parciais}'''
+
+
+def precisa_documento_inteiro(pergunta, documento, max_caracteres=MAX_CARACTERES_CONTEXTO):
+    """
+    Indica se a pergunta deve ser respondida no modo map-reduce.
+    
+    O modo é usado quando o documento não cabe no contexto e a pergunta
+    pede o documento inteiro (resumo, lista completa) ou começa com /completo.
+    
+    Args:
+        pergunta: Pergunta atual do usuário
+        documento: Documento completo
+        max_caracteres: Limite de caracteres do contexto
+    
+    Returns:
+        bool: True se a pergunta precisa do documento inteiro
+    """
+    if len(documento) <= max_caracteres:
+        return False
+    pergunta = pergunta.strip()
+    if pergunta.lower().startswith(COMANDO_DOCUMENTO_INTEIRO):
+        return True
+    return bool(PADRAO_DOCUMENTO_INTEIRO.search(pergunta))
+
+
+def e_pergunta_visao_geral(pergunta):
+    """Indica se a pergunta pede uma visão geral do documento (resumo, temas principais)."""
+    pergunta = pergunta.strip()
+    return not pergunta.lower().startswith(COMANDO_DOCUMENTO_INTEIRO) and bool(PADRAO_VISAO_GERAL.search(pergunta))
+
+
+def dividir_em_blocos(documento, max_caracteres=MAX_CARACTERES_BLOCO):
+    """
+    Agrupa as seções do documento em blocos de até max_caracteres.
+    
+    Args:
+        documento: Documento completo
+        max_caracteres: Tamanho máximo de cada bloco
+    
+    Returns:
+        list: Textos dos blocos, na ordem do documento
+    """
+    blocos = []
+    atual = []
+    tamanho_atual = 0
+    
+    for cabecalho, texto in dividir_secoes(documento):
+        # Seções maiores que um bloco são cortadas em pedaços
+        pedacos = [texto[i:i + max_caracteres] for i in range(0, len(texto), max_caracteres)] or ['']
+        for pedaco in pedacos:
+            tamanho = len(cabecalho) + len(pedaco) + 4
+            if atual and tamanho_atual + tamanho > max_caracteres:
+                blocos.append(juntar_secoes(atual))
+                atual = []
+                tamanho_atual = 0
+            atual.append((cabecalho, pedaco))
+            tamanho_atual += tamanho
+    
+    if atual:
+        blocos.append(juntar_secoes(atual))
+    
+    return blocos
+
+
+def invocar_em_paralelo(system_message, variaveis_lista, pergunta, max_concorrencia, prioridade=PRIORIDADE_LOTE,
+                        estagio='mapreduce', cancelamento: Optional[threading.Event] = None):
+    """
+    Executa o mesmo prompt para várias entradas, com no máximo max_concorrencia chamadas simultâneas.
+    
+    Com `cancelamento` sinalizado, as chamadas que ainda não começaram não são
+    feitas e é levantado concurrent.futures.CancelledError.
+    """
+    mensagens_modelo = [('system', system_message), ('user', '{pergunta}')]
+    
+    def executar(variaveis):
+        if cancelamento is not None and cancelamento.is_set():
+            raise CancelledError()
+        return invocar(mensagens_modelo, {**variaveis, 'pergunta': pergunta}, prioridade, estagio=estagio).strip()
+    
+    # Cada chamada leva uma cópia do contexto (ex.: contagem de tokens do turno)
+    with ThreadPoolExecutor(max_workers=max_concorrencia) as executor:
+        futuros = [executor.submit(contextvars.copy_context().run, executar, variaveis) for variaveis in variaveis_lista]
+        return [futuro.result() for futuro in futuros]
+
+
+def resposta_mapreduce(mensagens, documento, max_concorrencia=MAX_CONCORRENCIA_MAPREDUCE):
+    """
+    Responde perguntas sobre o documento inteiro no modo map-reduce.
+    
+    Map: a pergunta é enviada a cada bloco do documento em chamadas
+    paralelas. Reduce: as respostas parciais são combinadas em grupos, também
+    em paralelo, até caberem no contexto; a resposta final é gerada como uma
+    resposta normal, usando as parciais como informações.
+    
+    Args:
+        mensagens: Lista de tuplas (role, content) com as mensagens
+        documento: Documento completo
+        max_concorrencia: Máximo de chamadas simultâneas ao modelo
     
-    mensagens_modelo = [('system', system_message)]
+    Returns:
+        str: Conteúdo da resposta gerada pelo bot
+    """
+    pergunta = _remover_comando(ultima_pergunta(mensagens))
+    
+    # Map: extrai de cada bloco o que for relevante para a pergunta
+    blocos = dividir_em_blocos(documento)
+    parciais = invocar_em_paralelo(SYSTEM_MAP, [{'trecho': bloco} for bloco in blocos], pergunta, max_concorrencia)
+    parciais = _filtrar_parciais(parciais)
+    
+    # Reduce hierárquico: combina grupos de parciais até caber no contexto
+    while _precisa_reduzir(parciais):
+        parciais = invocar_em_paralelo(SYSTEM_REDUCE, _grupos_reducao(parciais), pergunta, max_concorrencia)
+    
+    return _gerar_resposta(mensagens, _juntar_parciais(parciais))
+
+
+def _filtrar_parciais(parciais):
+    """Descarta as respostas NADA do map."""
+    parciais = [p for p in parciais if p and p.strip().upper().rstrip('.') != 'NADA']
+    return parciais or ["O documento não contém informações relacionadas à pergunta."]
+
+
+def _precisa_reduzir(parciais):
+    return len(parciais) > 1 and len('\n\n'.join(parciais)) > MAX_CARACTERES_CONTEXTO
+
+
+def _grupos_reducao(parciais):
+    """Variáveis do prompt de reduce para cada grupo de FATOR_REDUCAO parciais."""
+    grupos = [parciais[i:i + FATOR_REDUCAO] for i in range(0, len(parciais), FATOR_REDUCAO)]
+    return [{'parciais': '\n\n---\n\n'.join(grupo)} for grupo in grupos]
+
+
+def _juntar_parciais(parciais):
+    return '\n\n---\n\n'.join(f"[Parte {i + 1}]\n{parcial}" for i, parcial in enumerate(parciais))
+
+
+def _remover_comando(pergunta):
+    """Remove o comando /completo do início da pergunta."""
+    if pergunta.strip().lower().startswith(COMANDO_DOCUMENTO_INTEIRO):
+        return pergunta.strip()[len(COMANDO_DOCUMENTO_INTEIRO):].strip()
+    return pergunta
+
+
+def _mensagens_resposta(mensagens):
+    """Mensagens enviadas ao modelo na resposta final (prompt do sistema + conversa)."""
+    # O comando /completo não faz parte da pergunta enviada ao modelo
+    if mensagens and mensagens[-1][0] == 'user':
+        mensagens = list(mensagens[:-1]) + [('user', _remover_comando(mensagens[-1][1]))]
+    
+    mensagens_modelo = [('system', SYSTEM_MESSAGE)]
     mensagens_modelo += mensagens
+    return mensagens_modelo
+
+
+def _gerar_resposta(mensagens, informacoes):
+    """Gera a resposta final do bot a partir das informações já preparadas."""
+    return invocar(_mensagens_resposta(mensagens), {'informacoes': informacoes}, PRIORIDADE_INTERATIVA,
+                   estagio='resposta')
+
+
+def _preparar_informacoes(mensagens, documento, indice=None, comprimir=True, arvore=None):
+    """
+    Escolhe o modo de resposta e prepara as informações enviadas ao modelo.
+    
+    Returns:
+        Tuple[str, Optional[str]]: (modo, informacoes); no modo 'mapreduce' as
+        informações são produzidas pelas chamadas de map/reduce
+    """
+    with span('montagem_prompt') as medicao:
+        modo, informacoes = _escolher_informacoes(mensagens, documento, indice, comprimir, arvore)
+        medicao.definir(modo=modo, caracteres_documento=len(documento), caracteres_contexto=len(informacoes or ''))
+    
+    observar('nandabot_documento_caracteres', len(documento), fase='original')
+    if informacoes is not None:
+        observar('nandabot_documento_caracteres', len(informacoes), fase='contexto')
+    return modo, informacoes
+
+
+def _escolher_informacoes(mensagens, documento, indice, comprimir, arvore):
+    pergunta = ultima_pergunta(mensagens)
+    
+    # Visão geral: poucas centenas de tokens de resumos em vez do texto completo
+    # (documentos que cabem no contexto são enviados inteiros, sem perder detalhes)
+    if arvore is not None and len(documento) > MAX_CARACTERES_CONTEXTO and e_pergunta_visao_geral(pergunta):
+        return 'visao_geral', arvore.contexto_visao_geral()
+    
+    if precisa_documento_inteiro(pergunta, documento):
+        return 'mapreduce', None
+    
+    # Seleciona as seções relevantes para a pergunta se o documento exceder o limite de tokens
+    documento_truncado = selecionar_contexto(documento, pergunta, indice=indice)
+    
+    # Mantém apenas as frases relevantes (e vizinhas) dentro do orçamento de tokens
+    if comprimir:
+        documento_truncado = comprimir_contexto(documento_truncado, pergunta, historico_recente(mensagens))
+    
+    return 'selecao', documento_truncado
+
+
+def resposta_bot(mensagens, documento, indice=None, comprimir=True, arvore=None):
+    """
+    Gera uma resposta do bot usando o modelo Groq.
+    
+    Perguntas de visão geral usam a árvore de resumos, se já construída.
+    Perguntas sobre o documento inteiro (resumos, listas completas ou com o
+    comando /completo) em documentos grandes usam o modo map-reduce.
+    
+    Args:
+        mensagens: Lista de tuplas (role, content) com as mensagens
+        documento: String com as informações para o contexto do bot
+        indice (IndiceSecoes, optional): Índice do documento, para não
+                                         reconstruí-lo a cada pergunta
+        comprimir (bool): Se True, envia apenas as frases relevantes para a
+                          pergunta (ver compressao.comprimir_contexto)
+        arvore (ArvoreResumos, optional): Resumos pré-computados do documento
     
-    template = ChatPromptTemplate.from_messages(mensagens_modelo)
-    chain = template | chat
+    Returns:
+        str: Conteúdo da resposta gerada pelo bot
+    """
+    modo, informacoes = _preparar_informacoes(mensagens, documento, indice, comprimir, arvore)
     
-    return chain.invoke({'informacoes': documento_truncado}).content
+    if modo == 'mapreduce':
+        return resposta_mapreduce(mensagens, documento)
+    
+    return _gerar_resposta(mensagens, informacoes)
+
+
+async def invocar_em_paralelo_async(system_message, variaveis_lista, pergunta, max_concorrencia,
+                                    prioridade=PRIORIDADE_LOTE, estagio='mapreduce'):
+    """Versão assíncrona de invocar_em_paralelo (semáforo em vez de threads)."""
+    mensagens_modelo = [('system', system_message), ('user', '{pergunta}')]
+    semaforo = asyncio.Semaphore(max_concorrencia)
+    
+    async def executar(variaveis):
+        async with semaforo:
+            resposta = await invocar_async(mensagens_modelo, {**variaveis, 'pergunta': pergunta}, prioridade,
+                                           estagio=estagio)
+            return resposta.strip()
+    
+    return list(await asyncio.gather(*(executar(variaveis) for variaveis in variaveis_lista)))
+
 
+async def _informacoes_mapreduce_async(mensagens, documento, max_concorrencia=MAX_CONCORRENCIA_MAPREDUCE):
+    """Map e reduce assíncronos; retorna as informações da resposta final."""
+    pergunta = _remover_comando(ultima_pergunta(mensagens))
+    
+    blocos = dividir_em_blocos(documento)
+    parciais = await invocar_em_paralelo_async(SYSTEM_MAP, [{'trecho': bloco} for bloco in blocos], pergunta,
+                                               max_concorrencia)
+    parciais = _filtrar_parciais(parciais)
+    
+    while _precisa_reduzir(parciais):
+        parciais = await invocar_em_paralelo_async(SYSTEM_REDUCE, _grupos_reducao(parciais), pergunta,
+                                                   max_concorrencia)
+    
+    return _juntar_parciais(parciais)
+
+
+async def _informacoes_async(mensagens, documento, indice, comprimir, arvore):
+    # Seleção e compressão rodam fora do loop para não atrasar outras conversas
+    modo, informacoes = await asyncio.to_thread(_preparar_informacoes, mensagens, documento, indice, comprimir, arvore)
+    if modo == 'mapreduce':
+        informacoes = await _informacoes_mapreduce_async(mensagens, documento)
+    return informacoes
+
+
+async def resposta_bot_async(mensagens, documento, indice=None, comprimir=True, arvore=None):
+    """
+    Versão assíncrona de resposta_bot, para servir muitas conversas em um só processo.
+    
+    Returns:
+        str: Conteúdo da resposta gerada pelo bot
+    """
+    informacoes = await _informacoes_async(mensagens, documento, indice, comprimir, arvore)
+    return await invocar_async(_mensagens_resposta(mensagens), {'informacoes': informacoes},
+                               PRIORIDADE_INTERATIVA, estagio='resposta')
+
+
+async def transmitir_resposta_bot(mensagens, documento, indice=None, comprimir=True, arvore=None):
+    """
+    Gera a resposta do bot em partes, à medida que o modelo as produz.
+    
+    Yields:
+        str: Trechos do texto da resposta
+    """
+    informacoes = await _informacoes_async(mensagens, documento, indice, comprimir, arvore)
+    async for trecho in transmitir_async(_mensagens_resposta(mensagens), {'informacoes': informacoes},
+                                         PRIORIDADE_INTERATIVA, estagio='resposta'):
+        yield trecho
@@ -0,0 +1,285 @@
+"""
+Gerador de carga do NandaBot
+Simula várias sessões simultâneas, cada uma carregando um documento e
+seguindo um roteiro de conversa pelo mesmo caminho do terminal e do
+Streamlit (sanitização → guardrail de entrada → resposta_bot → guardrail de
+saída), contra o modelo falso local (servidor_falso), e aponta a partir de
+quantas sessões a vazão para de crescer ou a latência degrada
+
+Uso:
+    python carga.py --sessoes 1,2,4,8,16,32 --latencia 0.3 --saida carga.json
+    python carga.py --fonte documento.pdf --roteiro perguntas.txt --sessoes 10
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+import threading
+from collections import defaultdict
+from typing import List, Optional
+
+
+# Roteiro padrão de cada sessão (uma pergunta por turno)
+ROTEIRO_PADRAO = [
+    'Do que trata o documento?',
+    'Quais são os prazos de entrega mencionados?',
+    'E sobre a garantia, o que diz?',
+    'Resuma em uma frase o que foi dito sobre pagamento.',
+]
+
+# Critérios de saturação: a vazão cresce menos que GANHO_MINIMO ao aumentar
+# as sessões, ou o p95 do turno passa de DEGRADACAO_MAXIMA vezes o do nível inicial
+GANHO_MINIMO = 0.10
+DEGRADACAO_MAXIMA = 2.0
+
+
+def percentil(valores: List[float], p: float) -> Optional[float]:
+    """Percentil p (0-100) dos valores, ou None se a lista estiver vazia."""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+class Medicoes:
+    """Tempos por estágio e contadores de turnos, compartilhados pelas threads das sessões."""
+
+    def __init__(self):
+        self.tempos = defaultdict(list)
+        self.turnos = 0
+        self.bloqueados = 0
+        self.erros = []
+        self._trava = threading.Lock()
+
+    def registrar(self, estagio: str, segundos: float):
+        with self._trava:
+            self.tempos[estagio].append(segundos)
+
+    def contar(self, bloqueado: bool = False, erro: Optional[str] = None):
+        with self._trava:
+            self.turnos += 1
+            self.bloqueados += bloqueado
+            if erro:
+                self.erros.append(erro)
+
+    def resumo(self) -> dict:
+        return {
+            estagio: {'amostras': len(tempos), 'p50_s': percentil(tempos, 50), 'p95_s': percentil(tempos, 95),
+                      'p99_s': percentil(tempos, 99), 'max_s': max(tempos) if tempos else None}
+            for estagio, tempos in self.tempos.items()
+        }
+
+
+def _medir(medicoes: Medicoes, estagio: str, funcao, *args, **kwargs):
+    inicio = time.perf_counter()
+    try:
+        return funcao(*args, **kwargs)
+    finally:
+        medicoes.registrar(estagio, time.perf_counter() - inicio)
+
+
+def executar_sessao(carregar, roteiro: List[str], medicoes: Medicoes, largada: Optional[threading.Barrier] = None):
+    """
+    Uma sessão: carrega o documento e segue o roteiro, como em main.main.
+
+    Args:
+        carregar: Função sem argumentos que retorna o documento
+        roteiro: Perguntas feitas em sequência
+        medicoes: Onde registrar os tempos
+        largada: Barreira que alinha o início das conversas depois da carga de todas as sessões
+    """
+    from bot import resposta_bot, MAX_CARACTERES_CONTEXTO
+    from guardrails import sanitizar_entrada_usuario, validar_conteudo_entrada, validar_resposta_saida
+    from indice import IndiceSecoes
+
+    # Uma carga que falha não pode deixar as outras sessões presas na barreira
+    documento, erro = '', 'Documento não carregado'
+    try:
+        documento = _medir(medicoes, 'carga', carregar)
+        indice = IndiceSecoes(documento) if len(documento) > MAX_CARACTERES_CONTEXTO else None
+    except Exception as e:
+        documento, erro = '', f"Erro na carga: {e}"
+    finally:
+        if largada:
+            largada.wait()
+    if not documento:
+        medicoes.contar(erro=erro)
+        return
+
+    mensagens = []
+    for pergunta in roteiro:
+        inicio = time.perf_counter()
+        pergunta_sanitizada = sanitizar_entrada_usuario(pergunta)
+        seguro, _ = _medir(medicoes, 'moderacao_entrada', validar_conteudo_entrada, pergunta_sanitizada)
+        if not seguro:
+            medicoes.contar(bloqueado=True)
+            continue
+
+        mensagens.append(('user', pergunta_sanitizada))
+        try:
+            resposta = _medir(medicoes, 'resposta', resposta_bot, mensagens, documento, indice=indice)
+            seguro_resposta, resposta_final = _medir(medicoes, 'moderacao_saida', validar_resposta_saida, resposta)
+            if seguro_resposta:
+                mensagens.append(('assistant', resposta_final))
+            medicoes.registrar('turno', time.perf_counter() - inicio)
+            medicoes.contar()
+        except Exception as e:
+            mensagens.pop()
+            medicoes.contar(erro=str(e))
+
+
+def executar_nivel(sessoes: int, carregar, roteiro: List[str]) -> dict:
+    """
+    Executa `sessoes` sessões simultâneas e resume o nível.
+
+    Returns:
+        dict: sessões, turnos, vazão (turnos/s), duração, erros e percentis por estágio
+    """
+    medicoes = Medicoes()
+    inicio = None
+
+    def largar():
+        nonlocal inicio
+        inicio = time.perf_counter()
+
+    # A vazão mede só as conversas: todas começam juntas, depois da carga dos documentos
+    largada = threading.Barrier(sessoes, action=largar)
+    threads = [threading.Thread(target=executar_sessao, args=(carregar, roteiro, medicoes, largada), daemon=True,
+                                name=f"sessao-{i}") for i in range(sessoes)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duracao = time.perf_counter() - inicio
+
+    concluidos = len(medicoes.tempos['turno'])
+    return {
+        'sessoes': sessoes,
+        'turnos': concluidos,
+        'bloqueados': medicoes.bloqueados,
+        'erros': len(medicoes.erros),
+        'exemplos_erro': medicoes.erros[:3],
+        'duracao_s': duracao,
+        'vazao_turnos_s': concluidos / duracao if duracao else 0.0,
+        'estagios': medicoes.resumo(),
+    }
+
+
+def ponto_saturacao(niveis: List[dict]) -> Optional[int]:
+    """
+    Primeiro nível (em sessões) em que a vazão parou de crescer ou a latência degradou.
+
+    Returns:
+        Optional[int]: Sessões do nível saturado, ou None se nenhum nível saturou
+    """
+    if not niveis:
+        return None
+    base = niveis[0]['estagios'].get('turno', {}).get('p95_s')
+    for anterior, atual in zip(niveis, niveis[1:]):
+        ganho = atual['vazao_turnos_s'] / anterior['vazao_turnos_s'] - 1 if anterior['vazao_turnos_s'] else 0.0
+        p95 = atual['estagios'].get('turno', {}).get('p95_s')
+        if ganho < GANHO_MINIMO or (base and p95 and p95 > DEGRADACAO_MAXIMA * base) or atual['erros']:
+            return atual['sessoes']
+    return None
+
+
+def imprimir_nivel(nivel: dict):
+    turno = nivel['estagios'].get('turno', {})
+    p50 = f"{turno['p50_s']:.2f}s" if turno.get('p50_s') is not None else '-'
+    p95 = f"{turno['p95_s']:.2f}s" if turno.get('p95_s') is not None else '-'
+    p99 = f"{turno['p99_s']:.2f}s" if turno.get('p99_s') is not None else '-'
+    print(f"   {nivel['sessoes']:>4} sessão(ões): {nivel['vazao_turnos_s']:.2f} turnos/s, "
+          f"turno p50 {p50} p95 {p95} p99 {p99}"
+          + (f", {nivel['erros']} erro(s)" if nivel['erros'] else ''))
+
+
+def imprimir_estagios(nivel: dict):
+    print(f"\n📊 Estágios com {nivel['sessoes']} sessão(ões):")
+    for estagio, dados in nivel['estagios'].items():
+        if dados['p50_s'] is None:
+            continue
+        print(f"   {estagio}: p50 {dados['p50_s']:.3f}s, p95 {dados['p95_s']:.3f}s, p99 {dados['p99_s']:.3f}s "
+              f"({dados['amostras']} amostras)")
+
+
+def ler_roteiro(caminho: str) -> List[str]:
+    """Perguntas do roteiro, uma por linha (linhas em branco e iniciadas por # são ignoradas)."""
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return [linha.strip() for linha in f if linha.strip() and not linha.strip().startswith('#')]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gerador de carga do NandaBot contra o modelo falso local.")
+    parser.add_argument('--sessoes', default='1,2,4,8,16',
+                        help="Níveis de sessões simultâneas, separados por vírgula (padrão: 1,2,4,8,16)")
+    parser.add_argument('--fonte', help="PDF, site ou vídeo carregado por cada sessão (padrão: site local gerado)")
+    parser.add_argument('--roteiro', help="Arquivo com as perguntas de cada sessão, uma por linha")
+    parser.add_argument('--latencia', type=float, default=0.2, help="Latência do modelo falso (s)")
+    parser.add_argument('--variacao', type=float, default=0.1, help="Variação da latência do modelo falso (s)")
+    parser.add_argument('--paginas', type=int, default=10, help="Páginas do site local gerado")
+    parser.add_argument('--limites-groq', action='store_true',
+                        help="Mantém os limites de RPM/TPM do agendador (padrão: limites folgados)")
+    parser.add_argument('--saida', help="Arquivo JSON com os resultados")
+    args = parser.parse_args(argv)
+
+    try:
+        niveis_sessoes = sorted({int(n) for n in args.sessoes.split(',') if n.strip()})
+    except ValueError:
+        parser.error("--sessoes deve ser uma lista de inteiros, ex.: 1,2,4,8")
+    roteiro = ler_roteiro(args.roteiro) if args.roteiro else ROTEIRO_PADRAO
+
+    if not args.limites_groq:
+        os.environ.setdefault('NANDABOT_GROQ_RPM', '100000')
+        os.environ.setdefault('NANDABOT_GROQ_TPM', '100000000')
+
+    from benchmark import gerar_site, ServidorFixtures
+    from lote import carregar_fonte, detectar_tipo
+    from servidor_falso import ServidorFalso, ConfiguracaoFalha
+
+    with tempfile.TemporaryDirectory(prefix='nandabot-carga-') as diretorio, \
+            ServidorFalso(ConfiguracaoFalha(latencia=args.latencia, variacao=args.variacao)) as falso, \
+            ServidorFixtures(gerar_site(diretorio, paginas=args.paginas)) as fixtures:
+        os.environ['GROQ_API_BASE'] = falso.url
+        os.environ.setdefault('GROQ_API_KEY', 'carga')
+
+        origem = args.fonte or f"{fixtures.url}/pagina0.html"
+        fonte = {'tipo': detectar_tipo(origem), 'origem': origem, 'max_paginas': args.paginas}
+
+        def carregar():
+            return carregar_fonte(fonte)['documento']
+
+        print(f"🧪 Carga: {len(roteiro)} pergunta(s) por sessão, modelo falso com {args.latencia:.2f}s de latência")
+
+        # Um turno descartado antes do primeiro nível (importações, conexões, caches),
+        # como o `aquecimento` de benchmark.medir
+        executar_sessao(carregar, roteiro[:1], Medicoes())
+
+        niveis = []
+        for sessoes in niveis_sessoes:
+            nivel = executar_nivel(sessoes, carregar, roteiro)
+            imprimir_nivel(nivel)
+            niveis.append(nivel)
+        requisicoes = falso.requisicoes
+
+    saturacao = ponto_saturacao(niveis)
+    if niveis:
+        imprimir_estagios(niveis[-1])
+    print(f"\nRequisições ao modelo falso: {requisicoes}")
+    if saturacao:
+        print(f"⚠️ Saturação a partir de {saturacao} sessões simultâneas")
+    else:
+        print("✓ Nenhum nível saturou; aumente --sessoes para encontrar o limite")
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump({'latencia_modelo_s': args.latencia, 'roteiro': roteiro, 'niveis': niveis,
+                       'saturacao_sessoes': saturacao}, f, ensure_ascii=False, indent=2)
+        print(f"Resultados salvos em {args.saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
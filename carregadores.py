@@ -3,16 +3,25 @@ Módulo para carregar documentos de diferentes fontes:
 - Sites (Web)
 - PDFs
 - Vídeos do YouTube (transcrições)
+
+requests, BeautifulSoup e PyPDFLoader são importados no primeiro
+carregamento que precisa deles, não na importação do módulo.
 """
 
 import re
 import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
-from langchain_community.document_loaders import WebBaseLoader
-from langchain_community.document_loaders import PyPDFLoader
-from youtube_transcript_api import YouTubeTranscriptApi
-from seguranca import validar_pdf_completo
+from typing import Optional, Tuple
+from urllib.parse import urljoin, urlparse
+from seguranca import validar_pdf_completo, MAX_FILE_SIZE
+from metricas import instrumentar, span
+from perfilador import perfilar, imprimir_resumo
+from duplicatas import DetectorDuplicatas
+from reducao import reduzir_paginas, reduzir_paginas_em_fluxo, descrever_reducao
+from armazenamento import DocumentoEmDisco, PaginasComprimidas
+from transcricoes import buscar_transcricao, transcricao_para_documento
 
 # Verifica se está rodando no Google Colab
 try:
@@ -34,20 +43,101 @@ def montar_drive():
         print("Aviso: Esta função só funciona no Google Colab.")
 
 
-def extrair_links_internos_terminal(url_base, html_content):
-    """Extrai links internos de uma página HTML (versão terminal)"""
+# Cabeçalhos usados nas requisições do crawler
+HEADERS_HTTP = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+# Tipos de conteúdo lidos como página HTML pelo crawler (sem Content-Type também)
+TIPOS_HTML = ('', 'text/html', 'application/xhtml+xml', 'text/plain')
+
+# PDFs encontrados no site baixados e extraídos ao mesmo tempo, sem parar o crawl do HTML
+LIMITE_PDFS_SITE = int(os.getenv('NANDABOT_PDFS_SITE', '2'))
+
+# Tamanho de cada leitura do download de PDFs (bytes)
+BLOCO_DOWNLOAD = 64 * 1024
+
+
+class EventosCarga:
+    """
+    Interface de eventos do motor de carregamento.
+    
+    O motor não chama input(), print() ou st.*: ele apenas notifica estes
+    métodos. Cada interface (terminal, Streamlit) fornece sua subclasse.
+    A implementação padrão ignora todos os eventos.
+    """
+    
+    def progresso(self, atual: int, total: int, mensagem: str):
+        """Notifica o avanço do carregamento (atual de total etapas)."""
+    
+    def info(self, mensagem: str):
+        """Mensagem informativa (ex.: item carregado com sucesso)."""
+    
+    def aviso(self, mensagem: str):
+        """Problema não fatal (ex.: uma página do site falhou)."""
+    
+    def erro(self, mensagem: str):
+        """Falha que impede o carregamento da fonte."""
+    
+    def cancelado(self) -> bool:
+        """Retorna True se o carregamento deve ser interrompido."""
+        return False
+
+
+class EventosColetados(EventosCarga):
+    """Guarda os avisos e erros de uma carga (ex.: para o relatório do lote)."""
+    
+    def __init__(self):
+        self.avisos = []
+        self.erros = []
+    
+    def aviso(self, mensagem):
+        self.avisos.append(mensagem)
+    
+    def erro(self, mensagem):
+        self.erros.append(mensagem)
+
+
+class EventosTerminal(EventosCarga):
+    """Eventos do motor exibidos no terminal."""
+    
+    def progresso(self, atual, total, mensagem):
+        print(f"  {mensagem}")
+    
+    def info(self, mensagem):
+        print(mensagem)
+    
+    def aviso(self, mensagem):
+        print(f"  ⚠️ {mensagem}")
+    
+    def erro(self, mensagem):
+        print(f"❌ {mensagem}")
+
+
+def extrair_links_internos(url_base, html_content):
+    """
+    Extrai links internos (mesmo domínio) de uma página HTML.
+    
+    Args:
+        url_base (str): URL da página de onde o HTML foi obtido
+        html_content (str | BeautifulSoup): HTML da página ou documento já parseado
+    
+    Returns:
+        list: URLs internas sem fragmento nem query string
+    """
     from bs4 import BeautifulSoup
-    from urllib.parse import urljoin, urlparse
     
-    soup = BeautifulSoup(html_content, 'html.parser')
+    soup = html_content if isinstance(html_content, BeautifulSoup) else BeautifulSoup(html_content, 'html.parser')
     links = set()
     dominio_base = urlparse(url_base).netloc
     
     for tag in soup.find_all('a', href=True):
         href = tag['href']
+        # Converte link relativo para absoluto
         url_completa = urljoin(url_base, href)
         parsed = urlparse(url_completa)
         
+        # Verifica se é do mesmo domínio e não é um link de âncora
         if parsed.netloc == dominio_base and not href.startswith('#'):
             url_limpa = f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
             if url_limpa and url_limpa not in links:
@@ -55,77 +145,303 @@ def extrair_links_internos_terminal(url_base, html_content):
     
     return list(links)
 
-def carrega_site(max_paginas=20):
+
+# Mantido por compatibilidade com o nome antigo
+extrair_links_internos_terminal = extrair_links_internos
+
+
+def extrair_texto_html(soup):
     """
-    Carrega conteúdo de um site através da URL, incluindo múltiplas páginas.
+    Extrai o texto visível de uma página, um bloco por linha.
+    
+    Scripts e estilos são descartados. Separar os blocos em linhas permite
+    que a redução de texto reconheça menus e rodapés repetidos.
     
     Args:
+        soup (BeautifulSoup): Página já parseada (é modificada)
+    
+    Returns:
+        str: Texto da página
+    """
+    for tag in soup(['script', 'style', 'noscript', 'template']):
+        tag.decompose()
+    return soup.get_text('\n')
+
+
+def texto_principal_html(soup):
+    """
+    Texto da área principal da página (<main>/<article>), usado na detecção
+    de duplicatas para que menus e rodapés comuns não tornem páginas
+    diferentes "parecidas".
+    
+    Args:
+        soup (BeautifulSoup): Página já parseada
+    
+    Returns:
+        str: Texto da área principal (ou da página inteira, se não houver)
+    """
+    principal = soup.find('main') or soup.find('article') or soup.body or soup
+    return principal.get_text(' ')
+
+
+def tipo_conteudo(response) -> str:
+    """Tipo de conteúdo da resposta, sem parâmetros (ex.: 'text/html')."""
+    return response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+
+
+def html_resposta(response):
+    """
+    Corpo HTML da resposta para o BeautifulSoup.
+    
+    Sem charset no Content-Type, o requests decodifica como ISO-8859-1
+    ("página" vira "pÃ¡gina"); nesse caso os bytes são repassados para o
+    BeautifulSoup detectar a codificação (<meta charset> ou o próprio conteúdo).
+    """
+    if 'charset=' in response.headers.get('Content-Type', '').lower():
+        return response.text
+    return response.content
+
+
+def e_resposta_pdf(response, url: str) -> bool:
+    """Indica se a resposta é um PDF (pelo Content-Type, ou extensão .pdf com tipo genérico)."""
+    tipo = tipo_conteudo(response)
+    if tipo in ('application/pdf', 'application/x-pdf'):
+        return True
+    return tipo in ('application/octet-stream', 'binary/octet-stream') and urlparse(url).path.lower().endswith('.pdf')
+
+
+def baixar_pdf(response, diretorio: Optional[str] = None) -> str:
+    """
+    Grava em um arquivo temporário o PDF de uma resposta aberta com stream=True.
+    
+    O tamanho é conferido antes do download (Content-Length) e durante a
+    leitura, em blocos: PDFs acima de MAX_FILE_SIZE são interrompidos sem
+    serem baixados por inteiro.
+    
+    Args:
+        response: Resposta do requests, ainda não lida
+        diretorio (str, optional): Diretório do arquivo temporário
+    
+    Returns:
+        str: Caminho do arquivo (o chamador remove o arquivo)
+    
+    Raises:
+        ValueError: Se o PDF passar de MAX_FILE_SIZE
+    """
+    limite_mb = MAX_FILE_SIZE / 1024 / 1024
+    declarado = response.headers.get('Content-Length')
+    if declarado and declarado.isdigit() and int(declarado) > MAX_FILE_SIZE:
+        raise ValueError(f"PDF muito grande ({int(declarado) / 1024 / 1024:.2f}MB). Tamanho máximo: {limite_mb}MB")
+    
+    with tempfile.NamedTemporaryFile(dir=diretorio, prefix='nandabot-', suffix='.pdf', delete=False) as arquivo:
+        caminho = arquivo.name
+        try:
+            tamanho = 0
+            for bloco in response.iter_content(BLOCO_DOWNLOAD):
+                tamanho += len(bloco)
+                if tamanho > MAX_FILE_SIZE:
+                    raise ValueError(f"PDF muito grande (acima de {limite_mb}MB)")
+                arquivo.write(bloco)
+        except Exception:
+            arquivo.close()
+            os.unlink(caminho)
+            raise
+    return caminho
+
+
+def _carregar_pdf_site(response, url: str) -> Tuple[str, EventosColetados]:
+    """
+    Baixa e extrai um PDF encontrado no site (executado no pool de PDFs do crawler).
+    
+    Passa pela mesma validação de segurança e extração de carregar_pdf_arquivo.
+    Os eventos são coletados e repassados pelo crawler, na thread dele.
+    
+    Returns:
+        Tuple[str, EventosColetados]: (texto do PDF ou '', avisos e erros)
+    """
+    eventos = EventosColetados()
+    try:
+        with response:
+            caminho = baixar_pdf(response)
+    except Exception as e:
+        eventos.erro(f"PDF ignorado: {e}")
+        return '', eventos
+    
+    try:
+        return carregar_pdf_arquivo(caminho, eventos=eventos), eventos
+    finally:
+        os.unlink(caminho)
+
+
+@instrumentar('carga_site')
+def carregar_site_url(url_site, max_paginas=20, eventos: Optional[EventosCarga] = None, reduzir=True,
+                      detector: Optional[DetectorDuplicatas] = None):
+    """
+    Motor de carregamento de sites: percorre páginas do mesmo domínio.
+    
+    Cada página é baixada uma única vez; o mesmo HTML é usado para extrair
+    o texto e os links internos. As conexões são reaproveitadas via Session.
+    Páginas quase duplicadas de outras já carregadas são descartadas e não
+    contam para max_paginas.
+    
+    O tipo de conteúdo é conferido antes de ler a resposta: PDFs (manuais
+    anexados) são baixados em blocos, validados (seguranca) e extraídos em
+    um pool separado (LIMITE_PDFS_SITE), enquanto o crawl do HTML continua;
+    contam para max_paginas. Outros tipos (imagens, arquivos) são ignorados.
+    
+    Args:
+        url_site (str): URL inicial do site
         max_paginas (int): Número máximo de páginas a carregar (padrão: 20)
+        eventos (EventosCarga, optional): Receptor de progresso/avisos/cancelamento
+        reduzir (bool): Se True, remove menus/rodapés repetidos entre páginas
+                        e normaliza espaços
+        detector (DetectorDuplicatas, optional): Detector de quase duplicatas;
+                        informe um para consultar a taxa de duplicação depois
     
     Returns:
-        str: Conteúdo completo do site extraído de múltiplas páginas
+        str: Conteúdo das páginas separadas por "=== PÁGINA: url ===" ('' em caso de falha)
     """
-    url_site = input('Digite a URL do site: ')
+    import requests
+    from bs4 import BeautifulSoup
+    
+    eventos = eventos or EventosCarga()
+    detector = detector or DetectorDuplicatas()
+    
+    urls_para_carregar = [url_site]
+    urls_carregadas = set()
+    urls_visitadas = set()
+    paginas = []  # (url, texto do HTML ou futuro da extração do PDF)
+    pool_pdfs = ThreadPoolExecutor(max_workers=LIMITE_PDFS_SITE, thread_name_prefix="site-pdf")
+    
+    # Limite de requisições, já que duplicatas não contam para max_paginas
+    max_requisicoes = max_paginas * 3
     
     try:
-        import requests
-        from urllib.parse import urlparse
-        
-        urls_para_carregar = [url_site]
-        urls_carregadas = set()
-        documento_completo = ''
-        
-        print(f"\nCarregando até {max_paginas} páginas do site...")
-        
-        while urls_para_carregar and len(urls_carregadas) < max_paginas:
-            url_atual = urls_para_carregar.pop(0)
-            
-            if url_atual in urls_carregadas:
-                continue
+        with requests.Session() as sessao:
+            sessao.headers.update(HEADERS_HTTP)
             
-            try:
-                print(f"  Carregando: {url_atual}")
-                loader = WebBaseLoader(url_atual)
-                lista_documentos = loader.load()
+            while urls_para_carregar and len(urls_carregadas) < max_paginas and len(urls_visitadas) < max_requisicoes:
+                if eventos.cancelado():
+                    eventos.aviso("Carregamento cancelado.")
+                    break
+                
+                url_atual = urls_para_carregar.pop(0)
+                
+                # Evita carregar a mesma URL duas vezes
+                if url_atual in urls_visitadas:
+                    continue
+                urls_visitadas.add(url_atual)
                 
-                if lista_documentos:
-                    conteudo = ''
-                    for doc in lista_documentos:
-                        conteudo += doc.page_content + '\n'
+                try:
+                    eventos.progresso(len(urls_carregadas), max_paginas, f"Carregando: {url_atual}")
+                    # Só os cabeçalhos são lidos aqui; o corpo depende do tipo de conteúdo
+                    response = sessao.get(url_atual, timeout=10, stream=True)
+                    response.raise_for_status()
                     
-                    documento_completo += f"\n\n=== PÁGINA: {url_atual} ===\n\n"
-                    documento_completo += conteudo
+                    if e_resposta_pdf(response, url_atual):
+                        paginas.append((url_atual, pool_pdfs.submit(_carregar_pdf_site, response, url_atual)))
+                        urls_carregadas.add(url_atual)
+                        continue
+                    
+                    if tipo_conteudo(response) not in TIPOS_HTML:
+                        eventos.aviso(f"Conteúdo ignorado ({tipo_conteudo(response)}): {url_atual}")
+                        response.close()
+                        continue
+                    
+                    soup = BeautifulSoup(html_resposta(response), 'html.parser')
+                    
+                    original = detector.verificar(url_atual, texto_principal_html(soup))
+                    if original is not None:
+                        eventos.aviso(f"Página ignorada (duplicata de {original}): {url_atual}")
+                        continue
+                    
+                    paginas.append((url_atual, extrair_texto_html(soup)))
                     
                     urls_carregadas.add(url_atual)
                     
                     # Extrai links se ainda não atingiu o limite
                     if len(urls_carregadas) < max_paginas:
-                        try:
-                            response = requests.get(url_atual, timeout=10, headers={
-                                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                            })
-                            if response.status_code == 200:
-                                links_encontrados = extrair_links_internos_terminal(url_atual, response.text)
-                                for link in links_encontrados:
-                                    if link not in urls_carregadas and link not in urls_para_carregar:
-                                        urls_para_carregar.append(link)
-                        except:
-                            pass
-                    
-            except Exception as e:
-                print(f"  ⚠️ Erro ao carregar {url_atual}: {str(e)[:50]}")
-                continue
-        
-        if documento_completo:
-            print(f"\n✓ Site carregado com sucesso! ({len(urls_carregadas)} páginas, {len(documento_completo)} caracteres)")
-            return documento_completo
-        else:
-            print("❌ Não foi possível carregar nenhuma página do site.")
-            return ''
+                        for link in extrair_links_internos(url_atual, soup):
+                            if link not in urls_visitadas and link not in urls_para_carregar:
+                                urls_para_carregar.append(link)
+                
+                except Exception as e:
+                    # Se uma página falhar, continua com as próximas
+                    eventos.aviso(f"Erro ao carregar {url_atual}: {str(e)[:50]}")
+                    continue
     
     except Exception as e:
-        print(f"Erro ao carregar o site: {e}")
+        eventos.erro(f"Erro ao carregar o site: {e}")
         return ''
+    finally:
+        pool_pdfs.shutdown(wait=True)
+    
+    # Texto dos PDFs (os eventos coletados no pool são repassados nesta thread)
+    pdfs = set()
+    resolvidas = []
+    for url_pagina, texto in paginas:
+        if not isinstance(texto, str):
+            texto, eventos_pdf = texto.result()
+            for mensagem in eventos_pdf.avisos + eventos_pdf.erros:
+                eventos.aviso(f"{mensagem} ({url_pagina})")
+            if not texto:
+                urls_carregadas.discard(url_pagina)
+                continue
+            pdfs.add(url_pagina)
+        resolvidas.append((url_pagina, texto))
+    paginas = resolvidas
+    
+    if detector.duplicadas:
+        eventos.info(f"Duplicatas descartadas: {detector.duplicadas}/{detector.verificadas} páginas "
+                     f"({detector.taxa_duplicacao:.0%})")
+    
+    # A redução entre páginas vale só para o HTML (os PDFs já são reduzidos na extração)
+    textos = [texto for _, texto in paginas]
+    html = [i for i, (url_pagina, _) in enumerate(paginas) if url_pagina not in pdfs]
+    if reduzir and html:
+        reduzidos, relatorio = reduzir_paginas([textos[i] for i in html])
+        for i, texto in zip(html, reduzidos):
+            textos[i] = texto
+        eventos.info(descrever_reducao(relatorio))
+    
+    documento_completo = ''
+    for (url_pagina, _), texto in zip(paginas, textos):
+        documento_completo += f"\n\n=== PÁGINA: {url_pagina} ===\n\n"
+        documento_completo += texto + '\n'
+    
+    if documento_completo:
+        eventos.info(f"✓ Site carregado com sucesso! ({len(urls_carregadas)} páginas, {len(documento_completo)} caracteres)")
+    else:
+        eventos.erro("Não foi possível carregar nenhuma página do site.")
+    
+    return documento_completo
+
+
+def _carregar_terminal(nome, funcao, *args, **kwargs):
+    """Executa o motor de carregamento no terminal, com perfil se NANDABOT_PERFIL=1."""
+    with perfilar(nome) as perfil:
+        documento = funcao(*args, eventos=EventosTerminal(), **kwargs)
+    if perfil:
+        imprimir_resumo(perfil)
+    return documento
+
+
+def carrega_site(url_site=None, max_paginas=20):
+    """
+    Carrega conteúdo de um site através da URL, incluindo múltiplas páginas.
+    
+    Args:
+        url_site (str, optional): URL do site. Se None, solicita input do usuário.
+        max_paginas (int): Número máximo de páginas a carregar (padrão: 20)
+    
+    Returns:
+        str: Conteúdo completo do site extraído de múltiplas páginas
+    """
+    if url_site is None:
+        url_site = input('Digite a URL do site: ')
+    
+    print(f"\nCarregando até {max_paginas} páginas do site...")
+    return _carregar_terminal('carga_site', carregar_site_url, url_site, max_paginas=max_paginas)
 
 
 def solicitar_upload_pdf() -> Optional[str]:
@@ -172,56 +488,110 @@ def solicitar_upload_pdf() -> Optional[str]:
         return None
 
 
-def carrega_pdf(caminho=None, validar_seguranca=True):
+def _juntar_paginas(paginas):
+    """Páginas do PDF separadas por quebra de linha, como em '\\n'.join(paginas)."""
+    for numero, pagina in enumerate(paginas):
+        yield ('\n' if numero else '') + pagina
+
+
+@instrumentar('carga_pdf')
+def carregar_pdf_arquivo(caminho, validar_seguranca=True, eventos: Optional[EventosCarga] = None, reduzir=True,
+                         limite_memoria: Optional[int] = None):
     """
-    Carrega conteúdo de um arquivo PDF com validação de segurança.
+    Motor de carregamento de PDFs com validação de segurança.
+    
+    As páginas extraídas vão comprimidas para um arquivo temporário à medida
+    que são lidas; com `limite_memoria`, PDFs maiores que o limite são
+    gravados direto em disco, página a página, sem montar a string inteira.
     
     Args:
-        caminho (str, optional): Caminho do arquivo PDF.
-                                Se None, solicita upload do usuário.
+        caminho (str): Caminho do arquivo PDF
         validar_seguranca (bool): Se True, valida segurança do PDF.
+        eventos (EventosCarga, optional): Receptor de progresso/avisos
+        reduzir (bool): Se True, remove cabeçalhos/rodapés repetidos entre
+                        páginas e normaliza espaços de layout
+        limite_memoria (int, optional): Bytes (medidos como sys.getsizeof do
+                        texto) acima dos quais o documento fica em disco
+                        (ex.: SessaoFontes.memoria_disponivel())
     
     Returns:
-        str: Conteúdo completo do PDF extraído
+        str ou DocumentoEmDisco: Conteúdo completo do PDF extraído ('' em caso de falha)
     """
-    if caminho is None:
-        if IN_COLAB:
-            # Caminho padrão para Colab
-            caminho = '/content/drive/MyDrive/Colab Notebooks/arquivos/App. Colibri  Pro versão 3.pdf'
-        else:
-            # Solicita upload do usuário
-            caminho = solicitar_upload_pdf()
-            if caminho is None:
-                return ''
+    eventos = eventos or EventosCarga()
     
     # Validação de segurança
     if validar_seguranca:
-        print("🔒 Validando segurança do PDF...")
+        eventos.progresso(0, 2, "🔒 Validando segurança do PDF...")
         sucesso, erro = validar_pdf_completo(caminho)
         
         if not sucesso:
-            print(f"❌ PDF rejeitado por segurança: {erro}")
+            eventos.erro(f"PDF rejeitado por segurança: {erro}")
             return ''
         
-        print("✓ Validação de segurança concluída")
+        eventos.progresso(1, 2, "✓ Validação de segurança concluída")
     
+    paginas = None
     try:
-        loader = PyPDFLoader(caminho)
-        lista_documentos = loader.load()
-        documento = ''
+        with span('extracao_pdf') as medicao:
+            from langchain_community.document_loaders import PyPDFLoader
+            
+            paginas = PaginasComprimidas()
+            for pagina in PyPDFLoader(caminho).lazy_load():
+                paginas.adicionar(pagina.page_content)
+            medicao.definir(paginas=len(paginas))
         
-        for doc in lista_documentos:
-            documento += doc.page_content
+        textos, relatorio = iter(paginas), None
+        if reduzir and len(paginas):
+            textos, relatorio = reduzir_paginas_em_fluxo(paginas)
         
-        print(f"✓ PDF carregado com sucesso! ({len(lista_documentos)} páginas, {len(documento)} caracteres)")
+        if limite_memoria is not None and paginas.tamanho > limite_memoria:
+            documento = DocumentoEmDisco(_juntar_paginas(textos))
+        else:
+            documento = ''.join(_juntar_paginas(textos))
+        
+        if relatorio:
+            eventos.info(descrever_reducao(relatorio))
+        eventos.progresso(2, 2, "✓ Texto extraído")
+        eventos.info(f"✓ PDF carregado com sucesso! ({len(paginas)} páginas, {len(documento)} caracteres)")
         return documento
     
     except FileNotFoundError:
-        print(f"❌ Erro: Arquivo não encontrado em {caminho}")
+        eventos.erro(f"Erro: Arquivo não encontrado em {caminho}")
         return ''
     except Exception as e:
-        print(f"❌ Erro ao carregar o PDF: {e}")
+        eventos.erro(f"Erro ao carregar o PDF: {e}")
         return ''
+    finally:
+        if paginas is not None:
+            paginas.fechar()
+
+
+def carrega_pdf(caminho=None, validar_seguranca=True, limite_memoria=None):
+    """
+    Carrega conteúdo de um arquivo PDF com validação de segurança.
+    
+    Args:
+        caminho (str, optional): Caminho do arquivo PDF.
+                                Se None, solicita upload do usuário.
+        validar_seguranca (bool): Se True, valida segurança do PDF.
+        limite_memoria (int, optional): Bytes acima dos quais o documento
+                                fica em disco (ver carregar_pdf_arquivo)
+    
+    Returns:
+        str ou DocumentoEmDisco: Conteúdo completo do PDF extraído
+    """
+    if caminho is None:
+        if IN_COLAB:
+            # Caminho padrão para Colab
+            caminho = '/content/drive/MyDrive/Colab Notebooks/arquivos/App. Colibri  Pro versão 3.pdf'
+        else:
+            # Solicita upload do usuário
+            caminho = solicitar_upload_pdf()
+            if caminho is None:
+                return ''
+    
+    return _carregar_terminal('carga_pdf', carregar_pdf_arquivo, caminho, validar_seguranca=validar_seguranca,
+                              limite_memoria=limite_memoria)
 
 
 def extract_video_id(url):
@@ -243,63 +613,67 @@ def extract_video_id(url):
     raise ValueError("ID do vídeo não encontrado na URL.")
 
 
-def carrega_youtube(url_youtube=None):
+@instrumentar('carga_youtube')
+def carregar_youtube_url(url_youtube, eventos: Optional[EventosCarga] = None, api=None):
     """
-    Carrega a transcrição de um vídeo do YouTube.
+    Motor de carregamento de transcrições do YouTube.
     
     Args:
-        url_youtube (str, optional): URL do vídeo do YouTube.
-                                    Se None, solicita input do usuário.
+        url_youtube (str): URL do vídeo do YouTube
+        eventos (EventosCarga, optional): Receptor de progresso/avisos
+        api (optional): Implementação da API de transcrições (padrão: YouTube)
     
     Returns:
-        str: Transcrição completa do vídeo
+        str: Transcrição completa do vídeo ('' em caso de falha)
     """
-    if url_youtube is None:
-        url_youtube = input("Digite a URL do vídeo: ")
-    
+    eventos = eventos or EventosCarga()
     documento = ''
     
     try:
         video_id = extract_video_id(url_youtube)
         
-        # Lista idiomas disponíveis
-        try:
-            transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-            print("Idiomas disponíveis:")
-            for transcript in transcript_list:
-                print(f"  - {transcript.language} ({transcript.language_code})")
-        except Exception as e:
-            print(f"Aviso: Não foi possível listar idiomas disponíveis: {e}")
+        # Uma listagem + uma busca (ou nenhuma requisição, se estiver em cache)
+        transcricao = buscar_transcricao(video_id, api=api)
         
-        # Tenta buscar em português primeiro
-        try:
-            transcript_data = YouTubeTranscriptApi.get_transcript(video_id, languages=['pt', 'pt-BR'])
-            documento = " ".join([item['text'] for item in transcript_data])
-            print(f"✓ Transcrição em português carregada com sucesso! ({len(documento)} caracteres)")
+        # Mantém os tempos: um trecho "=== TRECHO: [início - fim] ===" por janela
+        documento = transcricao_para_documento(transcricao)
         
-        except:
-            # Se não encontrar em português, busca em qualquer idioma disponível
-            try:
-                transcript_data = YouTubeTranscriptApi.get_transcript(video_id)
-                documento = " ".join([item['text'] for item in transcript_data])
-                print(f"✓ Transcrição carregada com sucesso! ({len(documento)} caracteres)")
-            except Exception as e:
-                print(f"Erro: Não foi possível obter a transcrição do vídeo: {e}")
-                documento = ''
+        origem = "cache" if transcricao.get('cache') else "YouTube"
+        eventos.info(
+            f"✓ Transcrição em {transcricao['nome_idioma']} carregada com sucesso! "
+            f"({len(documento)} caracteres, origem: {origem})"
+        )
         
         if not documento:
-            print("Aviso: Não foi possível obter a transcrição do vídeo (não possui legenda pública disponível).")
+            eventos.aviso("Não foi possível obter a transcrição do vídeo (não possui legenda pública disponível).")
     
     except ValueError as e:
-        print(f"Erro na URL: {e}")
+        eventos.erro(f"Erro: {e}")
         documento = ''
     except Exception as e:
-        print(f"Erro ao carregar transcrição: {e}")
+        eventos.erro(f"Não foi possível obter a transcrição do vídeo: {e}")
         documento = ''
     
     return documento
 
 
+def carrega_youtube(url_youtube=None):
+    """
+    Carrega a transcrição de um vídeo do YouTube.
+    
+    Args:
+        url_youtube (str, optional): URL do vídeo do YouTube.
+                                    Se None, solicita input do usuário.
+    
+    Returns:
+        str: Transcrição completa do vídeo
+    """
+    if url_youtube is None:
+        url_youtube = input("Digite a URL do vídeo: ")
+    
+    return _carregar_terminal('carga_youtube', carregar_youtube_url, url_youtube)
+
+
 # Exemplo de uso
 if __name__ == "__main__":
     print("=== Teste dos Carregadores ===\n")
@@ -310,8 +684,11 @@ if __name__ == "__main__":
     # documento_youtube = carrega_youtube()
     
     print("\nFunções disponíveis:")
-    print("- carrega_site()")
+    print("- carrega_site(url_site=None)")
     print("- carrega_pdf(caminho=None)")
     print("- carrega_youtube(url_youtube=None)")
+    print("- carregar_site_url(url, max_paginas, eventos)  # Sem input()")
+    print("- carregar_pdf_arquivo(caminho, eventos=eventos)  # Sem input()")
+    print("- carregar_youtube_url(url, eventos)  # Sem input()")
     print("- montar_drive()  # Apenas no Colab")
 
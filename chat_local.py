@@ -0,0 +1,109 @@
+"""
+Módulo do modelo de chat local
+Modelo de chat do LangChain para um servidor compatível com a API do OpenAI
+(/v1/chat/completions), usado pelo BackendLocal
+
+Importa o LangChain e o httpx; por isso só é importado na criação do primeiro
+cliente local (ver backends.BackendLocal.chat).
+"""
+
+import json
+from typing import Any, AsyncIterator, List, Optional
+
+import httpx
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from backends import URL_LOCAL, MODELO_LOCAL
+
+
+class ChatLocal(BaseChatModel):
+    """
+    Modelo de chat servido por um servidor local compatível com a API do OpenAI.
+
+    Args:
+        url: URL base do servidor (até /v1)
+        modelo: Nome do modelo informado ao servidor
+        timeout: Timeout padrão das requisições (segundos)
+        max_tokens: Limite de tokens da resposta (None usa o padrão do servidor)
+    """
+
+    url: str = URL_LOCAL
+    modelo: str = MODELO_LOCAL
+    timeout: float = 60.0
+    max_tokens: Optional[int] = None
+    temperatura: float = 0.2
+
+    @property
+    def _llm_type(self) -> str:
+        return 'local-openai'
+
+    @staticmethod
+    def _papel(mensagem: BaseMessage) -> str:
+        return {'human': 'user', 'ai': 'assistant'}.get(mensagem.type, mensagem.type)
+
+    def _corpo(self, messages: List[BaseMessage], stop: Optional[List[str]], stream: bool = False) -> dict:
+        corpo = {
+            'model': self.modelo,
+            'messages': [{'role': self._papel(m), 'content': m.content} for m in messages],
+            'temperature': self.temperatura,
+        }
+        if self.max_tokens:
+            corpo['max_tokens'] = self.max_tokens
+        if stop:
+            corpo['stop'] = stop
+        if stream:
+            corpo['stream'] = True
+            corpo['stream_options'] = {'include_usage': True}
+        return corpo
+
+    @staticmethod
+    def _uso(uso: dict) -> Optional[dict]:
+        if not uso:
+            return None
+        return {
+            'input_tokens': uso.get('prompt_tokens', 0),
+            'output_tokens': uso.get('completion_tokens', 0),
+            'total_tokens': uso.get('total_tokens', 0),
+        }
+
+    def _resultado(self, dados: dict) -> ChatResult:
+        mensagem = AIMessage(content=dados['choices'][0]['message'].get('content') or '')
+        uso = self._uso(dados.get('usage'))
+        if uso:
+            mensagem.usage_metadata = uso
+        return ChatResult(generations=[ChatGeneration(message=mensagem)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        resposta = httpx.post(f"{self.url.rstrip('/')}/chat/completions", json=self._corpo(messages, stop),
+                              timeout=kwargs.get('timeout') or self.timeout)
+        resposta.raise_for_status()
+        return self._resultado(resposta.json())
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        async with httpx.AsyncClient(timeout=kwargs.get('timeout') or self.timeout) as cliente:
+            resposta = await cliente.post(f"{self.url.rstrip('/')}/chat/completions", json=self._corpo(messages, stop))
+            resposta.raise_for_status()
+            return self._resultado(resposta.json())
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        async with httpx.AsyncClient(timeout=kwargs.get('timeout') or self.timeout) as cliente:
+            async with cliente.stream('POST', f"{self.url.rstrip('/')}/chat/completions",
+                                      json=self._corpo(messages, stop, stream=True)) as resposta:
+                resposta.raise_for_status()
+                async for linha in resposta.aiter_lines():
+                    if not linha.startswith('data:'):
+                        continue
+                    dados = linha[len('data:'):].strip()
+                    if dados == '[DONE]':
+                        break
+                    evento = json.loads(dados)
+                    escolhas = evento.get('choices') or [{}]
+                    texto = (escolhas[0].get('delta') or {}).get('content') or ''
+                    uso = self._uso(evento.get('usage'))
+                    if texto or uso:
+                        yield ChatGenerationChunk(message=AIMessageChunk(content=texto, usage_metadata=uso))
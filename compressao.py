@@ -0,0 +1,129 @@
+"""
+Módulo de compressão extrativa do contexto
+Mantém apenas as frases mais relacionadas à pergunta (e suas vizinhas)
+dentro de um orçamento de tokens, antes de montar o prompt
+"""
+
+import os
+import re
+from typing import List, Tuple
+from indice import IndiceLexico, dividir_secoes
+
+
+# Orçamento padrão do contexto comprimido (em tokens, ~4 caracteres por token)
+MAX_TOKENS_CONTEXTO = int(os.getenv('NANDABOT_TOKENS_CONTEXTO', '4000'))
+
+# Peso do histórico recente em relação à pergunta atual
+PESO_HISTORICO = 0.3
+
+# Frases vizinhas mantidas de cada lado de uma frase selecionada
+VIZINHOS = 1
+
+_PADRAO_FRASE = re.compile(r'(?<=[.!?;:])\s+|\n+')
+
+
+def dividir_frases(texto: str) -> List[str]:
+    """
+    Divide o texto em frases (pontuação final ou quebra de linha).
+
+    Args:
+        texto: Texto de uma seção
+
+    Returns:
+        List[str]: Frases não vazias
+    """
+    return [frase.strip() for frase in _PADRAO_FRASE.split(texto) if frase.strip()]
+
+
+def comprimir_contexto(contexto: str, pergunta: str, historico: str = '',
+                       max_tokens: int = MAX_TOKENS_CONTEXTO, vizinhos: int = VIZINHOS) -> str:
+    """
+    Comprime o contexto mantendo as frases relevantes para a pergunta.
+
+    As frases são pontuadas com BM25 contra a pergunta (e, com peso menor,
+    contra o histórico recente). As melhores frases e suas vizinhas são
+    mantidas até o orçamento, na ordem original e com os cabeçalhos das
+    seções (páginas/trechos). Trechos omitidos viram "[...]". Se nenhuma
+    frase tiver relação com a pergunta, são mantidas as primeiras frases do
+    contexto, dentro do orçamento.
+
+    Args:
+        contexto: Texto selecionado do documento
+        pergunta: Pergunta atual do usuário
+        historico: Mensagens recentes da conversa (texto livre)
+        max_tokens: Orçamento de tokens do contexto comprimido
+        vizinhos: Frases vizinhas mantidas ao redor de cada frase selecionada
+
+    Returns:
+        str: Contexto comprimido (ou o original, se já couber no orçamento)
+    """
+    max_caracteres = max_tokens * 4
+    if len(contexto) <= max_caracteres or not pergunta:
+        return contexto
+
+    secoes = dividir_secoes(contexto)
+    frases: List[Tuple[int, str]] = []
+    for posicao, (_, texto) in enumerate(secoes):
+        frases.extend((posicao, frase) for frase in dividir_frases(texto))
+
+    if not frases:
+        return contexto
+
+    indice = IndiceLexico([frase for _, frase in frases])
+    pontuacoes = indice.pontuar(pergunta)
+    if historico:
+        for i, pontuacao in enumerate(indice.pontuar(historico)):
+            pontuacoes[i] += PESO_HISTORICO * pontuacao
+
+    ordem = [i for i in sorted(range(len(frases)), key=lambda i: pontuacoes[i], reverse=True) if pontuacoes[i] > 0]
+    inicio = not ordem
+    if inicio:
+        # Nenhuma frase tem relação com a pergunta: mantém o começo do contexto
+        ordem, vizinhos = list(range(len(frases))), 0
+
+    # Seleciona as melhores frases com suas vizinhas (da mesma seção) até o orçamento
+    mantidas = set()
+    secoes_usadas = set()
+    tamanho = 0
+    for i in ordem:
+        posicao = frases[i][0]
+        grupo = [j for j in range(i - vizinhos, i + vizinhos + 1)
+                 if 0 <= j < len(frases) and frases[j][0] == posicao and j not in mantidas]
+        acrescimo = sum(len(frases[j][1]) + 1 for j in grupo)
+        if posicao not in secoes_usadas:
+            acrescimo += len(secoes[posicao][0]) + 4
+        if tamanho + acrescimo > max_caracteres:
+            if inicio:
+                break
+            continue
+        mantidas.update(grupo)
+        secoes_usadas.add(posicao)
+        tamanho += acrescimo
+
+    if not mantidas:
+        return contexto[:max_caracteres]
+
+    # Remonta o texto na ordem original, seção por seção
+    indices_por_secao = [[] for _ in secoes]
+    for j, (posicao, _) in enumerate(frases):
+        indices_por_secao[posicao].append(j)
+
+    partes = []
+    for (cabecalho, _), indices in zip(secoes, indices_por_secao):
+        if not any(j in mantidas for j in indices):
+            continue
+
+        texto = []
+        anterior_mantida = True
+        for j in indices:
+            if j in mantidas:
+                texto.append(frases[j][1])
+                anterior_mantida = True
+            elif anterior_mantida:
+                texto.append('[...]')
+                anterior_mantida = False
+
+        corpo = ' '.join(texto)
+        partes.append(f"{cabecalho}\n\n{corpo}" if cabecalho else corpo)
+
+    return '\n\n'.join(partes)
@@ -0,0 +1,130 @@
+"""
+Módulo de detecção de páginas quase duplicadas
+Assinaturas MinHash com LSH (locality-sensitive hashing) para descartar,
+durante o crawl, páginas com o mesmo conteúdo servidas em URLs diferentes
+(versões para impressão, variações de idioma, espelhos)
+"""
+
+import re
+import random
+import hashlib
+from collections import defaultdict
+from typing import List, Optional, Set
+
+
+# Primo de Mersenne usado nas permutações (a * x + b) mod P
+_PRIMO = (1 << 61) - 1
+_MASCARA = (1 << 32) - 1
+
+
+def gerar_shingles(texto: str, tamanho: int = 5) -> Set[int]:
+    """
+    Converte o texto em um conjunto de shingles (sequências de palavras) com hash.
+
+    Args:
+        texto: Texto da página
+        tamanho: Palavras por shingle
+
+    Returns:
+        Set[int]: Hash de 32 bits de cada shingle
+    """
+    palavras = re.findall(r'\w+', texto.lower())
+    if len(palavras) < tamanho:
+        palavras_shingles = [' '.join(palavras)] if palavras else []
+    else:
+        palavras_shingles = (' '.join(palavras[i:i + tamanho]) for i in range(len(palavras) - tamanho + 1))
+
+    return {
+        int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=4).digest(), 'little')
+        for s in palavras_shingles
+    }
+
+
+class DetectorDuplicatas:
+    """
+    Detector incremental de quase duplicatas (MinHash + LSH).
+
+    Cada página aceita é indexada em `bandas` tabelas; uma nova página só é
+    comparada com as páginas que caem no mesmo bucket em alguma banda.
+
+    Args:
+        num_permutacoes: Tamanho da assinatura MinHash
+        bandas: Quantidade de bandas do LSH (deve dividir num_permutacoes)
+        limiar: Similaridade de Jaccard estimada a partir da qual a página é duplicada
+        semente: Semente das permutações (assinaturas reprodutíveis)
+    """
+
+    def __init__(self, num_permutacoes: int = 64, bandas: int = 16, limiar: float = 0.85, semente: int = 42):
+        if num_permutacoes % bandas:
+            raise ValueError("num_permutacoes deve ser múltiplo de bandas")
+
+        gerador = random.Random(semente)
+        self.permutacoes = [(gerador.randrange(1, _PRIMO), gerador.randrange(0, _PRIMO))
+                            for _ in range(num_permutacoes)]
+        self.bandas = bandas
+        self.linhas = num_permutacoes // bandas
+        self.limiar = limiar
+
+        self.buckets = [defaultdict(list) for _ in range(bandas)]
+        self.assinaturas = {}
+        self.verificadas = 0
+        self.duplicadas = 0
+
+    def assinatura(self, texto: str) -> Optional[List[int]]:
+        """
+        Calcula a assinatura MinHash do texto.
+
+        Returns:
+            Optional[List[int]]: Assinatura ou None se o texto não tiver palavras
+        """
+        shingles = gerar_shingles(texto)
+        if not shingles:
+            return None
+        return [min(((a * s + b) % _PRIMO) & _MASCARA for s in shingles) for a, b in self.permutacoes]
+
+    @staticmethod
+    def similaridade(assinatura_a: List[int], assinatura_b: List[int]) -> float:
+        """Jaccard estimado: fração de posições iguais nas duas assinaturas."""
+        iguais = sum(1 for a, b in zip(assinatura_a, assinatura_b) if a == b)
+        return iguais / len(assinatura_a)
+
+    def _chaves_bandas(self, assinatura: List[int]):
+        for banda in range(self.bandas):
+            yield banda, tuple(assinatura[banda * self.linhas:(banda + 1) * self.linhas])
+
+    def verificar(self, chave: str, texto: str) -> Optional[str]:
+        """
+        Verifica se o texto é quase duplicado de uma página já aceita.
+
+        Páginas novas são registradas automaticamente.
+
+        Args:
+            chave: Identificador da página (ex.: URL)
+            texto: Conteúdo da página
+
+        Returns:
+            Optional[str]: Chave da página original se for duplicada, senão None
+        """
+        self.verificadas += 1
+        assinatura = self.assinatura(texto)
+        if assinatura is None:
+            return None
+
+        candidatas = set()
+        for banda, chave_banda in self._chaves_bandas(assinatura):
+            candidatas.update(self.buckets[banda].get(chave_banda, ()))
+
+        for candidata in candidatas:
+            if self.similaridade(assinatura, self.assinaturas[candidata]) >= self.limiar:
+                self.duplicadas += 1
+                return candidata
+
+        self.assinaturas[chave] = assinatura
+        for banda, chave_banda in self._chaves_bandas(assinatura):
+            self.buckets[banda][chave_banda].append(chave)
+        return None
+
+    @property
+    def taxa_duplicacao(self) -> float:
+        """Fração das páginas verificadas que foram descartadas como duplicadas."""
+        return self.duplicadas / self.verificadas if self.verificadas else 0.0
@@ -2,32 +2,94 @@
 Módulo de guardrails para filtrar conteúdo ofensivo, danoso, malicioso ou ilegal
 """
 
-import os
-from typing import Tuple, Optional
-from langchain_groq import ChatGroq
-from langchain_core.prompts import ChatPromptTemplate
-
-
-def _get_chat_instance():
-    """Obtém instância do chat (evita import circular)"""
-    # Importação local para evitar circular import
-    import os
-    from dotenv import load_dotenv
-    from pathlib import Path
-    from langchain_groq import ChatGroq
-    
-    # Carrega env se necessário
-    env_path = Path(__file__).parent / '.env'
-    load_dotenv(dotenv_path=env_path)
-    
-    api_key = os.getenv('GROQ_API_KEY')
-    if not api_key:
-        raise ValueError("GROQ_API_KEY não encontrada!")
-    
-    # Configura a API key no ambiente
-    os.environ['GROQ_API_KEY'] = api_key
-    
-    return ChatGroq(model='llama-3.3-70b-versatile')
+import re
+import asyncio
+from typing import List, Tuple, Optional
+from agendador import PRIORIDADE_INTERATIVA
+from modelos import invocar, invocar_async
+
+
+# Limite de caracteres para validação (evita custos altos)
+MAX_CARACTERES_VALIDACAO = 5000
+
+PROMPT_ENTRADA = [
+    ('system', '''Você é um filtro de segurança. Analise o conteúdo fornecido e determine se ele contém:
+- Conteúdo ofensivo, discriminatório ou de ódio
+- Instruções para atividades ilegais ou perigosas
+- Informações pessoais sensíveis (CPF, senhas, cartões)
+- Conteúdo malicioso ou código malicioso
+- Spam ou phishing
+
+Responda APENAS com "SEGURO" ou "PERIGOSO: [motivo]". Seja específico no motivo.'''),
+    ('user', 'Conteúdo para análise:\n\n{conteudo}')
+]
+
+PROMPT_SAIDA = [
+    ('system', '''Você é um filtro de segurança. Analise a resposta do assistente e determine se ela contém:
+- Conteúdo ofensivo, discriminatório ou de ódio
+- Instruções para atividades ilegais ou perigosas
+- Informações pessoais sensíveis
+- Conteúdo inapropriado
+
+REGRAS IMPORTANTES:
+- Se a resposta for SEGURA, retorne APENAS a resposta original, sem qualquer explicação ou texto adicional
+- Se for PERIGOSA, retorne APENAS: "PERIGOSO: [motivo]"
+- NÃO adicione explicações, não repita a resposta, não diga "a resposta é segura"
+- Retorne APENAS a resposta original se for segura, sem modificações'''),
+    ('user', 'Analise esta resposta e retorne APENAS a resposta original se for segura, ou "PERIGOSO: [motivo]" se for perigosa:\n\n{resposta}')
+]
+
+
+PROMPT_LOTE = [
+    ('system', '''Você é um filtro de segurança. Você receberá vários textos numerados ([1], [2], ...).
+Para CADA texto, determine se ele contém:
+- Conteúdo ofensivo, discriminatório ou de ódio
+- Instruções para atividades ilegais ou perigosas
+- Informações pessoais sensíveis (CPF, senhas, cartões)
+- Conteúdo malicioso, spam ou phishing
+
+Responda com UMA linha por texto, na ordem, no formato "N: SEGURO" ou "N: PERIGOSO: [motivo]".
+Não escreva nada além dessas linhas.'''),
+    ('user', 'Textos para análise:\n\n{textos}')
+]
+
+PROMPT_LOTE_SAIDA = [
+    ('system', '''Você é um filtro de segurança. Você receberá várias respostas de um assistente, numeradas ([1], [2], ...).
+Para CADA resposta, determine se ela contém:
+- Conteúdo ofensivo, discriminatório ou de ódio
+- Instruções para atividades ilegais ou perigosas
+- Informações pessoais sensíveis
+- Conteúdo inapropriado
+
+Responda com UMA linha por resposta, na ordem, no formato "N: SEGURO" ou "N: PERIGOSO: [motivo]".
+Não repita as respostas e não escreva nada além dessas linhas.'''),
+    ('user', 'Respostas para análise:\n\n{textos}')
+]
+
+PADRAO_LINHA_LOTE = re.compile(r'^\s*\[?(\d+)\]?\s*[:.)-]\s*(.+)$')
+
+
+def _interpretar_entrada(resposta: str) -> Tuple[bool, Optional[str]]:
+    """Converte a classificação do modelo em (seguro, motivo_rejeicao)."""
+    resposta = resposta.strip()
+    if resposta.upper().startswith('SEGURO'):
+        return True, None
+    # Extrai o motivo
+    motivo = resposta.split(':', 1)[1].strip() if ':' in resposta else "Conteúdo potencialmente perigoso detectado"
+    return False, motivo
+
+
+def _interpretar_saida(resultado: str, resposta: str) -> Tuple[bool, Optional[str]]:
+    """Converte a classificação do modelo em (seguro, resposta_filtrada)."""
+    resultado = resultado.strip()
+    if resultado.upper().startswith('PERIGOSO'):
+        motivo = resultado.split(':', 1)[1].strip() if ':' in resultado else "Resposta filtrada por segurança"
+        return False, f"[Resposta filtrada por segurança: {motivo}]"
+    # Se a resposta foi validada como segura, retorna a resposta original
+    # (evita qualquer texto explicativo que o modelo possa adicionar)
+    # A validação já confirmou que é segura, então não há necessidade de retornar
+    # a resposta do modelo de validação, apenas a original
+    return True, resposta
 
 
 def validar_conteudo_entrada(conteudo: str) -> Tuple[bool, Optional[str]]:
@@ -43,32 +105,10 @@ def validar_conteudo_entrada(conteudo: str) -> Tuple[bool, Optional[str]]:
     if not conteudo or len(conteudo.strip()) == 0:
         return True, None
     
-    # Limite de caracteres para validação (evita custos altos)
-    conteudo_limite = conteudo[:5000] if len(conteudo) > 5000 else conteudo
-    
-    prompt = ChatPromptTemplate.from_messages([
-        ('system', '''Você é um filtro de segurança. Analise o conteúdo fornecido e determine se ele contém:
-- Conteúdo ofensivo, discriminatório ou de ódio
-- Instruções para atividades ilegais ou perigosas
-- Informações pessoais sensíveis (CPF, senhas, cartões)
-- Conteúdo malicioso ou código malicioso
-- Spam ou phishing
-
-Responda APENAS com "SEGURO" ou "PERIGOSO: [motivo]". Seja específico no motivo.'''),
-        ('user', f'Conteúdo para análise:\n\n{conteudo_limite}')
-    ])
-    
     try:
-        chat = _get_chat_instance()
-        chain = prompt | chat
-        resposta = chain.invoke({}).content.strip()
-        
-        if resposta.upper().startswith('SEGURO'):
-            return True, None
-        else:
-            # Extrai o motivo
-            motivo = resposta.split(':', 1)[1].strip() if ':' in resposta else "Conteúdo potencialmente perigoso detectado"
-            return False, motivo
+        resposta = invocar(PROMPT_ENTRADA, {'conteudo': conteudo[:MAX_CARACTERES_VALIDACAO]}, PRIORIDADE_INTERATIVA,
+                           estagio='moderacao_entrada')
+        return _interpretar_entrada(resposta)
     
     except Exception as e:
         # Em caso de erro na validação, permite mas registra
@@ -89,43 +129,117 @@ def validar_resposta_saida(resposta: str) -> Tuple[bool, Optional[str]]:
     if not resposta or len(resposta.strip()) == 0:
         return True, resposta
     
-    # Valida usando IA
-    prompt = ChatPromptTemplate.from_messages([
-        ('system', '''Você é um filtro de segurança. Analise a resposta do assistente e determine se ela contém:
-- Conteúdo ofensivo, discriminatório ou de ódio
-- Instruções para atividades ilegais ou perigosas
-- Informações pessoais sensíveis
-- Conteúdo inapropriado
+    try:
+        resultado = invocar(PROMPT_SAIDA, {'resposta': resposta}, PRIORIDADE_INTERATIVA,
+                            estagio='moderacao_saida')
+        return _interpretar_saida(resultado, resposta)
+    
+    except Exception as e:
+        # Em caso de erro, permite mas retorna resposta genérica
+        print(f"⚠️ Aviso: Erro na validação de resposta: {e}")
+        return True, resposta
 
-REGRAS IMPORTANTES:
-- Se a resposta for SEGURA, retorne APENAS a resposta original, sem qualquer explicação ou texto adicional
-- Se for PERIGOSA, retorne APENAS: "PERIGOSO: [motivo]"
-- NÃO adicione explicações, não repita a resposta, não diga "a resposta é segura"
-- Retorne APENAS a resposta original se for segura, sem modificações'''),
-        ('user', f'Analise esta resposta e retorne APENAS a resposta original se for segura, ou "PERIGOSO: [motivo]" se for perigosa:\n\n{resposta}')
-    ])
+
+async def validar_conteudo_entrada_async(conteudo: str) -> Tuple[bool, Optional[str]]:
+    """Versão assíncrona de validar_conteudo_entrada."""
+    if not conteudo or len(conteudo.strip()) == 0:
+        return True, None
     
     try:
-        chat = _get_chat_instance()
-        chain = prompt | chat
-        resultado = chain.invoke({}).content.strip()
-        
-        if resultado.upper().startswith('PERIGOSO'):
-            motivo = resultado.split(':', 1)[1].strip() if ':' in resultado else "Resposta filtrada por segurança"
-            return False, f"[Resposta filtrada por segurança: {motivo}]"
-        else:
-            # Se a resposta foi validada como segura, retorna a resposta original
-            # (evita qualquer texto explicativo que o modelo possa adicionar)
-            # A validação já confirmou que é segura, então não há necessidade de retornar
-            # a resposta do modelo de validação, apenas a original
-            return True, resposta
+        resposta = await invocar_async(PROMPT_ENTRADA, {'conteudo': conteudo[:MAX_CARACTERES_VALIDACAO]},
+                                       PRIORIDADE_INTERATIVA, estagio='moderacao_entrada')
+        return _interpretar_entrada(resposta)
+    
+    except Exception as e:
+        print(f"⚠️ Aviso: Erro na validação de conteúdo: {e}")
+        return True, None
+
+
+async def validar_resposta_saida_async(resposta: str) -> Tuple[bool, Optional[str]]:
+    """Versão assíncrona de validar_resposta_saida."""
+    if not resposta or len(resposta.strip()) == 0:
+        return True, resposta
+    
+    try:
+        resultado = await invocar_async(PROMPT_SAIDA, {'resposta': resposta}, PRIORIDADE_INTERATIVA,
+                                        estagio='moderacao_saida')
+        return _interpretar_saida(resultado, resposta)
     
     except Exception as e:
-        # Em caso de erro, permite mas retorna resposta genérica
         print(f"⚠️ Aviso: Erro na validação de resposta: {e}")
         return True, resposta
 
 
+def _grupos_lote(textos: List[str]) -> List[List[int]]:
+    """Agrupa os índices dos textos em lotes de até MAX_CARACTERES_VALIDACAO caracteres."""
+    grupos, atual, tamanho = [], [], 0
+    for i, texto in enumerate(textos):
+        if atual and tamanho + len(texto) > MAX_CARACTERES_VALIDACAO:
+            grupos.append(atual)
+            atual, tamanho = [], 0
+        atual.append(i)
+        tamanho += len(texto)
+    if atual:
+        grupos.append(atual)
+    return grupos
+
+
+def _interpretar_lote(resposta: str, quantidade: int) -> dict:
+    """Classificações por número do texto (1..quantidade) encontradas na resposta do modelo."""
+    resultados = {}
+    for linha in resposta.splitlines():
+        encontrado = PADRAO_LINHA_LOTE.match(linha)
+        if encontrado and 1 <= int(encontrado.group(1)) <= quantidade:
+            resultados[int(encontrado.group(1))] = _interpretar_entrada(encontrado.group(2))
+    return resultados
+
+
+async def validar_lote_async(textos: List[str], estagio: str = 'moderacao_entrada') -> List[Tuple[bool, Optional[str]]]:
+    """
+    Valida vários textos com uma chamada ao modelo por lote (lista numerada)
+    em vez de uma chamada por texto.
+
+    Textos que o modelo não classificar são validados individualmente.
+    Perguntas são limitadas a MAX_CARACTERES_VALIDACAO caracteres, como na
+    validação individual; respostas são validadas inteiras.
+
+    Args:
+        textos: Textos a validar (perguntas ou respostas)
+        estagio: Estágio do turno (moderacao_entrada ou moderacao_saida)
+
+    Returns:
+        List[Tuple[bool, Optional[str]]]: (seguro, motivo_rejeicao) de cada texto, na ordem
+    """
+    resultados: List[Tuple[bool, Optional[str]]] = [(True, None)] * len(textos)
+    saida = estagio == 'moderacao_saida'
+    textos = [(texto or '').strip() for texto in textos]
+    if not saida:
+        textos = [texto[:MAX_CARACTERES_VALIDACAO] for texto in textos]
+    pendentes = [i for i, texto in enumerate(textos) if texto]
+
+    async def validar_grupo(grupo):
+        numerados = '\n\n'.join(f"[{n}] {textos[i]}" for n, i in enumerate(grupo, 1))
+        try:
+            resposta = await invocar_async(PROMPT_LOTE_SAIDA if saida else PROMPT_LOTE, {'textos': numerados},
+                                           PRIORIDADE_INTERATIVA, estagio=estagio)
+            classificados = _interpretar_lote(resposta, len(grupo))
+        except Exception as e:
+            print(f"⚠️ Aviso: Erro na validação em lote: {e}")
+            classificados = {}
+        for n, i in enumerate(grupo, 1):
+            if n in classificados:
+                resultados[i] = classificados[n]
+            elif saida:
+                seguro, filtrada = await validar_resposta_saida_async(textos[i])
+                resultados[i] = (seguro, None if seguro else filtrada)
+            else:
+                resultados[i] = await validar_conteudo_entrada_async(textos[i])
+
+    grupos = _grupos_lote([textos[i] for i in pendentes])
+    await asyncio.gather(*(validar_grupo([pendentes[j] for j in grupo]) for grupo in grupos))
+    return resultados
+
+
 def sanitizar_entrada_usuario(entrada: str) -> str:
     """
     Sanitiza entrada do usuário removendo caracteres potencialmente perigosos.
@@ -0,0 +1,262 @@
+"""
+Módulo de indexação lexical dos documentos
+Divide o documento em seções (páginas de site, trechos de vídeo) e
+ranqueia as seções por relevância para uma pergunta (BM25)
+"""
+
+import re
+import math
+import unicodedata
+from collections import Counter
+from typing import List, Tuple
+
+
+# Marcadores de seção gerados pelos carregadores:
+#   === PÁGINA: https://site/pagina ===
+#   === TRECHO: [00:02:00 - 00:04:00] ===
+#   === FONTE: pdf | manual.pdf ===      (documentos carregados em lote, sem marcadores próprios)
+#   === FONTE: site | https://site · PÁGINA: https://site/pagina ===   (fonte como prefixo, ver cabecalho_fonte)
+PADRAO_SECAO = re.compile(r'^=== (FONTE|PÁGINA|TRECHO): (.*?) ===[ \t]*$', re.MULTILINE)
+
+# Seções sem marcadores internos (ex.: o texto de um PDF) maiores que isso
+# são divididas em partes, para que o índice possa selecionar só o trecho relevante
+TAMANHO_MAXIMO_SECAO = 4000
+
+# Palavras muito frequentes que não ajudam a distinguir seções
+STOPWORDS = set('''
+a o as os um uma uns umas de do da dos das em no na nos nas por pelo pela pelos pelas
+para pra com sem sob sobre entre ate e ou mas que se nao sim como quando onde qual quais
+quem cujo ja mais menos muito muita muitos muitas ao aos isso isto esse essa este esta
+aquele aquela ele ela eles elas eu tu voce voces nos meu minha seu sua seus suas lhe
+ser estar ter haver foi era sao esta estao tem ha fazer faz
+the of and to in is it for on that this with are be as at by an or
+'''.split())
+
+
+def remover_acentos(texto: str) -> str:
+    """Remove acentos para que 'informação' e 'informacao' casem."""
+    normalizado = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in normalizado if not unicodedata.combining(c))
+
+
+def tokenizar(texto: str) -> List[str]:
+    """
+    Converte texto em termos para busca.
+
+    Args:
+        texto: Texto livre
+
+    Returns:
+        List[str]: Termos em minúsculas, sem acentos e sem stopwords
+    """
+    termos = re.findall(r'\w{2,}', remover_acentos(texto.lower()))
+    return [t for t in termos if t not in STOPWORDS]
+
+
+def cabecalho_fonte(fonte: str, cabecalho: str = '') -> str:
+    """
+    Cabeçalho de seção com a fonte como prefixo.
+
+    Args:
+        fonte: Identificação da fonte ("tipo | origem")
+        cabecalho: Cabeçalho da seção na fonte ('' se a fonte não tem marcadores)
+
+    Returns:
+        str: "=== FONTE: fonte ===" ou "=== FONTE: fonte · PÁGINA: url ===";
+        cabeçalhos que já indicam a fonte são mantidos
+    """
+    marcador = PADRAO_SECAO.match(cabecalho)
+    if marcador is None:
+        return f"=== FONTE: {fonte} ==="
+    if marcador.group(1) == 'FONTE':
+        return cabecalho
+    return f"=== FONTE: {fonte} · {marcador.group(1)}: {marcador.group(2)} ==="
+
+
+def _partes(texto: str, tamanho: int = TAMANHO_MAXIMO_SECAO) -> List[str]:
+    """Divide o texto em partes de até `tamanho` caracteres, cortando em parágrafos ou linhas."""
+    partes = []
+    while len(texto) > tamanho:
+        corte = texto.rfind('\n\n', tamanho // 2, tamanho)
+        if corte < 0:
+            corte = texto.rfind('\n', tamanho // 2, tamanho)
+        if corte < 0:
+            corte = texto.rfind(' ', tamanho // 2, tamanho)
+        corte = corte if corte > 0 else tamanho
+        partes.append(texto[:corte].strip())
+        texto = texto[corte:].strip()
+    partes.append(texto)
+    return partes
+
+
+def dividir_secoes(documento: str) -> List[Tuple[str, str]]:
+    """
+    Divide o documento pelos marcadores de seção.
+
+    Seções maiores que TAMANHO_MAXIMO_SECAO (ex.: um PDF inteiro, sem
+    marcadores) são divididas em partes com o mesmo cabeçalho.
+
+    Args:
+        documento: Documento completo (string ou armazenamento.DocumentoEmDisco)
+
+    Returns:
+        List[Tuple[str, str]]: (cabecalho, texto) de cada seção, com o texto sem
+        espaços nas bordas. O texto antes do primeiro marcador (se houver) vem
+        com cabeçalho ''. Para documentos em disco, uma sequência lida sob demanda.
+    """
+    if not isinstance(documento, str):
+        return documento.secoes()
+
+    secoes = []
+    posicao = 0
+    cabecalho = ''
+
+    def adicionar(texto: str):
+        if cabecalho or texto:
+            secoes.extend((cabecalho, parte) for parte in _partes(texto))
+
+    for marcador in PADRAO_SECAO.finditer(documento):
+        adicionar(documento[posicao:marcador.start()].strip())
+        cabecalho = marcador.group(0).strip()
+        posicao = marcador.end()
+
+    adicionar(documento[posicao:].strip())
+    return secoes
+
+
+def juntar_secoes(secoes: List[Tuple[str, str]]) -> str:
+    """Reconstrói o texto de uma lista de seções (inverso de dividir_secoes)."""
+    return '\n\n'.join(f"{cabecalho}\n\n{texto}" if cabecalho else texto for cabecalho, texto in secoes)
+
+
+class IndiceLexico:
+    """
+    Índice BM25 em memória sobre uma lista de textos.
+
+    Args:
+        textos: Textos a indexar (a posição na lista ou no iterável é o identificador)
+        k1, b: Parâmetros do BM25
+    """
+
+    def __init__(self, textos: List[str], k1: float = 1.5, b: float = 0.75):
+        self._indexar([Counter(tokenizar(texto)) for texto in textos], k1, b)
+
+    @classmethod
+    def de_frequencias(cls, frequencias: List[Counter], k1: float = 1.5, b: float = 0.75) -> 'IndiceLexico':
+        """Índice a partir das frequências de termos já contadas (sem tokenizar de novo)."""
+        indice = cls.__new__(cls)
+        indice._indexar(list(frequencias), k1, b)
+        return indice
+
+    def _indexar(self, frequencias: List[Counter], k1: float, b: float):
+        self.k1 = k1
+        self.b = b
+        self.frequencias = frequencias
+        self.tamanhos = [sum(f.values()) for f in self.frequencias]
+        self.tamanho_medio = (sum(self.tamanhos) / len(self.tamanhos)) if self.tamanhos else 0.0
+
+        documentos_por_termo = Counter()
+        for frequencia in self.frequencias:
+            documentos_por_termo.update(frequencia.keys())
+
+        total = len(self.frequencias)
+        self.idf = {
+            termo: math.log(1 + (total - n + 0.5) / (n + 0.5))
+            for termo, n in documentos_por_termo.items()
+        }
+
+    def __len__(self):
+        return len(self.frequencias)
+
+    def pontuar(self, consulta: str) -> List[float]:
+        """
+        Calcula a pontuação BM25 de cada texto para a consulta.
+
+        Args:
+            consulta: Pergunta ou termos de busca
+
+        Returns:
+            List[float]: Pontuação de cada texto, na ordem de indexação
+        """
+        termos = [t for t in set(tokenizar(consulta)) if t in self.idf]
+        pontuacoes = [0.0] * len(self.frequencias)
+        if not termos or not self.tamanho_medio:
+            return pontuacoes
+
+        for i, frequencia in enumerate(self.frequencias):
+            normalizacao = self.k1 * (1 - self.b + self.b * self.tamanhos[i] / self.tamanho_medio)
+            total = 0.0
+            for termo in termos:
+                f = frequencia.get(termo)
+                if f:
+                    total += self.idf[termo] * f * (self.k1 + 1) / (f + normalizacao)
+            pontuacoes[i] = total
+
+        return pontuacoes
+
+    def buscar(self, consulta: str, k: int = 5) -> List[Tuple[int, float]]:
+        """
+        Retorna os k textos mais relevantes.
+
+        Args:
+            consulta: Pergunta ou termos de busca
+            k: Quantidade máxima de resultados
+
+        Returns:
+            List[Tuple[int, float]]: (posição, pontuação), da maior para a menor,
+            apenas com pontuação positiva
+        """
+        pontuacoes = self.pontuar(consulta)
+        ordem = sorted(range(len(pontuacoes)), key=lambda i: pontuacoes[i], reverse=True)
+        return [(i, pontuacoes[i]) for i in ordem[:k] if pontuacoes[i] > 0]
+
+
+class IndiceSecoes:
+    """
+    Índice das seções de um documento, construído uma única vez por documento.
+
+    Args:
+        documento: Documento completo com marcadores de seção
+    """
+
+    def __init__(self, documento: str):
+        self.secoes = dividir_secoes(documento)
+        self.indice = IndiceLexico(f"{cabecalho} {texto}" for cabecalho, texto in self.secoes)
+
+    def selecionar(self, consulta: str, max_caracteres: int) -> Tuple[List[Tuple[str, str]], int]:
+        """
+        Seleciona as seções mais relevantes que cabem no limite de caracteres.
+
+        As seções escolhidas são devolvidas na ordem original do documento.
+
+        Args:
+            consulta: Pergunta do usuário
+            max_caracteres: Limite de caracteres das seções selecionadas
+
+        Returns:
+            Tuple[List[Tuple[str, str]], int]: (seções selecionadas, seções omitidas).
+            Lista vazia se nenhuma seção tiver relação com a consulta.
+        """
+        pontuacoes = self.indice.pontuar(consulta)
+        ordem = sorted(range(len(self.secoes)), key=lambda i: pontuacoes[i], reverse=True)
+
+        escolhidas = []
+        tamanho_atual = 0
+        for i in ordem:
+            if pontuacoes[i] <= 0:
+                break
+            cabecalho, texto = self.secoes[i]
+            tamanho = len(cabecalho) + len(texto) + 4
+            if tamanho_atual + tamanho <= max_caracteres:
+                escolhidas.append(i)
+                tamanho_atual += tamanho
+
+        escolhidas.sort()
+        return [self.secoes[i] for i in escolhidas], len(self.secoes) - len(escolhidas)
+
+    def termos(self) -> Counter:
+        """Frequência de cada termo no documento inteiro (soma das seções)."""
+        total = Counter()
+        for frequencia in self.indice.frequencias:
+            total.update(frequencia)
+        return total
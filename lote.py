@@ -0,0 +1,313 @@
+"""
+Módulo de carregamento em lote
+Carrega várias fontes (sites, PDFs, vídeos e playlists do YouTube)
+em paralelo e junta tudo em um único documento
+
+Uso pela linha de comando:
+    python lote.py manifesto.json [--saida documento.txt]
+"""
+
+import re
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator, List, Optional, Tuple
+from indice import PADRAO_SECAO, cabecalho_fonte, dividir_secoes
+from carregadores import (
+    EventosCarga, EventosColetados, HEADERS_HTTP,
+    carregar_site_url, carregar_pdf_arquivo, carregar_youtube_url
+)
+
+
+# Quantidade máxima de carregamentos simultâneos por tipo de fonte
+LIMITES_WORKERS = {
+    'site': 2,      # cada site já faz várias requisições em sequência
+    'pdf': 2,       # validação e extração usam CPU
+    'youtube': 4,   # apenas duas requisições leves por vídeo
+}
+
+TIPOS_VALIDOS = ('site', 'pdf', 'youtube', 'playlist')
+
+
+def detectar_tipo(origem: str) -> str:
+    """
+    Deduz o tipo da fonte a partir da URL ou caminho.
+
+    Args:
+        origem: URL ou caminho do arquivo
+
+    Returns:
+        str: 'playlist', 'youtube', 'pdf' ou 'site'
+    """
+    origem_lower = origem.lower()
+    if 'youtube.com' in origem_lower or 'youtu.be' in origem_lower:
+        if 'list=' in origem_lower and 'v=' not in origem_lower:
+            return 'playlist'
+        return 'youtube'
+    if origem_lower.split('?')[0].endswith('.pdf'):
+        return 'pdf'
+    return 'site'
+
+
+def ler_manifesto(caminho: str) -> List[dict]:
+    """
+    Lê o manifesto de fontes.
+
+    Aceita um JSON (lista de {"tipo", "origem", "max_paginas"} ou de strings)
+    ou um arquivo texto com uma URL/caminho por linha (linhas com # são ignoradas).
+
+    Args:
+        caminho: Caminho do manifesto
+
+    Returns:
+        List[dict]: Fontes com as chaves tipo e origem (e opcionais)
+
+    Raises:
+        ValueError: Se o manifesto tiver um tipo de fonte desconhecido
+    """
+    with open(caminho, 'r', encoding='utf-8') as f:
+        conteudo = f.read()
+
+    if caminho.lower().endswith('.json'):
+        itens = json.loads(conteudo)
+    else:
+        itens = [linha.strip() for linha in conteudo.splitlines()
+                 if linha.strip() and not linha.strip().startswith('#')]
+
+    fontes = []
+    for item in itens:
+        fonte = {'origem': item} if isinstance(item, str) else dict(item)
+        fonte.setdefault('tipo', detectar_tipo(fonte['origem']))
+        if fonte['tipo'] not in TIPOS_VALIDOS:
+            raise ValueError(f"Tipo de fonte inválido: {fonte['tipo']} ({fonte['origem']})")
+        fontes.append(fonte)
+
+    return fontes
+
+
+def extrair_videos_playlist(url_playlist: str) -> List[str]:
+    """
+    Obtém as URLs dos vídeos de uma playlist do YouTube.
+
+    Args:
+        url_playlist: URL da playlist (com parâmetro list=)
+
+    Returns:
+        List[str]: URLs dos vídeos na ordem da playlist, sem repetições
+    """
+    import requests
+
+    response = requests.get(url_playlist, timeout=10, headers=HEADERS_HTTP)
+    response.raise_for_status()
+
+    ids = dict.fromkeys(re.findall(r'"videoId":"([0-9A-Za-z_-]{11})"', response.text))
+    return [f"https://www.youtube.com/watch?v={video_id}" for video_id in ids]
+
+
+def expandir_playlists(fontes: List[dict]) -> List[dict]:
+    """Substitui cada playlist pelos seus vídeos (playlists com erro são mantidas para o relatório)."""
+    expandidas = []
+    for fonte in fontes:
+        if fonte['tipo'] != 'playlist':
+            expandidas.append(fonte)
+            continue
+        try:
+            for url in extrair_videos_playlist(fonte['origem']):
+                expandidas.append({'tipo': 'youtube', 'origem': url, 'playlist': fonte['origem']})
+        except Exception as e:
+            expandidas.append({**fonte, 'erro': f"Erro ao ler playlist: {e}"})
+    return expandidas
+
+
+def carregar_fonte(fonte: dict) -> dict:
+    """
+    Carrega uma fonte e mede o tempo gasto.
+
+    Args:
+        fonte: Fonte do manifesto (tipo, origem e opções, ver ler_manifesto)
+
+    Returns:
+        dict: A fonte com documento, segundos, erro e avisos
+    """
+    eventos = EventosColetados()
+    inicio = time.perf_counter()
+
+    if fonte['tipo'] == 'site':
+        documento = carregar_site_url(fonte['origem'], max_paginas=fonte.get('max_paginas', 20), eventos=eventos)
+    elif fonte['tipo'] == 'pdf':
+        documento = carregar_pdf_arquivo(fonte['origem'], eventos=eventos)
+    else:
+        documento = carregar_youtube_url(fonte['origem'], eventos=eventos)
+
+    return {
+        **fonte,
+        'documento': documento,
+        'segundos': time.perf_counter() - inicio,
+        'erro': None if documento else ('; '.join(eventos.erros) or 'Nenhum conteúdo carregado'),
+        'avisos': eventos.avisos,
+    }
+
+
+def carregar_lote(fontes: List[dict], limites: Optional[dict] = None, eventos: Optional[EventosCarga] = None) -> List[dict]:
+    """
+    Carrega várias fontes em paralelo, com um pool de workers por tipo.
+
+    Args:
+        fontes: Fontes (tipo, origem) — ver ler_manifesto
+        limites: Workers por tipo (padrão: LIMITES_WORKERS)
+        eventos (EventosCarga, optional): Recebe o progresso do lote
+
+    Returns:
+        List[dict]: Um resultado por fonte, na ordem das fontes, com
+        documento, segundos, erro e avisos
+    """
+    limites = {**LIMITES_WORKERS, **(limites or {})}
+    eventos = eventos or EventosCarga()
+    fontes = expandir_playlists(fontes)
+    resultados = [None] * len(fontes)
+
+    pools = {tipo: ThreadPoolExecutor(max_workers=limite, thread_name_prefix=f"lote-{tipo}")
+             for tipo, limite in limites.items()}
+    try:
+        futuros = {}
+        for posicao, fonte in enumerate(fontes):
+            if fonte.get('erro'):
+                resultados[posicao] = {**fonte, 'documento': '', 'segundos': 0.0, 'avisos': []}
+                continue
+            futuros[pools[fonte['tipo']].submit(carregar_fonte, fonte)] = posicao
+
+        concluidas = len(fontes) - len(futuros)
+        for futuro in as_completed(futuros):
+            posicao = futuros[futuro]
+            try:
+                resultados[posicao] = futuro.result()
+            except Exception as e:
+                resultados[posicao] = {**fontes[posicao], 'documento': '', 'segundos': 0.0,
+                                       'erro': str(e), 'avisos': []}
+            concluidas += 1
+            eventos.progresso(concluidas, len(fontes), f"Concluído: {fontes[posicao]['origem']}")
+            if eventos.cancelado():
+                for pendente in futuros:
+                    pendente.cancel()
+                break
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    return [r for r in resultados if r is not None]
+
+
+def secoes_documentos(resultados: List[dict]) -> Iterator[Tuple[str, str]]:
+    """
+    Seções de cada documento carregado, com a fonte como prefixo no cabeçalho.
+
+    Equivale a indice.dividir_secoes(juntar_documentos(resultados)), fonte por
+    fonte, sem montar o documento combinado.
+
+    Args:
+        resultados: Retorno de carregar_lote
+
+    Yields:
+        Tuple[str, str]: (cabecalho, texto) de cada seção, com até indice.TAMANHO_MAXIMO_SECAO caracteres
+    """
+    for resultado in resultados:
+        if resultado['documento']:
+            fonte = f"{resultado['tipo']} | {resultado['origem']}"
+            for cabecalho, texto in dividir_secoes(resultado['documento']):
+                yield cabecalho_fonte(fonte, cabecalho), texto
+
+
+def juntar_documentos(resultados: List[dict]) -> str:
+    """
+    Junta os documentos carregados em um único documento com a fonte de cada parte.
+
+    A fonte entra como prefixo no cabeçalho de cada página ou trecho
+    ("=== FONTE: site | origem · PÁGINA: url ===", ver indice.cabecalho_fonte);
+    fontes sem marcadores próprios (PDFs) recebem um marcador "=== FONTE: tipo | origem ===".
+
+    Args:
+        resultados: Retorno de carregar_lote
+
+    Returns:
+        str: Documento combinado
+    """
+    documento = ''
+    for resultado in resultados:
+        if resultado['documento']:
+            fonte = f"{resultado['tipo']} | {resultado['origem']}"
+            texto = PADRAO_SECAO.sub(lambda marcador: cabecalho_fonte(fonte, marcador.group(0)), resultado['documento'])
+            if not PADRAO_SECAO.match(texto.lstrip()):
+                texto = f"{cabecalho_fonte(fonte)}\n\n{texto}"
+            documento += f"\n\n{texto.strip()}\n"
+    return documento
+
+
+def imprimir_relatorio(resultados: List[dict]):
+    """Exibe o tempo e o status de cada fonte do lote."""
+    print("\n=== Relatório do lote ===")
+    for resultado in resultados:
+        status = "✓" if resultado['documento'] else "❌"
+        detalhe = f"{len(resultado['documento'])} caracteres" if resultado['documento'] else resultado['erro']
+        print(f"{status} [{resultado['tipo']}] {resultado['origem']} ({resultado['segundos']:.2f}s): {detalhe}")
+        for aviso in resultado.get('avisos', []):
+            print(f"    ⚠️ {aviso}")
+
+    sucesso = sum(1 for r in resultados if r['documento'])
+    print(f"\n{sucesso}/{len(resultados)} fontes carregadas")
+
+
+def carrega_lote(caminho_manifesto=None, juntar=True):
+    """
+    Carrega as fontes de um manifesto (versão terminal).
+
+    Args:
+        caminho_manifesto (str, optional): Caminho do manifesto.
+                                          Se None, solicita input do usuário.
+        juntar (bool): Se junta as fontes em um único documento
+
+    Returns:
+        str: Documento combinado de todas as fontes
+        (com juntar=False, a lista de resultados de carregar_lote)
+    """
+    if caminho_manifesto is None:
+        caminho_manifesto = input('Digite o caminho do manifesto (JSON ou uma fonte por linha): ').strip().strip('"').strip("'")
+
+    try:
+        fontes = ler_manifesto(caminho_manifesto)
+    except Exception as e:
+        print(f"❌ Erro ao ler o manifesto: {e}")
+        return '' if juntar else []
+
+    print(f"\nCarregando {len(fontes)} fonte(s) em paralelo...")
+    resultados = carregar_lote(fontes)
+    imprimir_relatorio(resultados)
+    return juntar_documentos(resultados) if juntar else resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Carrega várias fontes em paralelo para o NandaBot")
+    parser.add_argument('manifesto', help="JSON com as fontes ou arquivo texto com uma fonte por linha")
+    parser.add_argument('--saida', help="Arquivo onde salvar o documento combinado")
+    for tipo, limite in LIMITES_WORKERS.items():
+        parser.add_argument(f'--workers-{tipo}', type=int, default=limite,
+                            help=f"Carregamentos simultâneos de {tipo} (padrão: {limite})")
+    args = parser.parse_args(argv)
+
+    fontes = ler_manifesto(args.manifesto)
+    limites = {tipo: getattr(args, f'workers_{tipo}') for tipo in LIMITES_WORKERS}
+    resultados = carregar_lote(fontes, limites)
+    imprimir_relatorio(resultados)
+
+    documento = juntar_documentos(resultados)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            f.write(documento)
+        print(f"Documento salvo em {args.saida} ({len(documento)} caracteres)")
+
+    return 0 if documento else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
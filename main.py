@@ -5,6 +5,15 @@ Integra o bot com os carregadores de documentos
 
 from bot import resposta_bot
 from carregadores import carrega_site, carrega_pdf, carrega_youtube
+from lote import carrega_lote
+from armazenamento import descrever_armazenamento
+from sessao import SessaoFontes
+from pacotes import abrir_pacotes, descrever_pacote
+from roteamento import roteador, imprimir_relatorio, ESTAGIOS
+from backends import verificar_configuracao
+from modelos import precarregar
+from metricas import salvar_prometheus
+from perfilador import perfilar, imprimir_resumo
 
 
 def main():
@@ -13,40 +22,72 @@ def main():
     """
     print('Bem vindo ao NandaBot')
     
-    texto_selecao = '''\nDigite 1 se você quiser conversar com um site
+    # Avisa logo no início se o backend de modelo não estiver pronto (ex.: sem GROQ_API_KEY)
+    for problema in verificar_configuracao(ESTAGIOS):
+        print(f'⚠️ Aviso: {problema}')
+    
+    # O LangChain é importado enquanto o usuário escolhe a fonte
+    precarregar()
+    
+    # Cada fonte tem índice e resumos próprios; as perguntas são roteadas entre elas
+    sessao = SessaoFontes()
+    
+    # Pacotes de conhecimento (NANDABOT_PACOTES) já vêm indexados: nada é carregado
+    for pacote in abrir_pacotes():
+        sessao.adicionar_pacote(pacote)
+        print(descrever_pacote(pacote))
+    
+    opcao_pacotes = 'Digite P se você quiser conversar apenas com os pacotes de conhecimento\n' if sessao.fontes else ''
+    texto_selecao = f'''\nDigite 1 se você quiser conversar com um site
 Digite 2 se você quiser conversar com um PDF
 Digite 3 se você quiser conversar com um vídeo do Youtube
-Digite X se você quiser encerrar a conversa\n'''
+Digite 4 se você quiser conversar com várias fontes (manifesto)
+{opcao_pacotes}Digite X se você quiser encerrar a conversa\n'''
     
     while True:
         selecao = input(texto_selecao)
         
         if selecao == '1':
             print('Você escolheu conversar com um site')
-            documento = carrega_site()
+            sessao.adicionar(carrega_site(), 'site')
             break
         
         if selecao == '2':
             print('Você escolheu conversar com um PDF')
-            documento = carrega_pdf()
+            sessao.adicionar(carrega_pdf(limite_memoria=sessao.memoria_disponivel()), 'pdf')
             break
         
         if selecao == '3':
             print('Você escolheu conversar com um vídeo do Youtube')
-            documento = carrega_youtube()
+            sessao.adicionar(carrega_youtube(), 'youtube')
+            break
+        
+        if selecao == '4':
+            print('Você escolheu conversar com várias fontes')
+            for resultado in carrega_lote(juntar=False):
+                sessao.adicionar(resultado['documento'], resultado['tipo'], resultado['origem'])
+            break
+        
+        if selecao.upper() == 'P' and sessao.fontes:
+            print('Você escolheu conversar com os pacotes de conhecimento')
             break
         
         if selecao.upper() == 'X':
             print('\nMuito obrigado por utilizar o NandaBot!')
             return
         
-        print('Opção inválida!\n Digite uma opção entre 1 e 3: ')
+        print('Opção inválida!\n Digite uma opção entre 1 e 4: ')
     
     # Verifica se o documento foi carregado com sucesso
-    if not documento:
+    if not sessao.fontes:
         print('\n⚠️ Não foi possível carregar o documento. Encerrando...')
         return
     
+    # Documentos acima do orçamento de memória ficam em disco, lidos sob demanda
+    for fonte in sessao.fontes:
+        if descrever_armazenamento(fonte.documento):
+            print(descrever_armazenamento(fonte.documento))
+    
     # Loop de conversa com o bot
     mensagens = []
     
@@ -71,11 +112,15 @@ Digite X se você quiser encerrar a conversa\n'''
         mensagens.append(('user', pergunta_sanitizada))
         
         try:
-            resposta = resposta_bot(mensagens, documento)
-            
-            # Valida resposta do bot
-            from guardrails import validar_resposta_saida
-            seguro_resposta, resposta_final = validar_resposta_saida(resposta)
+            # Com NANDABOT_PERFIL=1, perfila o turno (inclusive as threads das chamadas ao modelo)
+            with perfilar('turno', novas_threads=True) as perfil:
+                resposta = resposta_bot(mensagens, sessao, indice=sessao, arvore=sessao.arvore)
+                
+                # Valida resposta do bot
+                from guardrails import validar_resposta_saida
+                seguro_resposta, resposta_final = validar_resposta_saida(resposta)
+            if perfil:
+                imprimir_resumo(perfil)
             
             if seguro_resposta:
                 mensagens.append(('assistant', resposta_final))
@@ -88,6 +133,8 @@ Digite X se você quiser encerrar a conversa\n'''
             # Remove a última mensagem em caso de erro
             mensagens.pop()
     
+    imprimir_relatorio(roteador.relatorio())
+    salvar_prometheus()
     print('\nMuito obrigado por utilizar o NandaBot!')
 
 
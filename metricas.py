@@ -0,0 +1,247 @@
+"""
+Módulo de métricas e rastreamento
+Spans em volta de cada estágio (carga, verificação de segurança, montagem do
+prompt, moderação e geração), contadores de tokens e de acertos de cache e
+histogramas de tamanho do documento, exportados no formato texto do
+Prometheus e em JSON lines
+
+Desativado por padrão: sem NANDABOT_METRICAS=1, `span()` devolve um objeto
+nulo compartilhado e `contar()`/`observar()` retornam na primeira linha.
+"""
+
+import os
+import json
+import time
+import threading
+from functools import wraps
+from typing import Dict, Optional, Tuple
+
+
+ATIVO = os.getenv('NANDABOT_METRICAS', '0') == '1'
+
+# Arquivo JSONL que recebe um evento por span (opcional)
+ARQUIVO_EVENTOS = os.getenv('NANDABOT_METRICAS_ARQUIVO')
+
+# Arquivo no formato texto do Prometheus gravado ao sair do terminal (ex.: textfile collector)
+ARQUIVO_PROMETHEUS = os.getenv('NANDABOT_METRICAS_PROMETHEUS')
+
+# Limites dos histogramas: segundos (padrão) e caracteres de documento
+LIMITES_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+LIMITES_CARACTERES = (1_000, 10_000, 30_000, 60_000, 120_000, 500_000, 1_000_000, 5_000_000)
+LIMITES_METRICA = {'nandabot_documento_caracteres': LIMITES_CARACTERES}
+
+DESCRICOES = {
+    'nandabot_estagio_segundos': ('histogram', 'Duração de cada estágio (spans)'),
+    'nandabot_estagio_erros_total': ('counter', 'Spans encerrados com exceção'),
+    'nandabot_tokens_total': ('counter', 'Tokens informados pelo modelo, por estágio e tipo (entrada/saida)'),
+    'nandabot_chamadas_modelo_total': ('counter', 'Requisições ao modelo por estágio, modelo e resultado'),
+    'nandabot_documento_caracteres': ('histogram', 'Tamanho do documento antes (original) e depois (contexto) da seleção'),
+    'nandabot_cache_total': ('counter', 'Consultas aos caches em disco por resultado (acerto/falha)'),
+}
+
+Rotulos = Tuple[Tuple[str, str], ...]
+
+
+def _rotulos(rotulos: dict) -> Rotulos:
+    return tuple(sorted((chave, str(valor)) for chave, valor in rotulos.items()))
+
+
+class Registro:
+    """Contadores e histogramas do processo, e o arquivo de eventos (JSONL)."""
+
+    def __init__(self, arquivo_eventos: Optional[str] = ARQUIVO_EVENTOS):
+        self.contadores: Dict[Tuple[str, Rotulos], float] = {}
+        self.histogramas: Dict[Tuple[str, Rotulos], list] = {}  # [contagens por limite, soma, total]
+        self.arquivo_eventos = arquivo_eventos
+        self._trava = threading.Lock()
+        self._arquivo = None
+
+    def contar(self, nome: str, valor: float = 1, **rotulos):
+        chave = (nome, _rotulos(rotulos))
+        with self._trava:
+            self.contadores[chave] = self.contadores.get(chave, 0) + valor
+
+    def observar(self, nome: str, valor: float, **rotulos):
+        limites = LIMITES_METRICA.get(nome, LIMITES_SEGUNDOS)
+        chave = (nome, _rotulos(rotulos))
+        with self._trava:
+            dados = self.histogramas.get(chave)
+            if dados is None:
+                dados = self.histogramas[chave] = [[0] * len(limites), 0.0, 0]
+            for i, limite in enumerate(limites):
+                if valor <= limite:
+                    dados[0][i] += 1
+            dados[1] += valor
+            dados[2] += 1
+
+    def evento(self, dados: dict):
+        """Grava um evento no arquivo JSONL, se houver."""
+        if not self.arquivo_eventos:
+            return
+        linha = json.dumps(dados, ensure_ascii=False, default=str) + '\n'
+        with self._trava:
+            if self._arquivo is None:
+                self._arquivo = open(self.arquivo_eventos, 'a', encoding='utf-8', buffering=1)
+            self._arquivo.write(linha)
+
+    def prometheus(self) -> str:
+        """Métricas no formato texto de exposição do Prometheus."""
+        with self._trava:
+            contadores = dict(self.contadores)
+            histogramas = {chave: (list(d[0]), d[1], d[2]) for chave, d in self.histogramas.items()}
+
+        def formatar(rotulos: Rotulos, extra: Rotulos = ()) -> str:
+            pares = rotulos + extra
+            if not pares:
+                return ''
+            texto = ','.join(f'{chave}="{valor}"'.replace('\n', ' ') for chave, valor in pares)
+            return '{' + texto + '}'
+
+        linhas = []
+        nomes = sorted({nome for nome, _ in contadores} | {nome for nome, _ in histogramas})
+        for nome in nomes:
+            tipo, descricao = DESCRICOES.get(nome, ('untyped', nome))
+            linhas.append(f"# HELP {nome} {descricao}")
+            linhas.append(f"# TYPE {nome} {tipo}")
+            for (n, rotulos), valor in sorted(contadores.items()):
+                if n == nome:
+                    linhas.append(f"{nome}{formatar(rotulos)} {valor:g}")
+            limites = LIMITES_METRICA.get(nome, LIMITES_SEGUNDOS)
+            for (n, rotulos), (contagens, soma, total) in sorted(histogramas.items()):
+                if n != nome:
+                    continue
+                for limite, contagem in zip(limites, contagens):
+                    linhas.append(f"{nome}_bucket{formatar(rotulos, (('le', f'{limite:g}'),))} {contagem}")
+                linhas.append(f"{nome}_bucket{formatar(rotulos, (('le', '+Inf'),))} {total}")
+                linhas.append(f"{nome}_sum{formatar(rotulos)} {soma:g}")
+                linhas.append(f"{nome}_count{formatar(rotulos)} {total}")
+        return '\n'.join(linhas) + '\n'
+
+    def limpar(self):
+        with self._trava:
+            self.contadores.clear()
+            self.histogramas.clear()
+
+
+class _SpanNulo:
+    """Span usado com as métricas desativadas: não mede nem grava nada."""
+
+    __slots__ = ()
+
+    def definir(self, **atributos):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *erro):
+        return False
+
+
+class Span:
+    """
+    Mede um estágio: duração no histograma nandabot_estagio_segundos e um evento JSONL.
+
+    Args:
+        nome: Nome do estágio
+        atributos: Dados do evento (tamanho do documento, modo, modelo...)
+    """
+
+    def __init__(self, nome: str, atributos: dict):
+        self.nome = nome
+        self.atributos = atributos
+        self.inicio = 0.0
+
+    def definir(self, **atributos):
+        """Acrescenta atributos ao evento do span."""
+        self.atributos.update(atributos)
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo_erro, erro, rastro):
+        duracao = time.perf_counter() - self.inicio
+        registro.observar('nandabot_estagio_segundos', duracao, estagio=self.nome)
+        if erro is not None:
+            registro.contar('nandabot_estagio_erros_total', estagio=self.nome)
+        registro.evento({
+            'span': self.nome,
+            'inicio': time.time() - duracao,
+            'duracao_s': round(duracao, 6),
+            'thread': threading.current_thread().name,
+            'erro': f"{type(erro).__name__}: {erro}" if erro is not None else None,
+            **self.atributos,
+        })
+        return False
+
+
+_SPAN_NULO = _SpanNulo()
+
+# Instância compartilhada por todo o processo
+registro = Registro()
+
+
+def ativar(arquivo_eventos: Optional[str] = None):
+    """Ativa as métricas em tempo de execução (ex.: ferramentas de carga e benchmark)."""
+    global ATIVO
+    ATIVO = True
+    if arquivo_eventos:
+        registro.arquivo_eventos = arquivo_eventos
+
+
+def span(nome: str, **atributos):
+    """
+    Span de um estágio, para uso com `with`.
+
+    Exemplo:
+        with span('extracao_pdf', arquivo=caminho) as s:
+            texto = extrair()
+            s.definir(caracteres=len(texto))
+    """
+    if not ATIVO:
+        return _SPAN_NULO
+    return Span(nome, atributos)
+
+
+def instrumentar(nome: str):
+    """Decorador que mede a função como um span (com o tamanho do retorno, se for texto)."""
+    def decorador(funcao):
+        @wraps(funcao)
+        def envolvida(*args, **kwargs):
+            if not ATIVO:
+                return funcao(*args, **kwargs)
+            with Span(nome, {}) as medicao:
+                resultado = funcao(*args, **kwargs)
+                if isinstance(resultado, str):
+                    medicao.definir(caracteres=len(resultado))
+                return resultado
+        return envolvida
+    return decorador
+
+
+def contar(nome: str, valor: float = 1, **rotulos):
+    """Soma `valor` ao contador (nada é feito com as métricas desativadas)."""
+    if ATIVO:
+        registro.contar(nome, valor, **rotulos)
+
+
+def observar(nome: str, valor: float, **rotulos):
+    """Registra `valor` no histograma (nada é feito com as métricas desativadas)."""
+    if ATIVO:
+        registro.observar(nome, valor, **rotulos)
+
+
+def exportar_prometheus() -> str:
+    """Métricas acumuladas no formato texto do Prometheus."""
+    return registro.prometheus()
+
+
+def salvar_prometheus(caminho: Optional[str] = ARQUIVO_PROMETHEUS):
+    """Grava as métricas no formato do Prometheus (gravação atômica), se houver caminho e métricas ativas."""
+    if not ATIVO or not caminho:
+        return
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        f.write(exportar_prometheus())
+    os.replace(temporario, caminho)
@@ -0,0 +1,306 @@
+"""
+Módulo de acesso ao modelo
+Ponto único das chamadas ao modelo: backend e modelo por estágio, estimativa
+de tokens e passagem pelo agendador de limites (RPM/TPM)
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from agendador import obter_agendador, PRIORIDADE_INTERATIVA, PRIORIDADE_LOTE
+from resiliencia import executar_com_resiliencia, executar_com_resiliencia_async, retry_after, status_http
+from roteamento import roteador
+from backends import backend_estagio
+from metricas import span, contar
+
+# Tokens de saída previstos em cada chamada (somados à estimativa da entrada)
+TOKENS_SAIDA_ESTIMADOS = 512
+
+# Pausa do agendador quando um 429 não informa retry-after (segundos)
+PAUSA_PADRAO_LIMITE = 5.0
+
+# Prazo de cada chamada feita dentro de `em_lote()` (segundos), incluindo a espera na fila
+PRAZO_LOTE = float(os.getenv('NANDABOT_PRAZO_LOTE', '600'))
+
+
+class ContagemTokens:
+    """Tokens e chamadas ao modelo acumulados dentro de um bloco `contar_tokens()`."""
+
+    def __init__(self):
+        self.chamadas = 0
+        self.entrada = 0
+        self.saida = 0
+        self._trava = threading.Lock()
+
+    def somar(self, uso: dict):
+        with self._trava:
+            self.chamadas += 1
+            self.entrada += uso.get('input_tokens') or 0
+            self.saida += uso.get('output_tokens') or 0
+
+    def para_dict(self) -> dict:
+        return {'chamadas': self.chamadas, 'tokens_entrada': self.entrada, 'tokens_saida': self.saida}
+
+
+_contagem: ContextVar[Optional[ContagemTokens]] = ContextVar('contagem_tokens', default=None)
+
+_prazo_lote: ContextVar[Optional[float]] = ContextVar('prazo_lote', default=None)
+
+
+@contextmanager
+def contar_tokens():
+    """
+    Acumula os tokens das chamadas feitas no bloco (inclusive em tarefas e
+    threads de chamada criadas a partir dele), sem misturar turnos simultâneos.
+
+    Exemplo:
+        with contar_tokens() as contagem:
+            resposta = await resposta_bot_async(mensagens, documento)
+        print(contagem.entrada, contagem.saida)
+    """
+    contagem = ContagemTokens()
+    marcador = _contagem.set(contagem)
+    try:
+        yield contagem
+    finally:
+        _contagem.reset(marcador)
+
+
+@contextmanager
+def em_lote(prazo: float = PRAZO_LOTE):
+    """
+    Marca as chamadas feitas no bloco (inclusive em tarefas e threads de
+    chamada criadas a partir dele) como trabalho em lote, sem usuário esperando.
+
+    Essas chamadas entram no agendador com no mínimo PRIORIDADE_LOTE e têm
+    `prazo` segundos, em vez do prazo interativo do estágio, para que a
+    espera na fila por capacidade (RPM/TPM) não esgote o prazo.
+
+    Args:
+        prazo: Prazo de cada chamada, somando fila e tentativas (segundos)
+    """
+    marcador = _prazo_lote.set(prazo)
+    try:
+        yield
+    finally:
+        _prazo_lote.reset(marcador)
+
+
+def _modo(prioridade: int):
+    """Prioridade e prazo da chamada, considerando um bloco `em_lote()` ativo."""
+    prazo = _prazo_lote.get()
+    if prazo is None:
+        return prioridade, None
+    return max(prioridade, PRIORIDADE_LOTE), prazo
+
+
+def estimar_tokens(mensagens_formatadas, tokens_saida: int = TOKENS_SAIDA_ESTIMADOS) -> int:
+    """
+    Estima os tokens de uma chamada (~4 caracteres por token, mais a saída prevista).
+
+    Args:
+        mensagens_formatadas: Mensagens já formatadas (BaseMessage)
+        tokens_saida: Tokens de saída previstos
+
+    Returns:
+        int: Tokens estimados
+    """
+    caracteres = sum(len(str(mensagem.content)) for mensagem in mensagens_formatadas)
+    return caracteres // 4 + tokens_saida
+
+
+def _uso(resposta) -> dict:
+    """Tokens informados pela resposta (input_tokens, output_tokens, total_tokens)."""
+    return getattr(resposta, 'usage_metadata', None) or {}
+
+
+def invocar(mensagens_modelo, variaveis: dict = None, prioridade: int = PRIORIDADE_INTERATIVA,
+            chat=None, estagio: str = 'resposta') -> str:
+    """
+    Executa uma chamada ao modelo passando pelo roteador e pelo agendador.
+
+    Cada requisição usa o backend do estágio (ver backends.py) e, no Groq, o
+    modelo escolhido pelo roteador, reservando capacidade no agendador desse
+    modelo; erros transitórios
+    (timeouts, 429, 5xx) são repetidos com backoff dentro do prazo do estágio
+    (ver resiliencia.executar_com_resiliencia).
+
+    Args:
+        mensagens_modelo: Mensagens no formato do ChatPromptTemplate [(role, texto), ...]
+        variaveis: Variáveis do template
+        prioridade: Prioridade no agendador (ver agendador.PRIORIDADE_*)
+        chat: Modelo a usar, ignorando backend e roteador (padrão: modelo escolhido para o estágio)
+        estagio: Estágio do turno (moderacao_entrada, moderacao_saida, resposta, mapreduce, resumo)
+
+    Returns:
+        str: Conteúdo da resposta
+
+    Raises:
+        FilaCheiaError: Se o agendador recusar a chamada (fila cheia ou espera esgotada)
+        PrazoEsgotadoError: Se o prazo do estágio acabar sem resposta
+    """
+    mensagens, estimados, backend = _preparar(mensagens_modelo, variaveis, estagio)
+    prioridade, prazo = _modo(prioridade)
+
+    def reservar(tempo_restante):
+        if not backend.usa_niveis:
+            return backend.modelo_padrao()
+        modelo = roteador.escolher(estagio)
+        obter_agendador(modelo).adquirir(estimados, prioridade, timeout=tempo_restante)
+        return modelo
+
+    def chamar(timeout, modelo):
+        inicio = time.monotonic()
+        try:
+            resposta = (chat or backend.chat(modelo)).invoke(mensagens, timeout=timeout)
+        except Exception as e:
+            _registrar_falha(backend, estagio, modelo, e)
+            raise
+
+        _registrar_sucesso(backend, estagio, modelo, estimados, inicio, _uso(resposta))
+        return resposta.content
+
+    with span(estagio):
+        return executar_com_resiliencia(chamar, estagio, reservar, prazo)
+
+
+def precarregar():
+    """
+    Importa o LangChain e o cliente do Groq em segundo plano.
+
+    Chamado pelo terminal antes do menu: a importação acontece enquanto o
+    usuário escolhe e carrega a fonte, e não atrasa a primeira resposta.
+    """
+    def importar():
+        try:
+            import langchain_core.prompts
+            import langchain_groq
+        except ImportError:
+            pass
+
+    threading.Thread(target=importar, daemon=True, name="precarga-modelo").start()
+
+
+def _preparar(mensagens_modelo, variaveis, estagio):
+    """Formata as mensagens, estima os tokens e escolhe o backend do estágio."""
+    from langchain_core.prompts import ChatPromptTemplate
+
+    mensagens = ChatPromptTemplate.from_messages(mensagens_modelo).format_messages(**(variaveis or {}))
+    return mensagens, estimar_tokens(mensagens), backend_estagio(estagio)
+
+
+async def _reservar_async(backend, estagio, estimados, prioridade, tempo_restante):
+    if not backend.usa_niveis:
+        return backend.modelo_padrao()
+    modelo = roteador.escolher(estagio)
+    await obter_agendador(modelo).adquirir_async(estimados, prioridade, timeout=tempo_restante)
+    return modelo
+
+
+def _registrar_falha(backend, estagio, modelo, erro):
+    """Pausa o agendador do modelo em caso de 429 e informa a falha ao roteador."""
+    import httpx
+
+    contar('nandabot_chamadas_modelo_total', estagio=estagio, modelo=modelo, resultado='falha')
+    limitado = status_http(erro) == 429
+    espera = retry_after(erro)
+    if limitado and backend.usa_agendador:
+        obter_agendador(modelo).pausar(espera or PAUSA_PADRAO_LIMITE)
+    excedeu_prazo = isinstance(erro, (TimeoutError, httpx.TimeoutException)) or 'Timeout' in type(erro).__name__
+    roteador.registrar_falha(estagio, modelo, limitado, espera, excedeu_prazo=excedeu_prazo)
+
+
+def _registrar_sucesso(backend, estagio, modelo, estimados, inicio, uso):
+    """Corrige o saldo do agendador com o uso real e informa latência e tokens ao roteador."""
+    if backend.usa_agendador:
+        obter_agendador(modelo).registrar_uso(estimados, uso.get('total_tokens'))
+    roteador.registrar_sucesso(estagio, modelo, time.monotonic() - inicio,
+                               uso.get('input_tokens'), uso.get('output_tokens'))
+    contar('nandabot_chamadas_modelo_total', estagio=estagio, modelo=modelo, resultado='sucesso')
+    contar('nandabot_tokens_total', uso.get('input_tokens') or 0, estagio=estagio, tipo='entrada')
+    contar('nandabot_tokens_total', uso.get('output_tokens') or 0, estagio=estagio, tipo='saida')
+    contagem = _contagem.get()
+    if contagem is not None:
+        contagem.somar(uso)
+
+
+async def invocar_async(mensagens_modelo, variaveis: dict = None, prioridade: int = PRIORIDADE_INTERATIVA,
+                        chat=None, estagio: str = 'resposta') -> str:
+    """
+    Versão assíncrona de `invocar`: a espera no agendador e a requisição não bloqueiam o loop.
+
+    Returns:
+        str: Conteúdo da resposta
+    """
+    mensagens, estimados, backend = _preparar(mensagens_modelo, variaveis, estagio)
+    prioridade, prazo = _modo(prioridade)
+
+    async def reservar(tempo_restante):
+        return await _reservar_async(backend, estagio, estimados, prioridade, tempo_restante)
+
+    async def chamar(timeout, modelo):
+        inicio = time.monotonic()
+        try:
+            resposta = await (chat or backend.chat(modelo)).ainvoke(mensagens, timeout=timeout)
+        except Exception as e:
+            _registrar_falha(backend, estagio, modelo, e)
+            raise
+
+        _registrar_sucesso(backend, estagio, modelo, estimados, inicio, _uso(resposta))
+        return resposta.content
+
+    with span(estagio):
+        return await executar_com_resiliencia_async(chamar, estagio, reservar, prazo)
+
+
+async def transmitir_async(mensagens_modelo, variaveis: dict = None, prioridade: int = PRIORIDADE_INTERATIVA,
+                           chat=None, estagio: str = 'resposta'):
+    """
+    Gera a resposta em partes, à medida que o modelo as produz.
+
+    Falhas antes da primeira parte são repetidas como em `invocar_async`;
+    depois que o texto começa a ser entregue, um erro é repassado ao chamador.
+
+    Yields:
+        str: Trechos do texto da resposta
+    """
+    mensagens, estimados, backend = _preparar(mensagens_modelo, variaveis, estagio)
+    prioridade, prazo = _modo(prioridade)
+    inicio = time.monotonic()
+
+    async def abrir(timeout, modelo):
+        """Abre o stream e espera a primeira parte (o que pode ser repetido)."""
+        fluxo = (chat or backend.chat(modelo)).astream(mensagens, timeout=timeout).__aiter__()
+        try:
+            primeira = await fluxo.__anext__()
+        except StopAsyncIteration:
+            primeira = None
+        except Exception as e:
+            _registrar_falha(backend, estagio, modelo, e)
+            raise
+        return modelo, fluxo, primeira
+
+    async def reservar(tempo_restante):
+        return await _reservar_async(backend, estagio, estimados, prioridade, tempo_restante)
+
+    # O tempo até o primeiro trecho é o que o usuário percebe
+    with span(f'{estagio}_primeiro_trecho'):
+        modelo, fluxo, parte = await executar_com_resiliencia_async(abrir, estagio, reservar, prazo)
+
+    uso = {}
+    while parte is not None:
+        uso = getattr(parte, 'usage_metadata', None) or uso
+        if parte.content:
+            yield parte.content
+        try:
+            parte = await fluxo.__anext__()
+        except StopAsyncIteration:
+            parte = None
+        except Exception as e:
+            _registrar_falha(backend, estagio, modelo, e)
+            raise
+
+    _registrar_sucesso(backend, estagio, modelo, estimados, inicio, uso)
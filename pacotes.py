@@ -0,0 +1,458 @@
+"""
+Módulo de pacotes de conhecimento
+Para corpora fixos (manuais de produto, sites internos), as fontes são
+carregadas e indexadas uma única vez, offline, e gravadas em um único arquivo
+versionado com o texto das seções, os deslocamentos, o índice BM25 invertido
+e os metadados. O terminal e o Streamlit abrem os pacotes com mmap (somente
+leitura) e respondem na hora, sem recarregar nem reindexar as fontes; o mesmo
+arquivo é compartilhado pelas sessões do processo e, pelo cache de páginas do
+sistema operacional, entre processos
+
+Uso pela linha de comando:
+    python pacotes.py construir manifesto.json --saida manuais.nandapack [--nome Manuais] [--versao 2024.1]
+    python pacotes.py info manuais.nandapack
+
+Os pacotes listados em NANDABOT_PACOTES (arquivos ou diretórios, separados
+por ':' no Linux/Mac e ';' no Windows) são abertos ao iniciar.
+"""
+
+import os
+import sys
+import json
+import math
+import mmap
+import bisect
+import struct
+import hashlib
+import argparse
+from array import array
+from collections import Counter, defaultdict
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+from indice import IndiceSecoes, tokenizar
+
+
+# Identificação e versão do formato do arquivo (pacotes de outro formato são recusados)
+MAGICA = b'NANDAPAC'
+FORMATO = 1
+CABECALHO = struct.Struct('<8sIQQ')  # mágica, formato, deslocamento e tamanho dos metadados
+
+EXTENSAO = '.nandapack'
+
+# Pacotes abertos ao iniciar o terminal e o Streamlit
+PACOTES = os.getenv('NANDABOT_PACOTES', '')
+
+# Blocos do arquivo e o tipo dos seus itens (array/memoryview)
+BLOCOS = {
+    'texto': 'B',             # texto das seções em UTF-8, já juntado (ver indice.juntar_secoes)
+    'limites': 'Q',           # por seção: início do cabeçalho, início do texto e fim (bytes)
+    'caracteres': 'Q',        # início de cada seção no documento (caracteres) + total
+    'tamanhos': 'I',          # termos de cada seção (normalização do BM25)
+    'termos': 'B',            # termos do índice em UTF-8, em ordem
+    'termos_limites': 'Q',    # início de cada termo + fim
+    'postings_limites': 'Q',  # início da lista de cada termo em `postings` + fim
+    'postings': 'I',          # pares (seção, frequência)
+    'totais': 'Q',            # frequência de cada termo no pacote inteiro (roteamento entre fontes)
+}
+
+
+class ErroPacote(Exception):
+    """Arquivo que não é um pacote de conhecimento ou de um formato não suportado."""
+
+
+def construir_pacote(secoes: Iterable[Tuple[str, str]], caminho: str, nome: Optional[str] = None, versao: Optional[str] = None,
+                     fontes: Optional[List[dict]] = None, k1: float = 1.5, b: float = 0.75) -> dict:
+    """
+    Indexa as seções e grava o pacote de conhecimento.
+
+    O índice é o mesmo de indice.IndiceSecoes sobre essas seções; a gravação
+    é atômica (arquivo temporário renomeado ao final).
+
+    Args:
+        secoes: (cabecalho, texto) de cada seção, já com a fonte no cabeçalho
+            e o tamanho limitado (ex.: lote.secoes_documentos)
+        caminho: Arquivo do pacote
+        nome: Nome exibido ao usuário (padrão: nome do arquivo)
+        versao: Versão do conteúdo (padrão: data e hora da construção)
+        fontes: Fontes incluídas (tipo, origem, caracteres), guardadas nos metadados
+        k1, b: Parâmetros do BM25
+
+    Returns:
+        dict: Metadados gravados
+    """
+    texto = bytearray()
+    limites = array('Q')
+    caracteres = array('Q', [0])
+    tamanhos = array('I')
+    postings = defaultdict(list)
+    hash_texto = hashlib.sha256()
+
+    for posicao, (cabecalho, conteudo) in enumerate(secoes):
+        unidade = ('\n\n' if posicao else '') + (f"{cabecalho}\n\n{conteudo}" if cabecalho else conteudo)
+        dados = unidade.encode('utf-8')
+        hash_texto.update(dados)
+        inicio = len(texto) + (2 if posicao else 0)
+        inicio_texto = inicio + (len(cabecalho.encode('utf-8')) + 2 if cabecalho else 0)
+        texto += dados
+        limites.extend((inicio, inicio_texto, len(texto)))
+        caracteres.append(caracteres[-1] + len(unidade))
+
+        frequencias = Counter(tokenizar(f"{cabecalho} {conteudo}"))
+        tamanhos.append(sum(frequencias.values()))
+        for termo, frequencia in frequencias.items():
+            postings[termo.encode('utf-8')].append((posicao, frequencia))
+
+    termos = bytearray()
+    termos_limites = array('Q', [0])
+    postings_limites = array('Q', [0])
+    lista_postings = array('I')
+    totais = array('Q')
+    for termo in sorted(postings):
+        termos += termo
+        termos_limites.append(len(termos))
+        for secao, frequencia in postings[termo]:
+            lista_postings.extend((secao, frequencia))
+        postings_limites.append(len(lista_postings) // 2)
+        totais.append(sum(frequencia for _, frequencia in postings[termo]))
+
+    conteudos = {
+        'texto': bytes(texto), 'limites': limites, 'caracteres': caracteres, 'tamanhos': tamanhos,
+        'termos': bytes(termos), 'termos_limites': termos_limites, 'postings_limites': postings_limites,
+        'postings': lista_postings, 'totais': totais,
+    }
+    metadados = {
+        'formato': FORMATO,
+        'nome': nome or Path(caminho).stem,
+        'versao': versao or datetime.now().strftime('%Y%m%d-%H%M%S'),
+        'criado_em': datetime.now().isoformat(timespec='seconds'),
+        'ordem_bytes': sys.byteorder,
+        'fontes': fontes or [],
+        'secoes': len(tamanhos),
+        'termos': len(totais),
+        'caracteres': caracteres[-1],
+        'sha256': hash_texto.hexdigest(),
+        'k1': k1,
+        'b': b,
+        'tamanho_medio': (sum(tamanhos) / len(tamanhos)) if tamanhos else 0.0,
+        'blocos': {},
+    }
+
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'wb') as arquivo:
+        arquivo.write(b'\0' * CABECALHO.size)
+        for nome_bloco, conteudo in conteudos.items():
+            # Blocos alinhados em 8 bytes, lidos diretamente do mmap como arrays
+            arquivo.write(b'\0' * (-arquivo.tell() % 8))
+            dados = conteudo if isinstance(conteudo, bytes) else conteudo.tobytes()
+            metadados['blocos'][nome_bloco] = [arquivo.tell(), len(dados)]
+            arquivo.write(dados)
+        json_metadados = json.dumps(metadados, ensure_ascii=False).encode('utf-8')
+        deslocamento = arquivo.tell()
+        arquivo.write(json_metadados)
+        arquivo.seek(0)
+        arquivo.write(CABECALHO.pack(MAGICA, FORMATO, deslocamento, len(json_metadados)))
+    os.replace(temporario, caminho)
+    return metadados
+
+
+class _Termos:
+    """Termos do pacote como sequência ordenada de bytes (busca binária com bisect)."""
+
+    def __init__(self, dados: memoryview, limites: memoryview):
+        self.dados = dados
+        self.limites = limites
+
+    def __len__(self):
+        return len(self.limites) - 1
+
+    def __getitem__(self, i: int) -> bytes:
+        return bytes(self.dados[self.limites[i]:self.limites[i + 1]])
+
+
+class SecoesPacote:
+    """
+    Seções (cabecalho, texto) do pacote, lidas do mmap sob demanda.
+
+    Tem a mesma interface da lista devolvida por indice.dividir_secoes.
+    """
+
+    def __init__(self, pacote: 'PacoteConhecimento'):
+        self.pacote = pacote
+
+    def __len__(self):
+        return self.pacote.metadados['secoes']
+
+    def __getitem__(self, i: int) -> Tuple[str, str]:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        texto, limites = self.pacote.blocos['texto'], self.pacote.blocos['limites']
+        inicio, inicio_texto, fim = limites[3 * i], limites[3 * i + 1], limites[3 * i + 2]
+        cabecalho = bytes(texto[inicio:max(inicio, inicio_texto - 2)]).decode('utf-8')
+        return cabecalho, bytes(texto[inicio_texto:fim]).decode('utf-8')
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        for i in range(len(self)):
+            yield self[i]
+
+
+class DocumentoPacote:
+    """
+    Texto do pacote, aceito no lugar da string do documento por bot, índice e resumos.
+
+    Como armazenamento.DocumentoEmDisco: `len()` é a quantidade de
+    caracteres, fatias (`documento[:n]`) decodificam só as seções necessárias
+    e `indice.dividir_secoes` devolve as seções sob demanda.
+    """
+
+    def __init__(self, pacote: 'PacoteConhecimento'):
+        self.pacote = pacote
+        self.sha256 = pacote.metadados['sha256']
+
+    def __len__(self):
+        return self.pacote.metadados['caracteres']
+
+    def __repr__(self):
+        return f"<DocumentoPacote {self.pacote.nome} {len(self)} caracteres>"
+
+    def secoes(self) -> SecoesPacote:
+        return SecoesPacote(self.pacote)
+
+    def __getitem__(self, fatia: slice) -> str:
+        if not isinstance(fatia, slice) or fatia.step not in (None, 1):
+            raise TypeError("DocumentoPacote aceita apenas fatias contínuas (documento[inicio:fim])")
+        inicio, fim, _ = fatia.indices(len(self))
+        if fim <= inicio:
+            return ''
+        caracteres, limites = self.pacote.blocos['caracteres'], self.pacote.blocos['limites']
+        primeira = bisect.bisect_right(caracteres, inicio) - 1
+        ultima = bisect.bisect_left(caracteres, fim) - 1
+        # Cada seção começa no separador ('\n\n') que a antecede
+        byte_inicio = limites[3 * primeira] - (2 if primeira else 0)
+        trecho = bytes(self.pacote.blocos['texto'][byte_inicio:limites[3 * ultima + 2]]).decode('utf-8')
+        deslocamento = caracteres[primeira]
+        return trecho[inicio - deslocamento:fim - deslocamento]
+
+    def __str__(self):
+        return bytes(self.pacote.blocos['texto']).decode('utf-8')
+
+
+class LexicoPacote:
+    """
+    Índice BM25 invertido lido do pacote (mesma pontuação de indice.IndiceLexico).
+
+    Apenas as listas dos termos da consulta são lidas; nada é carregado ao abrir.
+    """
+
+    def __init__(self, pacote: 'PacoteConhecimento'):
+        self.blocos = pacote.blocos
+        self.k1 = pacote.metadados['k1']
+        self.b = pacote.metadados['b']
+        self.tamanho_medio = pacote.metadados['tamanho_medio']
+        self.termos = _Termos(self.blocos['termos'], self.blocos['termos_limites'])
+        self.total = pacote.metadados['secoes']
+
+    def __len__(self):
+        return self.total
+
+    def _procurar(self, termo: str) -> Optional[int]:
+        chave = termo.encode('utf-8')
+        posicao = bisect.bisect_left(self.termos, chave)
+        if posicao < len(self.termos) and self.termos[posicao] == chave:
+            return posicao
+        return None
+
+    def pontuar(self, consulta: str) -> List[float]:
+        pontuacoes = [0.0] * self.total
+        if not self.tamanho_medio:
+            return pontuacoes
+
+        tamanhos, limites, postings = self.blocos['tamanhos'], self.blocos['postings_limites'], self.blocos['postings']
+        for termo in set(tokenizar(consulta)):
+            posicao = self._procurar(termo)
+            if posicao is None:
+                continue
+            inicio, fim = limites[posicao], limites[posicao + 1]
+            n = fim - inicio
+            idf = math.log(1 + (self.total - n + 0.5) / (n + 0.5))
+            for j in range(inicio, fim):
+                secao, f = postings[2 * j], postings[2 * j + 1]
+                normalizacao = self.k1 * (1 - self.b + self.b * tamanhos[secao] / self.tamanho_medio)
+                pontuacoes[secao] += idf * f * (self.k1 + 1) / (f + normalizacao)
+
+        return pontuacoes
+
+
+class IndicePacote(IndiceSecoes):
+    """Índice das seções do pacote, já construído (mesma interface de IndiceSecoes)."""
+
+    def __init__(self, pacote: 'PacoteConhecimento'):
+        self.pacote = pacote
+        self.secoes = SecoesPacote(pacote)
+        self.indice = LexicoPacote(pacote)
+
+    def termos(self) -> Counter:
+        termos = self.indice.termos
+        return Counter({termos[i].decode('utf-8'): total for i, total in enumerate(self.pacote.blocos['totais'])})
+
+
+class PacoteConhecimento:
+    """
+    Pacote de conhecimento aberto com mmap, somente leitura.
+
+    Use abrir_pacote(), que compartilha a mesma instância entre as sessões do processo.
+
+    Atributos:
+        caminho: Arquivo do pacote
+        metadados: Nome, versão, fontes, quantidade de seções e de termos...
+        documento: O texto do pacote (DocumentoPacote)
+        indice: O índice das seções (IndicePacote)
+
+    Raises:
+        ErroPacote: Se o arquivo não for um pacote ou for de outro formato
+    """
+
+    def __init__(self, caminho: str):
+        self.caminho = str(caminho)
+        with open(self.caminho, 'rb') as arquivo:
+            self._mapa = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mapa) < CABECALHO.size:
+            raise ErroPacote(f"{self.caminho} não é um pacote de conhecimento")
+        magica, formato, deslocamento, tamanho = CABECALHO.unpack_from(self._mapa)
+        if magica != MAGICA:
+            raise ErroPacote(f"{self.caminho} não é um pacote de conhecimento")
+        if formato != FORMATO:
+            raise ErroPacote(f"{self.caminho} usa o formato {formato}; esta versão lê o formato {FORMATO}. "
+                             f"Reconstrua o pacote com `python pacotes.py construir`")
+        self.metadados = json.loads(self._mapa[deslocamento:deslocamento + tamanho].decode('utf-8'))
+        if self.metadados['ordem_bytes'] != sys.byteorder:
+            raise ErroPacote(f"{self.caminho} foi construído em uma máquina {self.metadados['ordem_bytes']}-endian")
+
+        visao = memoryview(self._mapa)
+        self.blocos = {nome: visao[inicio:inicio + tamanho].cast(BLOCOS[nome])
+                       for nome, (inicio, tamanho) in self.metadados['blocos'].items()}
+        self.documento = DocumentoPacote(self)
+        self.indice = IndicePacote(self)
+
+    @property
+    def nome(self) -> str:
+        return self.metadados['nome']
+
+    @property
+    def versao(self) -> str:
+        return self.metadados['versao']
+
+    def __len__(self):
+        return len(self.documento)
+
+    def __repr__(self):
+        return f"<PacoteConhecimento {self.nome} v{self.versao}: {self.metadados['secoes']} seções em {self.caminho}>"
+
+
+@lru_cache(maxsize=None)
+def _abrir(caminho: str, modificado: int, tamanho: int) -> PacoteConhecimento:
+    return PacoteConhecimento(caminho)
+
+
+def abrir_pacote(caminho: str) -> PacoteConhecimento:
+    """
+    Abre o pacote (uma única vez por processo enquanto o arquivo não mudar).
+
+    Raises:
+        ErroPacote: Se o arquivo não for um pacote ou for de outro formato
+        OSError: Se o arquivo não puder ser lido
+    """
+    caminho = os.path.realpath(caminho)
+    estado = os.stat(caminho)
+    return _abrir(caminho, estado.st_mtime_ns, estado.st_size)
+
+
+def abrir_pacotes(caminhos: str = PACOTES) -> List[PacoteConhecimento]:
+    """
+    Abre os pacotes configurados; pacotes inválidos são ignorados com um aviso.
+
+    Args:
+        caminhos: Arquivos ou diretórios (todos os *.nandapack) separados por os.pathsep
+
+    Returns:
+        List[PacoteConhecimento]: Pacotes abertos, na ordem informada
+    """
+    arquivos = []
+    for caminho in filter(None, (c.strip() for c in caminhos.split(os.pathsep))):
+        if os.path.isdir(caminho):
+            arquivos.extend(sorted(str(p) for p in Path(caminho).glob(f"*{EXTENSAO}")))
+        else:
+            arquivos.append(caminho)
+
+    pacotes = []
+    for arquivo in arquivos:
+        try:
+            pacote = abrir_pacote(arquivo)
+        except (ErroPacote, OSError, ValueError) as e:
+            print(f"⚠️ Aviso: Pacote de conhecimento ignorado ({arquivo}): {e}")
+            continue
+        if pacote not in pacotes:
+            pacotes.append(pacote)
+    return pacotes
+
+
+def descrever_pacote(pacote: PacoteConhecimento) -> str:
+    """Texto curto sobre o pacote, para exibir ao usuário."""
+    fontes = len(pacote.metadados['fontes'])
+    return (f"📦 {pacote.nome} (versão {pacote.versao}): {fontes} fonte(s), "
+            f"{pacote.metadados['secoes']} seções, {len(pacote):,} caracteres")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pacotes de conhecimento do NandaBot (fontes pré-indexadas)")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    construir = comandos.add_parser('construir', help="Carrega as fontes de um manifesto e grava o pacote")
+    construir.add_argument('manifesto', help="JSON com as fontes ou arquivo texto com uma fonte por linha (ver lote.py)")
+    construir.add_argument('--saida', required=True, help=f"Arquivo do pacote (ex.: manuais{EXTENSAO})")
+    construir.add_argument('--nome', help="Nome exibido ao usuário (padrão: nome do arquivo)")
+    construir.add_argument('--versao', help="Versão do conteúdo (padrão: data e hora da construção)")
+
+    info = comandos.add_parser('info', help="Exibe os metadados de um pacote")
+    info.add_argument('pacote', help="Arquivo do pacote")
+    args = parser.parse_args(argv)
+
+    if args.comando == 'info':
+        try:
+            pacote = abrir_pacote(args.pacote)
+        except (ErroPacote, OSError) as e:
+            print(f"❌ {e}")
+            return 1
+        print(descrever_pacote(pacote))
+        print(f"   Construído em {pacote.metadados['criado_em']}, {pacote.metadados['termos']} termos indexados")
+        for fonte in pacote.metadados['fontes']:
+            print(f"   [{fonte['tipo']}] {fonte['origem']} ({fonte['caracteres']} caracteres)")
+        return 0
+
+    from lote import ler_manifesto, carregar_lote, secoes_documentos, imprimir_relatorio
+
+    fontes = ler_manifesto(args.manifesto)
+    print(f"\nCarregando {len(fontes)} fonte(s) em paralelo...")
+    resultados = carregar_lote(fontes)
+    imprimir_relatorio(resultados)
+
+    if not any(r['documento'] for r in resultados):
+        print("❌ Nenhuma fonte carregada; o pacote não foi gravado")
+        return 1
+
+    metadados = construir_pacote(
+        secoes_documentos(resultados), args.saida, nome=args.nome, versao=args.versao,
+        fontes=[{'tipo': r['tipo'], 'origem': r['origem'], 'caracteres': len(r['documento'])}
+                for r in resultados if r['documento']]
+    )
+    print(f"\n✓ Pacote salvo em {args.saida}: {metadados['secoes']} seções, {metadados['termos']} termos, "
+          f"{os.path.getsize(args.saida) / 1024 / 1024:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
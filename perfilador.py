@@ -0,0 +1,201 @@
+"""
+Módulo de perfil por amostragem
+Captura, sob demanda, onde o tempo é gasto em uma carga de documento ou em
+um turno: uma thread de segundo plano lê a pilha da thread perfilada a cada
+poucos milissegundos (sys._current_frames), sem instrumentar o código.
+O resultado é gravado em formato de pilhas colapsadas (uma pilha por linha,
+"a;b;c N"), aceito por flamegraph.pl, speedscope e similares
+
+Ativado com NANDABOT_PERFIL=1 (terminal) ou pela opção da barra lateral do Streamlit.
+"""
+
+import os
+import sys
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+
+ATIVO = os.getenv('NANDABOT_PERFIL', '0') == '1'
+
+# Intervalo entre amostras (segundos)
+INTERVALO = float(os.getenv('NANDABOT_PERFIL_INTERVALO', '0.005'))
+
+# Diretório dos arquivos de pilhas colapsadas
+DIRETORIO_PERFIS = Path(os.getenv('NANDABOT_PERFIL_DIR', Path(__file__).parent / '.cache' / 'perfis'))
+
+# Quadros mais profundos que isso são descartados (recursões muito longas)
+PROFUNDIDADE_MAXIMA = 200
+
+
+def _rotulo(quadro) -> str:
+    """Nome do quadro na pilha: módulo:função."""
+    codigo = quadro.f_code
+    modulo = Path(codigo.co_filename).stem
+    return f"{modulo}:{getattr(codigo, 'co_qualname', codigo.co_name)}"
+
+
+class Perfil:
+    """
+    Amostras de pilha de uma carga ou turno.
+
+    Atributos:
+        nome: Identificação do perfil (ex.: "carga_pdf", "turno")
+        pilhas: Contagem de cada pilha (da raiz até a função em execução)
+        por_thread: Se cada pilha começa pelo nome da thread
+        segundos: Duração da captura
+        caminho: Arquivo de pilhas colapsadas gravado (se houver)
+    """
+
+    def __init__(self, nome: str, por_thread: bool = False):
+        self.nome = nome
+        self.pilhas = Counter()
+        self.por_thread = por_thread
+        self.segundos = 0.0
+        self.caminho: Optional[Path] = None
+
+    @property
+    def amostras(self) -> int:
+        return sum(self.pilhas.values())
+
+    def colapsado(self) -> str:
+        """Pilhas no formato colapsado ("raiz;...;folha contagem"), uma por linha."""
+        return ''.join(f"{';'.join(pilha)} {contagem}\n" for pilha, contagem in self.pilhas.most_common())
+
+    def resumo(self, quantidade: int = 15) -> List[dict]:
+        """
+        Funções com mais amostras.
+
+        Returns:
+            List[dict]: funcao, proprio (% das amostras em que era a função em
+            execução) e total (% das amostras em que estava na pilha)
+        """
+        total = self.amostras
+        if not total:
+            return []
+        proprio = Counter()
+        inclusivo = Counter()
+        for pilha, contagem in self.pilhas.items():
+            # O nome da thread é só a raiz da pilha no arquivo, não uma função
+            pilha = pilha[1:] if self.por_thread else pilha
+            if not pilha:
+                continue
+            proprio[pilha[-1]] += contagem
+            for funcao in set(pilha):
+                inclusivo[funcao] += contagem
+        return [{'funcao': funcao, 'proprio': 100.0 * proprio[funcao] / total,
+                 'total': 100.0 * inclusivo[funcao] / total}
+                for funcao, _ in proprio.most_common(quantidade)]
+
+    def salvar(self, diretorio: Path = DIRETORIO_PERFIS) -> Path:
+        """Grava as pilhas colapsadas em <diretorio>/<nome>-<data>.folded."""
+        diretorio = Path(diretorio)
+        diretorio.mkdir(parents=True, exist_ok=True)
+        self.caminho = diretorio / f"{self.nome}-{datetime.now():%Y%m%d-%H%M%S-%f}.folded"
+        self.caminho.write_text(self.colapsado(), encoding='utf-8')
+        return self.caminho
+
+
+class Perfilador:
+    """
+    Amostra periodicamente a pilha da thread que chamou `iniciar`.
+
+    Args:
+        nome: Nome do perfil
+        intervalo: Intervalo entre amostras (segundos)
+        novas_threads: Amostra também as threads iniciadas durante a captura, como
+            as das chamadas ao modelo e do map-reduce (a pilha começa pelo nome da
+            thread); as que já existiam (ex.: as outras sessões de um servidor) ficam de fora
+    """
+
+    def __init__(self, nome: str, intervalo: float = INTERVALO, novas_threads: bool = False):
+        self.perfil = Perfil(nome, por_thread=novas_threads)
+        self.intervalo = intervalo
+        self.novas_threads = novas_threads
+        self._alvo = None
+        self._existentes = set()
+        self._parar = threading.Event()
+        self._thread = None
+        self._inicio = 0.0
+
+    def _pilha(self, quadro) -> tuple:
+        pilha = []
+        while quadro is not None and len(pilha) < PROFUNDIDADE_MAXIMA:
+            pilha.append(_rotulo(quadro))
+            quadro = quadro.f_back
+        pilha.reverse()
+        return tuple(pilha)
+
+    def _amostrar(self):
+        while not self._parar.wait(self.intervalo):
+            quadros = sys._current_frames()
+            if self.novas_threads:
+                for thread in threading.enumerate():
+                    perfilada = thread.ident == self._alvo or thread not in self._existentes
+                    if perfilada and thread.ident in quadros:
+                        self.perfil.pilhas[(thread.name,) + self._pilha(quadros[thread.ident])] += 1
+            elif self._alvo in quadros:
+                self.perfil.pilhas[self._pilha(quadros[self._alvo])] += 1
+
+    def iniciar(self) -> 'Perfilador':
+        self._alvo = threading.get_ident()
+        self._inicio = time.perf_counter()
+        self._thread = threading.Thread(target=self._amostrar, daemon=True, name="perfilador")
+        self._existentes = set(threading.enumerate()) | {self._thread}
+        self._thread.start()
+        return self
+
+    def parar(self) -> Perfil:
+        self._parar.set()
+        self._thread.join()
+        self.perfil.segundos = time.perf_counter() - self._inicio
+        return self.perfil
+
+
+@contextmanager
+def perfilar(nome: str, ativo: Optional[bool] = None, novas_threads: bool = False,
+             diretorio: Path = DIRETORIO_PERFIS):
+    """
+    Perfila o bloco e grava as pilhas colapsadas ao final.
+
+    Args:
+        nome: Nome do perfil (usado no arquivo)
+        ativo: Se perfila (padrão: NANDABOT_PERFIL)
+        novas_threads: Inclui as threads iniciadas durante o bloco (chamadas ao modelo, map-reduce)
+        diretorio: Onde gravar o arquivo
+
+    Yields:
+        Optional[Perfil]: O perfil (preenchido ao sair do bloco), ou None se desativado
+
+    Exemplo:
+        with perfilar('carga_pdf') as perfil:
+            documento = carregar_pdf_arquivo(caminho)
+        if perfil:
+            imprimir_resumo(perfil)
+    """
+    if not (ATIVO if ativo is None else ativo):
+        yield None
+        return
+
+    perfilador = Perfilador(nome, novas_threads=novas_threads).iniciar()
+    try:
+        yield perfilador.perfil
+    finally:
+        perfil = perfilador.parar()
+        try:
+            perfil.salvar(diretorio)
+        except OSError as e:
+            print(f"⚠️ Aviso: Não foi possível salvar o perfil: {e}")
+
+
+def imprimir_resumo(perfil: Perfil, quantidade: int = 10):
+    """Imprime as funções com mais amostras no terminal."""
+    print(f"\n🔬 Perfil '{perfil.nome}': {perfil.amostras} amostras em {perfil.segundos:.2f}s")
+    for linha in perfil.resumo(quantidade):
+        print(f"   {linha['proprio']:5.1f}% próprio  {linha['total']:5.1f}% total  {linha['funcao']}")
+    if perfil.caminho:
+        print(f"   Pilhas colapsadas em {perfil.caminho} (flamegraph.pl ou speedscope)")
@@ -0,0 +1,224 @@
+"""
+Módulo de perguntas em lote
+Responde a uma lista de perguntas sobre uma fonte sem interação: a fonte é
+carregada uma única vez, as perguntas são validadas em lote e respondidas em
+paralelo (com limite de concorrência) e os resultados são gravados em JSONL
+
+Uso:
+    python questionario.py documento.pdf perguntas.jsonl --saida respostas.jsonl --concorrencia 4
+
+Cada linha do arquivo de perguntas é um objeto {"id": ..., "pergunta": "..."}
+ou apenas a pergunta entre aspas; linhas em branco e iniciadas por # são ignoradas.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import List, Optional
+from agendador import LIMITE_TPM
+from bot import resposta_bot_async, MAX_CARACTERES_CONTEXTO
+from guardrails import sanitizar_entrada_usuario, validar_lote_async
+from indice import IndiceSecoes
+from lote import carregar_lote, detectar_tipo, juntar_documentos, imprimir_relatorio
+from modelos import contar_tokens, em_lote, TOKENS_SAIDA_ESTIMADOS
+from reducao import CARACTERES_POR_TOKEN
+from resumos import obter_arvore, RESUMOS_ATIVOS
+from roteamento import roteador, imprimir_relatorio as imprimir_relatorio_modelo
+
+
+# Perguntas respondidas ao mesmo tempo (as chamadas ainda passam pelo agendador)
+CONCORRENCIA_PADRAO = int(os.getenv('NANDABOT_CONCORRENCIA_PERGUNTAS', '4'))
+
+
+def ler_perguntas(caminho: str) -> List[dict]:
+    """
+    Lê o arquivo JSONL de perguntas.
+
+    Args:
+        caminho: Caminho do arquivo
+
+    Returns:
+        List[dict]: Perguntas com id (o número da linha, se não informado) e pergunta
+
+    Raises:
+        ValueError: Se uma linha não for JSON válido ou não tiver pergunta
+    """
+    perguntas = []
+    with open(caminho, 'r', encoding='utf-8') as f:
+        for numero, linha in enumerate(f, 1):
+            linha = linha.strip()
+            if not linha or linha.startswith('#'):
+                continue
+            try:
+                item = json.loads(linha)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Linha {numero}: JSON inválido ({e})")
+            if isinstance(item, str):
+                item = {'pergunta': item}
+            if not isinstance(item, dict) or not str(item.get('pergunta') or '').strip():
+                raise ValueError(f"Linha {numero}: informe a pergunta")
+            perguntas.append({**item, 'id': item.get('id', numero), 'pergunta': str(item['pergunta'])})
+    return perguntas
+
+
+def limitar_concorrencia(concorrencia: int, documento: str) -> int:
+    """
+    Limita a concorrência às respostas que cabem no limite de tokens por minuto.
+
+    Cada resposta envia até MAX_CARACTERES_CONTEXTO caracteres do documento;
+    mais perguntas ao mesmo tempo do que isso só ficariam esperando na fila.
+    """
+    tokens_resposta = min(len(documento), MAX_CARACTERES_CONTEXTO) // CARACTERES_POR_TOKEN + TOKENS_SAIDA_ESTIMADOS
+    return max(1, min(concorrencia, LIMITE_TPM // tokens_resposta))
+
+
+def carregar_fonte(origem: str, max_paginas: int = 20) -> str:
+    """Carrega a fonte (PDF, site, vídeo ou playlist) e retorna o documento."""
+    resultados = carregar_lote([{'tipo': detectar_tipo(origem), 'origem': origem, 'max_paginas': max_paginas}])
+    imprimir_relatorio(resultados)
+    return juntar_documentos(resultados)
+
+
+async def responder_perguntas(perguntas: List[dict], documento: str, concorrencia: int = CONCORRENCIA_PADRAO,
+                              guardrails: bool = True, indice: Optional[IndiceSecoes] = None,
+                              arvore=None) -> List[dict]:
+    """
+    Responde às perguntas sobre o documento, cada uma como uma conversa nova.
+
+    As perguntas e, depois, as respostas são validadas em lote (uma chamada
+    de moderação para várias perguntas), em vez de uma chamada por item.
+    Todas as chamadas são feitas como trabalho em lote (modelos.em_lote): o
+    prazo cobre a espera na fila por capacidade e perguntas interativas de
+    outras conversas são atendidas antes.
+
+    Args:
+        perguntas: Perguntas (ver ler_perguntas)
+        documento: Documento carregado
+        concorrencia: Máximo de perguntas respondidas ao mesmo tempo (ver limitar_concorrencia)
+        guardrails: Se valida as perguntas e as respostas
+        indice: Índice das seções do documento (documentos grandes)
+        arvore: Árvore de resumos do documento
+
+    Returns:
+        List[dict]: Um resultado por pergunta, na ordem, com resposta, segura,
+        bloqueada, motivo, erro, segundos e tokens
+    """
+    with em_lote():
+        return await _responder_perguntas(perguntas, documento, limitar_concorrencia(concorrencia, documento),
+                                          guardrails, indice, arvore)
+
+
+async def _responder_perguntas(perguntas, documento, concorrencia, guardrails, indice, arvore) -> List[dict]:
+    textos = [sanitizar_entrada_usuario(p['pergunta']) for p in perguntas]
+    resultados = [{'id': p['id'], 'pergunta': texto, 'resposta': None, 'segura': None, 'bloqueada': False,
+                   'motivo': None, 'erro': None, 'segundos': 0.0, 'chamadas': 0, 'tokens_entrada': 0,
+                   'tokens_saida': 0} for p, texto in zip(perguntas, textos)]
+
+    if guardrails:
+        validacoes = await validar_lote_async(textos, estagio='moderacao_entrada')
+        for resultado, (seguro, motivo) in zip(resultados, validacoes):
+            resultado['bloqueada'] = not seguro
+            resultado['motivo'] = motivo
+
+    semaforo = asyncio.Semaphore(concorrencia)
+
+    async def responder(resultado):
+        async with semaforo:
+            inicio = time.perf_counter()
+            with contar_tokens() as contagem:
+                try:
+                    resultado['resposta'] = await resposta_bot_async([('user', resultado['pergunta'])], documento,
+                                                                     indice=indice, arvore=arvore)
+                except Exception as e:
+                    resultado['erro'] = str(e)
+            resultado['segundos'] = round(time.perf_counter() - inicio, 3)
+            resultado['chamadas'] = contagem.chamadas
+            resultado['tokens_entrada'] = contagem.entrada
+            resultado['tokens_saida'] = contagem.saida
+
+    await asyncio.gather(*(responder(r) for r in resultados if not r['bloqueada']))
+
+    respondidos = [r for r in resultados if r['resposta']]
+    if guardrails and respondidos:
+        validacoes = await validar_lote_async([r['resposta'] for r in respondidos], estagio='moderacao_saida')
+        for resultado, (seguro, motivo) in zip(respondidos, validacoes):
+            resultado['segura'] = seguro
+            if not seguro:
+                resultado['resposta'] = f"[Resposta filtrada por segurança: {motivo}]"
+
+    return resultados
+
+
+def gravar_resultados(resultados: List[dict], caminho: str):
+    """Grava os resultados em JSONL (um objeto por linha)."""
+    with open(caminho, 'w', encoding='utf-8') as f:
+        for resultado in resultados:
+            f.write(json.dumps(resultado, ensure_ascii=False) + '\n')
+
+
+def imprimir_resumo(resultados: List[dict], segundos: float):
+    """Imprime o resumo do lote de perguntas no terminal."""
+    respondidas = [r for r in resultados if r['resposta'] and not r['erro']]
+    bloqueadas = sum(1 for r in resultados if r['bloqueada'])
+    erros = sum(1 for r in resultados if r['erro'])
+    tokens = sum(r['tokens_entrada'] + r['tokens_saida'] for r in resultados)
+
+    print(f"\n✓ {len(respondidas)}/{len(resultados)} pergunta(s) respondida(s) em {segundos:.2f}s"
+          + (f", {bloqueadas} bloqueada(s)" if bloqueadas else '')
+          + (f", {erros} com erro" if erros else ''))
+    if respondidas:
+        latencias = sorted(r['segundos'] for r in respondidas)
+        print(f"   Latência por pergunta: mediana {latencias[len(latencias) // 2]:.2f}s, máxima {latencias[-1]:.2f}s")
+    print(f"   Tokens das respostas: {tokens}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Responde a um arquivo de perguntas sobre uma fonte, sem interação")
+    parser.add_argument('fonte', help="Caminho de PDF, URL de site, vídeo ou playlist do YouTube")
+    parser.add_argument('perguntas', help="Arquivo JSONL com as perguntas")
+    parser.add_argument('--saida', help="Arquivo JSONL de resultados (padrão: <perguntas>.respostas.jsonl)")
+    parser.add_argument('--concorrencia', type=int, default=CONCORRENCIA_PADRAO,
+                        help=f"Perguntas respondidas ao mesmo tempo (padrão: {CONCORRENCIA_PADRAO})")
+    parser.add_argument('--max-paginas', type=int, default=20, help="Páginas visitadas em sites (padrão: 20)")
+    parser.add_argument('--sem-guardrails', action='store_true', help="Não valida perguntas nem respostas")
+    args = parser.parse_args(argv)
+
+    try:
+        perguntas = ler_perguntas(args.perguntas)
+    except (OSError, ValueError) as e:
+        print(f"❌ Erro ao ler as perguntas: {e}")
+        return 1
+    if not perguntas:
+        print("❌ Nenhuma pergunta encontrada")
+        return 1
+
+    documento = carregar_fonte(args.fonte, args.max_paginas)
+    if not documento:
+        print("❌ Nenhum conteúdo carregado da fonte")
+        return 1
+
+    # Índice e resumos montados uma única vez para todas as perguntas
+    indice = IndiceSecoes(documento) if len(documento) > MAX_CARACTERES_CONTEXTO else None
+    arvore = obter_arvore(documento) if RESUMOS_ATIVOS else None
+
+    concorrencia = limitar_concorrencia(args.concorrencia, documento)
+    print(f"\nRespondendo {len(perguntas)} pergunta(s) (até {concorrencia} ao mesmo tempo)...")
+    inicio = time.perf_counter()
+    resultados = asyncio.run(responder_perguntas(perguntas, documento, concorrencia,
+                                                 not args.sem_guardrails, indice, arvore))
+    segundos = time.perf_counter() - inicio
+
+    saida = args.saida or os.path.splitext(args.perguntas)[0] + '.respostas.jsonl'
+    gravar_resultados(resultados, saida)
+    imprimir_resumo(resultados, segundos)
+    imprimir_relatorio_modelo(roteador.relatorio())
+    print(f"\nResultados salvos em {saida}")
+
+    return 0 if any(r['resposta'] for r in resultados) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""
+Módulo de redução de texto
+Remove linhas repetidas entre páginas (menus, rodapés, banners de cookies,
+cabeçalhos de PDF) e normaliza espaços, economizando tokens do contexto
+"""
+
+import re
+import hashlib
+from collections import Counter
+from typing import Iterable, Iterator, List, Tuple
+
+
+# Uma linha é considerada "moldura" quando aparece em pelo menos esta fração das páginas
+FRACAO_REPETICAO = 0.5
+
+# Abaixo desta quantidade de páginas não há base estatística para detectar repetições
+MINIMO_PAGINAS = 3
+
+# Caracteres por token (estimativa usada em todo o projeto: 60000 caracteres ~ 15000 tokens)
+CARACTERES_POR_TOKEN = 4
+
+
+def estimar_tokens(texto: str) -> int:
+    """Estimativa simples de tokens a partir do número de caracteres."""
+    return len(texto) // CARACTERES_POR_TOKEN
+
+
+def normalizar_espacos(texto: str) -> str:
+    """
+    Colapsa espaços e linhas em branco de layout.
+
+    Args:
+        texto: Texto extraído da página
+
+    Returns:
+        str: Texto com no máximo um espaço seguido e uma linha em branco seguida
+    """
+    texto = re.sub(r'[ \t\f\v\u00a0]+', ' ', texto)
+    texto = re.sub(r' ?\n ?', '\n', texto)
+    texto = re.sub(r'\n{3,}', '\n\n', texto)
+    return texto.strip()
+
+
+# Linhas do topo/rodapé de cada página onde contadores de página ("Página 3 de 10") são procurados
+LINHAS_BORDA = 2
+
+# Palavras de um contador de página; linhas só com elas e números casam ignorando os números
+PALAVRAS_CONTADOR = {'página', 'pagina', 'pág', 'pag', 'pg', 'page', 'p', 'folha', 'fl', 'nº', 'n', 'no',
+                     'número', 'numero', 'de', 'of'}
+
+# Linhas repetidas isoladas (fora de um bloco de linhas repetidas) só são removidas
+# com pelo menos esta quantidade de palavras: "Sim" ou "Total" repetidos são conteúdo
+MINIMO_PALAVRAS_ISOLADA = 2
+
+
+def _hash(texto: str) -> bytes:
+    return hashlib.blake2b(texto.encode('utf-8'), digest_size=8).digest()
+
+
+def _contador_pagina(linha: str) -> bool:
+    """Linha que é só um contador de página: "3", "- 3 -", "3/10", "Página 3 de 10", "pág. 3"."""
+    if not re.search(r'\d', linha):
+        return False
+    palavras = re.findall(r'[^\W\d_]+º?', linha)
+    return all(palavra in PALAVRAS_CONTADOR for palavra in palavras)
+
+
+def _assinaturas(linhas: List[str]) -> List[Tuple[bytes, bytes]]:
+    """
+    Assinaturas de cada linha não vazia da página.
+
+    Cada linha recebe o hash exato e, se for um contador de página no topo ou
+    no rodapé da página, um hash que ignora números (para casar "Página 3 de 10"
+    com "Página 4 de 10"). Linhas com outras palavras nunca ignoram números,
+    para não confundir conteúdo real como "Capítulo 1" e "Capítulo 2".
+    """
+    indices = [i for i, linha in enumerate(linhas) if linha.strip()]
+    borda = set(indices[:LINHAS_BORDA] + indices[-LINHAS_BORDA:])
+
+    assinaturas = [None] * len(linhas)
+    for i in indices:
+        normalizada = linhas[i].strip().lower()
+        contador = i in borda and _contador_pagina(normalizada)
+        sem_numeros = _hash('#' + re.sub(r'\d+', '#', normalizada)) if contador else None
+        assinaturas[i] = (_hash(normalizada), sem_numeros)
+    return assinaturas
+
+
+def _molduras(linhas: List[str], assinaturas: List[Tuple[bytes, bytes]], repetidas: set) -> List[bool]:
+    """
+    Marca as linhas da página que são moldura e devem ser removidas.
+
+    São moldura os contadores de página repetidos, as linhas repetidas em
+    sequência (menus, rodapés e banners de várias linhas) e as linhas
+    repetidas isoladas com pelo menos MINIMO_PALAVRAS_ISOLADA palavras.
+    """
+    repetida = [bool(par) and par[0] in repetidas for par in assinaturas]
+    indices = [i for i, linha in enumerate(linhas) if linha.strip()]
+
+    moldura = [False] * len(linhas)
+    for posicao, i in enumerate(indices):
+        if assinaturas[i][1] in repetidas:
+            moldura[i] = True
+        elif repetida[i]:
+            vizinhas = [indices[j] for j in (posicao - 1, posicao + 1) if 0 <= j < len(indices)]
+            moldura[i] = (any(repetida[j] for j in vizinhas)
+                          or len(linhas[i].split()) >= MINIMO_PALAVRAS_ISOLADA)
+    return moldura
+
+
+class RemocaoRepeticoes:
+    """
+    Remoção das linhas repetidas em duas passagens pelas páginas.
+
+    `observar` guarda só as assinaturas (hashes) das linhas de cada página e
+    conta em quantas páginas cada uma aparece; depois de observar todas as
+    páginas, `filtrar` remove as molduras de cada uma. As páginas não precisam
+    ficar em memória entre as passagens (ver reduzir_paginas_em_fluxo).
+
+    Args:
+        fracao: Fração mínima de páginas para uma linha ser considerada repetida
+        minimo_paginas: Quantidade mínima de páginas para aplicar a remoção
+    """
+
+    def __init__(self, fracao: float = FRACAO_REPETICAO, minimo_paginas: int = MINIMO_PAGINAS):
+        self.fracao = fracao
+        self.minimo_paginas = minimo_paginas
+        self.removidas = 0
+        self._assinaturas = []
+        self._frequencia = Counter()
+        self._repetidas = None
+
+    def observar(self, pagina: str):
+        """Primeira passagem: conta as linhas da próxima página."""
+        assinaturas = _assinaturas(pagina.split('\n'))
+        self._assinaturas.append(assinaturas)
+        self._frequencia.update({h for par in assinaturas if par for h in par if h})
+
+    def _calcular_repetidas(self) -> set:
+        paginas = len(self._assinaturas)
+        if paginas < self.minimo_paginas:
+            return set()
+        limite = max(2, int(paginas * self.fracao + 0.999))
+        return {assinatura for assinatura, n in self._frequencia.items() if n >= limite}
+
+    def filtrar(self, numero: int, pagina: str) -> str:
+        """Segunda passagem: a página `numero` (já observada) sem as linhas de moldura."""
+        if self._repetidas is None:
+            self._repetidas = self._calcular_repetidas()
+        if not self._repetidas:
+            return pagina
+        linhas = pagina.split('\n')
+        moldura = _molduras(linhas, self._assinaturas[numero], self._repetidas)
+        self.removidas += sum(moldura)
+        return '\n'.join(linha for linha, remover in zip(linhas, moldura) if not remover)
+
+
+def remover_repeticoes(paginas: List[str], fracao: float = FRACAO_REPETICAO,
+                       minimo_paginas: int = MINIMO_PAGINAS) -> Tuple[List[str], int]:
+    """
+    Remove as linhas que se repetem em grande parte das páginas.
+
+    Conta, para cada linha (por hash), em quantas páginas ela aparece;
+    linhas presentes em pelo menos `fracao` das páginas são descartadas
+    quando são moldura (ver _molduras).
+
+    Args:
+        paginas: Texto de cada página
+        fracao: Fração mínima de páginas para uma linha ser considerada repetida
+        minimo_paginas: Quantidade mínima de páginas para aplicar a remoção
+
+    Returns:
+        Tuple[List[str], int]: (páginas sem as linhas repetidas, linhas removidas)
+    """
+    remocao = RemocaoRepeticoes(fracao, minimo_paginas)
+    for pagina in paginas:
+        remocao.observar(pagina)
+    resultado = [remocao.filtrar(numero, pagina) for numero, pagina in enumerate(paginas)]
+    return resultado, remocao.removidas
+
+
+def reduzir_paginas_em_fluxo(paginas: Iterable[str]) -> Tuple[Iterator[str], dict]:
+    """
+    Versão de reduzir_paginas para páginas guardadas fora da memória.
+
+    `paginas` é percorrido duas vezes (ex.: armazenamento.PaginasComprimidas):
+    a primeira passagem acontece aqui; a segunda, à medida que as páginas
+    reduzidas são consumidas.
+
+    Args:
+        paginas: Texto de cada página do documento (percorrível mais de uma vez)
+
+    Returns:
+        Tuple[Iterator[str], dict]: (páginas reduzidas, relatório como em
+        reduzir_paginas, completo quando o iterador termina)
+    """
+    remocao = RemocaoRepeticoes()
+    tokens_antes = 0
+    for pagina in paginas:
+        tokens_antes += estimar_tokens(pagina)
+        remocao.observar(normalizar_espacos(pagina))
+
+    relatorio = {'tokens_antes': tokens_antes, 'tokens_depois': 0, 'linhas_removidas': 0,
+                 'reducao_percentual': 0.0}
+
+    def reduzidas():
+        for numero, pagina in enumerate(paginas):
+            reduzida = normalizar_espacos(remocao.filtrar(numero, normalizar_espacos(pagina)))
+            relatorio['tokens_depois'] += estimar_tokens(reduzida)
+            yield reduzida
+        relatorio['linhas_removidas'] = remocao.removidas
+        if tokens_antes:
+            relatorio['reducao_percentual'] = 100 * (tokens_antes - relatorio['tokens_depois']) / tokens_antes
+
+    return reduzidas(), relatorio
+
+
+def reduzir_paginas(paginas: List[str]) -> Tuple[List[str], dict]:
+    """
+    Aplica a redução completa: normalização de espaços e remoção de repetições.
+
+    Args:
+        paginas: Texto de cada página do documento
+
+    Returns:
+        Tuple[List[str], dict]: (páginas reduzidas, relatório com tokens_antes,
+        tokens_depois, linhas_removidas e reducao_percentual)
+    """
+    reduzidas, relatorio = reduzir_paginas_em_fluxo(paginas)
+    return list(reduzidas), relatorio
+
+
+def descrever_reducao(relatorio: dict) -> str:
+    """Texto curto com a economia de tokens, para exibir ao usuário."""
+    return (f"Redução de texto: ~{relatorio['tokens_antes']:,} → ~{relatorio['tokens_depois']:,} tokens "
+            f"(-{relatorio['reducao_percentual']:.0f}%, {relatorio['linhas_removidas']} linhas repetidas removidas)")
@@ -0,0 +1,333 @@
+"""
+Módulo de resiliência das chamadas ao modelo
+Prazos por estágio do turno, novas tentativas com backoff exponencial e
+jitter para erros transitórios e, opcionalmente, requisições duplicadas
+("hedging") após um atraso derivado do p95 da latência do estágio
+"""
+
+import os
+import time
+import random
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+from typing import Callable, Optional
+
+
+# Prazo total de cada estágio, somando todas as tentativas (segundos)
+PRAZOS_ESTAGIO = {
+    'moderacao_entrada': 15.0,
+    'moderacao_saida': 20.0,
+    'resposta': 60.0,
+    'mapreduce': 90.0,
+    'resumo': 180.0,
+}
+PRAZO_PADRAO = 60.0
+
+# Tempo máximo de uma única tentativa (segundos)
+TIMEOUT_TENTATIVA = {
+    'moderacao_entrada': 6.0,
+    'moderacao_saida': 8.0,
+    'resposta': 30.0,
+    'mapreduce': 45.0,
+    'resumo': 60.0,
+}
+TIMEOUT_TENTATIVA_PADRAO = 30.0
+
+# Backoff exponencial com jitter completo: uniforme(0, min(MAX, BASE * 2^n))
+ATRASO_BASE = 0.5
+ATRASO_MAXIMO = 8.0
+MAX_TENTATIVAS = 4
+
+# Hedging: só em estágios interativos (duplicar map-reduce e resumos gasta cota à toa)
+HEDGING_ATIVO = os.getenv('NANDABOT_HEDGING', '0') == '1'
+ESTAGIOS_HEDGING = {'moderacao_entrada', 'moderacao_saida', 'resposta'}
+PERCENTIL_HEDGING = 95
+MINIMO_AMOSTRAS_HEDGING = 20
+
+
+class PrazoEsgotadoError(TimeoutError):
+    """O estágio não obteve resposta do modelo dentro do prazo."""
+
+
+class EstatisticasLatencia:
+    """
+    Latências recentes das chamadas bem-sucedidas de um estágio.
+
+    Args:
+        tamanho: Quantidade de amostras mantidas
+    """
+
+    def __init__(self, tamanho: int = 200):
+        self.amostras = deque(maxlen=tamanho)
+        self._trava = threading.Lock()
+
+    def registrar(self, segundos: float):
+        with self._trava:
+            self.amostras.append(segundos)
+
+    def percentil(self, p: float) -> Optional[float]:
+        """Percentil p (0-100) das amostras, ou None se não houver amostras."""
+        with self._trava:
+            ordenadas = sorted(self.amostras)
+        if not ordenadas:
+            return None
+        posicao = min(len(ordenadas) - 1, int(round(p / 100 * (len(ordenadas) - 1))))
+        return ordenadas[posicao]
+
+    def __len__(self):
+        return len(self.amostras)
+
+
+latencias = {}
+_trava_latencias = threading.Lock()
+
+
+def estatisticas(estagio: str) -> EstatisticasLatencia:
+    """Estatísticas de latência do estágio (criadas na primeira chamada)."""
+    with _trava_latencias:
+        if estagio not in latencias:
+            latencias[estagio] = EstatisticasLatencia()
+        return latencias[estagio]
+
+
+def status_http(erro: Exception) -> Optional[int]:
+    """Status HTTP do erro (clientes do Groq/OpenAI ou httpx.HTTPStatusError), se houver."""
+    status = getattr(erro, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(erro, 'response', None), 'status_code', None)
+    return status if isinstance(status, int) else None
+
+
+def erro_repetivel(erro: Exception) -> bool:
+    """
+    Indica se vale tentar de novo: timeouts, falhas de conexão, 408, 409, 429 e 5xx.
+
+    Erros de requisição (400, 401, 404...) e a recusa do agendador não são repetidos.
+    """
+    if isinstance(erro, (TimeoutError, ConnectionError)):
+        return True
+
+    try:
+        import groq
+        if isinstance(erro, (groq.APITimeoutError, groq.APIConnectionError)):
+            return True
+    except ImportError:
+        pass
+
+    status = status_http(erro)
+    return status in (408, 409, 429) or (status is not None and status >= 500)
+
+
+def retry_after(erro: Exception) -> Optional[float]:
+    """Segundos indicados no cabeçalho retry-after da resposta de erro, se houver."""
+    from agendador import converter_duracao
+
+    resposta = getattr(erro, 'response', None)
+    if resposta is None:
+        return None
+    return converter_duracao(resposta.headers.get('retry-after'))
+
+
+def calcular_atraso(tentativa: int, base: float = ATRASO_BASE, maximo: float = ATRASO_MAXIMO) -> float:
+    """Backoff exponencial com jitter completo para a tentativa (0, 1, 2...)."""
+    return random.uniform(0, min(maximo, base * (2 ** tentativa)))
+
+
+def _em_thread(funcao: Callable, *args) -> Future:
+    """Executa a função em uma thread daemon (no contexto atual) e retorna um Future com o resultado."""
+    futuro = Future()
+    contexto = contextvars.copy_context()
+
+    def executar():
+        try:
+            futuro.set_result(contexto.run(funcao, *args))
+        except BaseException as e:
+            futuro.set_exception(e)
+
+    threading.Thread(target=executar, daemon=True, name="chamada-modelo").start()
+    return futuro
+
+
+def atraso_hedging(estagio: str) -> Optional[float]:
+    """Atraso até disparar a requisição duplicada (p95 do estágio), ou None se desativado."""
+    if not HEDGING_ATIVO or estagio not in ESTAGIOS_HEDGING:
+        return None
+    historico = estatisticas(estagio)
+    if len(historico) < MINIMO_AMOSTRAS_HEDGING:
+        return None
+    return historico.percentil(PERCENTIL_HEDGING)
+
+
+def _tentativa(chamada: Callable, reservar: Optional[Callable], timeout: float,
+               estagio: str, limite: float):
+    """
+    Uma tentativa, com requisição duplicada se a primeira passar do p95.
+
+    Returns:
+        Resultado da primeira requisição que terminar sem erro
+    """
+    reserva = reservar(max(0.0, limite - time.monotonic())) if reservar else None
+    inicio = time.monotonic()
+    pendentes = {_em_thread(chamada, timeout, reserva)}
+
+    atraso = atraso_hedging(estagio)
+    if atraso is not None and atraso < timeout:
+        feitos, _ = wait(pendentes, timeout=atraso)
+        if not feitos and time.monotonic() < limite:
+            reserva = reservar(max(0.0, limite - time.monotonic())) if reservar else None
+            pendentes.add(_em_thread(chamada, timeout - (time.monotonic() - inicio), reserva))
+
+    erro = None
+    fim = inicio + timeout
+    while pendentes:
+        feitos, pendentes = wait(pendentes, timeout=max(0.0, fim - time.monotonic()), return_when=FIRST_COMPLETED)
+        if not feitos:
+            break
+        for futuro in feitos:
+            if futuro.exception() is None:
+                estatisticas(estagio).registrar(time.monotonic() - inicio)
+                return futuro.result()
+            erro = futuro.exception()
+
+    # As requisições abandonadas terminam sozinhas (o cliente HTTP recebe o mesmo timeout)
+    raise erro or TimeoutError(f"Tentativa excedeu {timeout:.0f}s")
+
+
+def executar_com_resiliencia(chamada: Callable, estagio: str = 'resposta',
+                             reservar: Optional[Callable] = None,
+                             prazo: Optional[float] = None):
+    """
+    Executa uma chamada ao modelo com prazo, novas tentativas e hedging.
+
+    Args:
+        chamada: Função que recebe o timeout da tentativa (segundos) e o retorno
+                 de `reservar`, e faz a requisição
+        estagio: Estágio do turno (moderacao_entrada, resposta, mapreduce...)
+        reservar: Função chamada antes de cada requisição com o tempo restante
+                  (ex.: escolha do modelo e reserva de capacidade no agendador)
+        prazo: Prazo total em segundos (padrão: PRAZOS_ESTAGIO do estágio)
+
+    Returns:
+        Resultado da chamada
+
+    Raises:
+        PrazoEsgotadoError: Se o prazo acabar sem resposta
+        Exception: Erros não repetíveis são repassados imediatamente
+    """
+    prazo = prazo if prazo is not None else PRAZOS_ESTAGIO.get(estagio, PRAZO_PADRAO)
+    limite = time.monotonic() + prazo
+    timeout_tentativa = TIMEOUT_TENTATIVA.get(estagio, TIMEOUT_TENTATIVA_PADRAO)
+
+    ultimo_erro = None
+    for tentativa in range(MAX_TENTATIVAS):
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            break
+
+        try:
+            return _tentativa(chamada, reservar, min(timeout_tentativa, restante), estagio, limite)
+        except Exception as e:
+            if not erro_repetivel(e):
+                raise
+            ultimo_erro = e
+
+        # O retry-after de um 429 já pausa o agendador do modelo (ver modelos.invocar)
+        atraso = calcular_atraso(tentativa)
+
+        if time.monotonic() + atraso >= limite:
+            break
+        time.sleep(atraso)
+
+    raise PrazoEsgotadoError(
+        f"Sem resposta do modelo no estágio '{estagio}' após {tentativa + 1} tentativa(s) "
+        f"(prazo de {prazo:.0f}s): {ultimo_erro}"
+    ) from ultimo_erro
+
+
+async def _tentativa_async(chamada: Callable, reservar: Optional[Callable], timeout: float,
+                           estagio: str, limite: float):
+    """Versão assíncrona de `_tentativa` (tarefas do asyncio em vez de threads)."""
+    import asyncio
+
+    async def iniciar():
+        reserva = await reservar(max(0.0, limite - time.monotonic())) if reservar else None
+        return asyncio.ensure_future(asyncio.wait_for(chamada(timeout, reserva), timeout))
+
+    pendentes = {await iniciar()}
+    # Como na versão síncrona, a espera pela reserva no agendador não conta no timeout da tentativa
+    inicio = time.monotonic()
+    try:
+        atraso = atraso_hedging(estagio)
+        if atraso is not None and atraso < timeout:
+            feitos, _ = await asyncio.wait(pendentes, timeout=atraso)
+            if not feitos and time.monotonic() < limite:
+                pendentes.add(await iniciar())
+
+        erro = None
+        while pendentes:
+            feitos, pendentes = await asyncio.wait(pendentes, timeout=max(0.0, inicio + timeout - time.monotonic()),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+            if not feitos:
+                break
+            for tarefa in feitos:
+                if tarefa.exception() is None:
+                    estatisticas(estagio).registrar(time.monotonic() - inicio)
+                    return tarefa.result()
+                erro = tarefa.exception()
+
+        raise erro or TimeoutError(f"Tentativa excedeu {timeout:.0f}s")
+    finally:
+        # No asyncio as requisições perdedoras podem ser canceladas de fato
+        for tarefa in pendentes:
+            tarefa.cancel()
+
+
+async def executar_com_resiliencia_async(chamada: Callable, estagio: str = 'resposta',
+                                         reservar: Optional[Callable] = None,
+                                         prazo: Optional[float] = None):
+    """
+    Versão assíncrona de `executar_com_resiliencia`.
+
+    Args:
+        chamada: Função assíncrona que recebe o timeout da tentativa e o retorno de `reservar`
+        estagio: Estágio do turno
+        reservar: Função assíncrona chamada antes de cada requisição com o tempo restante
+        prazo: Prazo total em segundos (padrão: PRAZOS_ESTAGIO do estágio)
+
+    Returns:
+        Resultado da chamada
+
+    Raises:
+        PrazoEsgotadoError: Se o prazo acabar sem resposta
+        Exception: Erros não repetíveis são repassados imediatamente
+    """
+    import asyncio
+
+    prazo = prazo if prazo is not None else PRAZOS_ESTAGIO.get(estagio, PRAZO_PADRAO)
+    limite = time.monotonic() + prazo
+    timeout_tentativa = TIMEOUT_TENTATIVA.get(estagio, TIMEOUT_TENTATIVA_PADRAO)
+
+    ultimo_erro = None
+    for tentativa in range(MAX_TENTATIVAS):
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            break
+
+        try:
+            return await _tentativa_async(chamada, reservar, min(timeout_tentativa, restante), estagio, limite)
+        except Exception as e:
+            if not erro_repetivel(e):
+                raise
+            ultimo_erro = e
+
+        atraso = calcular_atraso(tentativa)
+        if time.monotonic() + atraso >= limite:
+            break
+        await asyncio.sleep(atraso)
+
+    raise PrazoEsgotadoError(
+        f"Sem resposta do modelo no estágio '{estagio}' após {tentativa + 1} tentativa(s) "
+        f"(prazo de {prazo:.0f}s): {ultimo_erro}"
+    ) from ultimo_erro
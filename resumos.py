@@ -0,0 +1,230 @@
+"""
+Módulo de resumos hierárquicos
+Constrói, uma única vez no carregamento, uma árvore de resumos
+(blocos → seções → documento) usada para responder perguntas de visão geral
+com poucas centenas de tokens em vez do texto completo
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import CancelledError
+from pathlib import Path
+from typing import Optional
+from bot import dividir_em_blocos, invocar_em_paralelo, MAX_CONCORRENCIA_MAPREDUCE, MAX_CARACTERES_CONTEXTO
+from agendador import PRIORIDADE_SEGUNDO_PLANO
+from metricas import contar
+
+
+# Blocos resumidos juntos em cada resumo de seção
+BLOCOS_POR_SECAO = 4
+
+# Diretório do cache em disco (mesma raiz do cache de transcrições)
+DIRETORIO_CACHE = Path(os.getenv('NANDABOT_CACHE_DIR', Path(__file__).parent / '.cache')) / 'resumos'
+
+# Ativa a construção automática da árvore após o carregamento
+RESUMOS_ATIVOS = os.getenv('NANDABOT_RESUMOS', '0') == '1'
+
+PROMPT_RESUMO_BLOCO = '''Resuma o trecho de documento abaixo em português, em no máximo 5 frases.
+Preserve nomes, números, valores e as referências de página/tempo mais importantes.
+
+Trecho:
+{texto}'''
+
+PROMPT_RESUMO_GRUPO = '''Os textos abaixo são resumos de partes consecutivas de um documento.
+Escreva um único resumo em português, em no máximo 6 frases, cobrindo todos os temas.
+
+Resumos:
+{texto}'''
+
+TAREFA = 'Escreva o resumo.'
+
+
+def hash_documento(documento: str) -> str:
+    """Identificador do documento no cache."""
+    if not isinstance(documento, str):
+        return documento.sha256
+    return hashlib.sha256(documento.encode('utf-8')).hexdigest()
+
+
+class ArvoreResumos:
+    """
+    Árvore de resumos de um documento.
+
+    Args:
+        resumo_documento: Resumo do documento inteiro
+        secoes: [{'resumo': str, 'blocos': [str, ...]}, ...] na ordem do documento
+    """
+
+    def __init__(self, resumo_documento: str, secoes: list):
+        self.resumo_documento = resumo_documento
+        self.secoes = secoes
+
+    def contexto_visao_geral(self) -> str:
+        """
+        Informações enviadas ao modelo para perguntas de visão geral.
+
+        Returns:
+            str: Resumo do documento seguido dos resumos das seções
+        """
+        partes = [f"Resumo do documento:\n{self.resumo_documento}"]
+        if len(self.secoes) > 1:
+            partes.append("Resumos das partes do documento, em ordem:")
+            partes += [f"[Parte {i + 1}] {secao['resumo']}" for i, secao in enumerate(self.secoes)]
+        return '\n\n'.join(partes)
+
+    def para_dict(self) -> dict:
+        return {'resumo_documento': self.resumo_documento, 'secoes': self.secoes}
+
+    @classmethod
+    def de_dict(cls, dados: dict) -> 'ArvoreResumos':
+        return cls(dados['resumo_documento'], dados['secoes'])
+
+
+def _resumir(prompt: str, textos: list, max_concorrencia: int,
+             cancelamento: Optional[threading.Event] = None) -> list:
+    """Resume vários textos em paralelo com o mesmo prompt (atrás das respostas na fila do agendador)."""
+    return invocar_em_paralelo(prompt, [{'texto': texto} for texto in textos], TAREFA, max_concorrencia,
+                               PRIORIDADE_SEGUNDO_PLANO, estagio='resumo', cancelamento=cancelamento)
+
+
+def construir_arvore(documento: str, max_concorrencia: int = MAX_CONCORRENCIA_MAPREDUCE,
+                     cancelamento: Optional[threading.Event] = None) -> ArvoreResumos:
+    """
+    Constrói a árvore de resumos com chamadas paralelas ao modelo.
+
+    Args:
+        documento: Documento completo
+        max_concorrencia: Máximo de chamadas simultâneas ao modelo
+        cancelamento: Quando sinalizado, interrompe a construção antes das próximas chamadas
+
+    Returns:
+        ArvoreResumos: Árvore construída
+
+    Raises:
+        CancelledError: Se a construção for cancelada
+    """
+    blocos = dividir_em_blocos(documento)
+    resumos_blocos = _resumir(PROMPT_RESUMO_BLOCO, blocos, max_concorrencia, cancelamento)
+
+    grupos = [resumos_blocos[i:i + BLOCOS_POR_SECAO] for i in range(0, len(resumos_blocos), BLOCOS_POR_SECAO)]
+
+    # Grupos com um único bloco reaproveitam o resumo do bloco
+    pendentes = [i for i, grupo in enumerate(grupos) if len(grupo) > 1]
+    resumos_secoes = [grupo[0] for grupo in grupos]
+    combinados = _resumir(PROMPT_RESUMO_GRUPO, ['\n\n'.join(grupos[i]) for i in pendentes], max_concorrencia,
+                          cancelamento)
+    for i, resumo in zip(pendentes, combinados):
+        resumos_secoes[i] = resumo
+
+    if len(resumos_secoes) == 1:
+        resumo_documento = resumos_secoes[0]
+    else:
+        resumo_documento = _resumir(PROMPT_RESUMO_GRUPO, ['\n\n'.join(resumos_secoes)], 1, cancelamento)[0]
+
+    secoes = [{'resumo': resumo, 'blocos': grupo} for resumo, grupo in zip(resumos_secoes, grupos)]
+    return ArvoreResumos(resumo_documento, secoes)
+
+
+def ler_cache(documento: str, diretorio: Path = DIRETORIO_CACHE) -> Optional[ArvoreResumos]:
+    """Carrega a árvore do documento salva em disco, se existir."""
+    try:
+        with open(diretorio / f"{hash_documento(documento)}.json", 'r', encoding='utf-8') as f:
+            return ArvoreResumos.de_dict(json.load(f))
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return None
+
+
+def salvar_cache(documento: str, arvore: ArvoreResumos, diretorio: Path = DIRETORIO_CACHE):
+    """Grava a árvore em disco de forma atômica (arquivo temporário + rename)."""
+    diretorio.mkdir(parents=True, exist_ok=True)
+    fd, temporario = tempfile.mkstemp(dir=diretorio, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(arvore.para_dict(), f, ensure_ascii=False)
+        os.replace(temporario, diretorio / f"{hash_documento(documento)}.json")
+    except Exception:
+        if os.path.exists(temporario):
+            os.unlink(temporario)
+        raise
+
+
+def obter_arvore(documento: str, diretorio_cache: Optional[Path] = DIRETORIO_CACHE,
+                 cancelamento: Optional[threading.Event] = None) -> ArvoreResumos:
+    """
+    Retorna a árvore do documento, do cache ou construindo-a.
+
+    Args:
+        documento: Documento completo
+        diretorio_cache: Diretório do cache (None desativa o cache)
+        cancelamento: Interrompe a construção quando sinalizado (ver construir_arvore)
+
+    Returns:
+        ArvoreResumos: Árvore do documento
+    """
+    if diretorio_cache is not None:
+        arvore = ler_cache(documento, diretorio_cache)
+        contar('nandabot_cache_total', cache='resumos', resultado='acerto' if arvore else 'falha')
+        if arvore is not None:
+            return arvore
+
+    arvore = construir_arvore(documento, cancelamento=cancelamento)
+
+    if diretorio_cache is not None:
+        try:
+            salvar_cache(documento, arvore, diretorio_cache)
+        except OSError as e:
+            print(f"⚠️ Aviso: Não foi possível salvar os resumos em cache: {e}")
+
+    return arvore
+
+
+def precisa_resumos(documento) -> bool:
+    """Se o documento é grande demais para ir inteiro ao modelo (os menores dispensam a árvore)."""
+    return len(documento) > MAX_CARACTERES_CONTEXTO
+
+
+class ConstrucaoResumos:
+    """
+    Constrói a árvore de resumos em uma thread de segundo plano.
+
+    Enquanto a construção não termina, `arvore` é None e o bot responde
+    normalmente (seleção de trechos ou map-reduce). Quando o documento é
+    descartado (sessão encerrada ou expirada, documento trocado), `cancelar`
+    interrompe a construção antes das próximas chamadas ao modelo.
+
+    Args:
+        documento: Documento completo
+    """
+
+    def __init__(self, documento: str):
+        self.arvore: Optional[ArvoreResumos] = None
+        self.erro: Optional[str] = None
+        self._cancelamento = threading.Event()
+        self._thread = threading.Thread(target=self._executar, args=(documento,), daemon=True,
+                                        name="construcao-resumos")
+        self._thread.start()
+
+    def _executar(self, documento):
+        try:
+            self.arvore = obter_arvore(documento, cancelamento=self._cancelamento)
+        except CancelledError:
+            pass
+        except Exception as e:
+            self.erro = str(e)
+            print(f"⚠️ Aviso: Erro ao construir os resumos do documento: {e}")
+
+    @property
+    def pronta(self) -> bool:
+        return self.arvore is not None
+
+    def cancelar(self):
+        """Interrompe a construção (as chamadas já em andamento terminam normalmente)."""
+        self._cancelamento.set()
+
+    def aguardar(self, timeout: Optional[float] = None) -> Optional[ArvoreResumos]:
+        """Espera a construção terminar e retorna a árvore (ou None em caso de erro)."""
+        self._thread.join(timeout)
+        return self.arvore
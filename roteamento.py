@@ -0,0 +1,197 @@
+"""
+Módulo de roteamento de modelos por estágio
+Cada estágio do turno (moderação, resposta, map-reduce, resumo) usa uma
+lista de níveis de modelo em ordem de preferência; um modelo limitado (429)
+ou acima do SLO de latência do estágio é evitado por um tempo e o estágio
+passa para o próximo nível. Mantém estatísticas de latência e custo por estágio
+"""
+
+import os
+import time
+import threading
+from collections import Counter
+from typing import Optional
+from resiliencia import EstatisticasLatencia
+
+
+# Níveis de modelo: nome no Groq e preço em US$ por milhão de tokens (entrada, saída)
+NIVEIS = {
+    'rapido': {'modelo': 'llama-3.1-8b-instant', 'preco': (0.05, 0.08)},
+    'grande': {'modelo': 'llama-3.3-70b-versatile', 'preco': (0.59, 0.79)},
+}
+
+# Níveis de cada estágio em ordem de preferência (o primeiro é o principal).
+# Pode ser alterado por estágio com NANDABOT_NIVEIS_<ESTAGIO>=rapido,grande
+ROTAS = {
+    'moderacao_entrada': ['rapido', 'grande'],
+    'moderacao_saida': ['rapido', 'grande'],
+    'resposta': ['grande', 'rapido'],
+    'mapreduce': ['grande', 'rapido'],
+    'resumo': ['rapido', 'grande'],
+}
+ROTA_PADRAO = ['grande', 'rapido']
+
+# Estágios do turno
+ESTAGIOS = tuple(ROTAS)
+
+# SLO de latência por chamada (segundos): acima disso, no p95 recente, o modelo é evitado
+SLO_LATENCIA = {
+    'moderacao_entrada': 1.5,
+    'moderacao_saida': 3.0,
+    'resposta': 15.0,
+    'mapreduce': 20.0,
+    'resumo': 30.0,
+}
+SLO_PADRAO = 15.0
+
+# Tempo que um modelo fica fora da rota após um 429 ou violação do SLO (segundos)
+RESFRIAMENTO = 30.0
+
+# Amostras recentes usadas para verificar o SLO
+MINIMO_AMOSTRAS_SLO = 5
+
+
+def rota_estagio(estagio: str) -> list:
+    """Níveis do estágio em ordem de preferência (considera NANDABOT_NIVEIS_<ESTAGIO>)."""
+    configurada = os.getenv(f'NANDABOT_NIVEIS_{estagio.upper()}')
+    if configurada:
+        niveis = [nivel.strip() for nivel in configurada.split(',') if nivel.strip() in NIVEIS]
+        if niveis:
+            return niveis
+    return ROTAS.get(estagio, ROTA_PADRAO)
+
+
+class EstatisticasEstagio:
+    """Chamadas, falhas, desvios de rota, latência, tokens e custo de um estágio."""
+
+    def __init__(self):
+        self.chamadas = 0
+        self.falhas = 0
+        self.desvios = 0
+        self.tokens_entrada = 0
+        self.tokens_saida = 0
+        self.custo = 0.0
+        self.modelos = Counter()
+        self.latencias = EstatisticasLatencia()
+
+    def para_dict(self) -> dict:
+        return {
+            'chamadas': self.chamadas,
+            'falhas': self.falhas,
+            'desvios': self.desvios,
+            'p50_s': self.latencias.percentil(50),
+            'p95_s': self.latencias.percentil(95),
+            'tokens_entrada': self.tokens_entrada,
+            'tokens_saida': self.tokens_saida,
+            'custo_usd': round(self.custo, 6),
+            'modelos': dict(self.modelos),
+        }
+
+
+class Roteador:
+    """
+    Escolhe o modelo de cada chamada e registra o resultado.
+
+    Um modelo é evitado (em todos os estágios, se for 429, ou no estágio, se
+    for latência) durante RESFRIAMENTO segundos. Se todos os níveis do
+    estágio estiverem evitados, usa o que sair do resfriamento primeiro.
+    """
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self.limitados_ate = {}       # modelo -> instante (429)
+        self.lentos_ate = {}          # (estagio, modelo) -> instante (SLO)
+        self.latencias_modelo = {}    # (estagio, modelo) -> EstatisticasLatencia
+        self.estagios = {}            # estagio -> EstatisticasEstagio
+
+    def _estatisticas(self, estagio: str) -> EstatisticasEstagio:
+        if estagio not in self.estagios:
+            self.estagios[estagio] = EstatisticasEstagio()
+        return self.estagios[estagio]
+
+    def _liberado_em(self, estagio: str, modelo: str) -> float:
+        return max(self.limitados_ate.get(modelo, 0.0), self.lentos_ate.get((estagio, modelo), 0.0))
+
+    def escolher(self, estagio: str) -> str:
+        """
+        Modelo para a próxima chamada do estágio.
+
+        Returns:
+            str: Nome do modelo no Groq
+        """
+        modelos = [NIVEIS[nivel]['modelo'] for nivel in rota_estagio(estagio)]
+        agora = time.monotonic()
+        with self._trava:
+            for modelo in modelos:
+                if self._liberado_em(estagio, modelo) <= agora:
+                    return modelo
+            return min(modelos, key=lambda modelo: self._liberado_em(estagio, modelo))
+
+    def registrar_sucesso(self, estagio: str, modelo: str, segundos: float,
+                          tokens_entrada: Optional[int], tokens_saida: Optional[int]):
+        """Registra latência, tokens e custo; evita o modelo se o p95 recente passar do SLO."""
+        slo = SLO_LATENCIA.get(estagio, SLO_PADRAO)
+        with self._trava:
+            estatisticas = self._estatisticas(estagio)
+            estatisticas.chamadas += 1
+            estatisticas.modelos[modelo] += 1
+            modelos_niveis = [nivel['modelo'] for nivel in NIVEIS.values()]
+            if modelo in modelos_niveis and modelo != NIVEIS[rota_estagio(estagio)[0]]['modelo']:
+                estatisticas.desvios += 1
+            estatisticas.latencias.registrar(segundos)
+
+            estatisticas.tokens_entrada += tokens_entrada or 0
+            estatisticas.tokens_saida += tokens_saida or 0
+            preco = next((n['preco'] for n in NIVEIS.values() if n['modelo'] == modelo), (0.0, 0.0))
+            estatisticas.custo += ((tokens_entrada or 0) * preco[0] + (tokens_saida or 0) * preco[1]) / 1_000_000
+
+            historico = self.latencias_modelo.setdefault((estagio, modelo), EstatisticasLatencia(tamanho=20))
+            historico.registrar(segundos)
+            if len(historico) >= MINIMO_AMOSTRAS_SLO and historico.percentil(95) > slo:
+                self.lentos_ate[(estagio, modelo)] = time.monotonic() + RESFRIAMENTO
+                # Recomeça a medição quando o modelo voltar à rota
+                self.latencias_modelo[(estagio, modelo)] = EstatisticasLatencia(tamanho=20)
+
+    def registrar_falha(self, estagio: str, modelo: str, limitado: bool = False,
+                        espera: Optional[float] = None, excedeu_prazo: bool = False):
+        """
+        Registra uma falha da chamada.
+
+        Args:
+            estagio: Estágio do turno
+            modelo: Modelo usado
+            limitado: Se a falha foi um 429 (o modelo é evitado em todos os estágios)
+            espera: retry-after informado pelo servidor (segundos)
+            excedeu_prazo: Se a tentativa estourou o tempo (conta como violação do SLO)
+        """
+        agora = time.monotonic()
+        with self._trava:
+            self._estatisticas(estagio).falhas += 1
+            if limitado:
+                self.limitados_ate[modelo] = max(self.limitados_ate.get(modelo, 0.0),
+                                                 agora + max(espera or 0.0, RESFRIAMENTO))
+            elif excedeu_prazo:
+                self.lentos_ate[(estagio, modelo)] = agora + RESFRIAMENTO
+
+    def relatorio(self) -> dict:
+        """Estatísticas por estágio, prontas para exibição ou JSON."""
+        with self._trava:
+            return {estagio: estatisticas.para_dict() for estagio, estatisticas in self.estagios.items()}
+
+
+def imprimir_relatorio(relatorio: dict):
+    """Imprime as estatísticas por estágio no terminal."""
+    if not relatorio:
+        return
+    print("\n📊 Uso do modelo por estágio:")
+    for estagio, dados in relatorio.items():
+        p50 = f"{dados['p50_s']:.2f}s" if dados['p50_s'] is not None else '-'
+        p95 = f"{dados['p95_s']:.2f}s" if dados['p95_s'] is not None else '-'
+        print(f"   {estagio}: {dados['chamadas']} chamada(s), p50 {p50}, p95 {p95}, "
+              f"{dados['tokens_entrada'] + dados['tokens_saida']} tokens, US$ {dados['custo_usd']:.4f}"
+              + (f", {dados['desvios']} desvio(s) de modelo" if dados['desvios'] else '')
+              + (f", {dados['falhas']} falha(s)" if dados['falhas'] else ''))
+
+
+# Instância compartilhada por todo o processo
+roteador = Roteador()
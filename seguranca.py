@@ -7,7 +7,7 @@ import re
 import os
 from pathlib import Path
 from typing import Tuple, Optional
-import pypdf
+from metricas import instrumentar
 
 
 # Tamanho máximo do arquivo (50MB)
@@ -83,6 +83,8 @@ def validar_formato_pdf(caminho_arquivo: str) -> Tuple[bool, Optional[str]]:
                 return False, "Arquivo não é um PDF válido (cabeçalho inválido)"
         
         # Tenta abrir com pypdf para verificar estrutura
+        import pypdf
+        
         try:
             reader = pypdf.PdfReader(caminho_arquivo, strict=True)
             num_pages = len(reader.pages)
@@ -104,6 +106,7 @@ def validar_formato_pdf(caminho_arquivo: str) -> Tuple[bool, Optional[str]]:
         return False, f"Erro ao validar formato do PDF: {e}"
 
 
+@instrumentar('varredura_seguranca')
 def escanear_conteudo_suspeito(conteudo: str) -> Tuple[bool, Optional[str]]:
     """
     Escaneia o conteúdo em busca de padrões suspeitos ou maliciosos.
@@ -128,6 +131,7 @@ def escanear_conteudo_suspeito(conteudo: str) -> Tuple[bool, Optional[str]]:
     return True, None
 
 
+@instrumentar('verificacao_seguranca')
 def validar_pdf_completo(caminho_arquivo: str) -> Tuple[bool, Optional[str]]:
     """
     Validação completa do PDF: tamanho, formato e conteúdo.
@@ -149,6 +153,8 @@ def validar_pdf_completo(caminho_arquivo: str) -> Tuple[bool, Optional[str]]:
         return False, erro
     
     # Extrai e valida conteúdo
+    import pypdf
+    
     try:
         reader = pypdf.PdfReader(caminho_arquivo, strict=True)
         conteudo_total = ""
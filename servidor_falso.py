@@ -0,0 +1,243 @@
+"""
+Servidor falso compatível com a API do OpenAI/Groq
+Responde a /openai/v1/chat/completions (e /v1/chat/completions) com texto
+determinístico, injetando latência e erros configuráveis, para testar a
+resiliência, o agendador e a carga sem gastar cota da conta
+
+Uso:
+    python servidor_falso.py --porta 8099 --latencia 0.2 --taxa-erro 0.1
+    GROQ_API_BASE=http://127.0.0.1:8099 GROQ_API_KEY=teste python main.py
+"""
+
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+class ConfiguracaoFalha:
+    """
+    Comportamento injetado nas respostas do servidor falso.
+
+    Args:
+        latencia: Latência base de cada resposta (segundos)
+        variacao: Variação uniforme somada à latência base (segundos)
+        taxa_lenta: Fração das respostas com latência de cauda
+        latencia_lenta: Latência das respostas de cauda (segundos)
+        taxa_erro: Fração das respostas com erro 500/503
+        taxa_limite: Fração das respostas 429 (com retry-after)
+        retry_after: Valor do cabeçalho retry-after nos 429 (segundos)
+        semente: Semente do sorteio (comportamento reprodutível)
+    """
+
+    def __init__(self, latencia: float = 0.0, variacao: float = 0.0, taxa_lenta: float = 0.0,
+                 latencia_lenta: float = 5.0, taxa_erro: float = 0.0, taxa_limite: float = 0.0,
+                 retry_after: float = 1.0, semente: int = 0):
+        self.latencia = latencia
+        self.variacao = variacao
+        self.taxa_lenta = taxa_lenta
+        self.latencia_lenta = latencia_lenta
+        self.taxa_erro = taxa_erro
+        self.taxa_limite = taxa_limite
+        self.retry_after = retry_after
+        self._aleatorio = random.Random(semente)
+        self._trava = threading.Lock()
+
+    def sortear(self):
+        """Retorna (latência, status HTTP) da próxima resposta."""
+        with self._trava:
+            sorteio = self._aleatorio.random()
+            if sorteio < self.taxa_limite:
+                return 0.0, 429
+            if sorteio < self.taxa_limite + self.taxa_erro:
+                return self.latencia, self._aleatorio.choice((500, 503))
+
+            latencia = self.latencia + self._aleatorio.uniform(0, self.variacao)
+            if self._aleatorio.random() < self.taxa_lenta:
+                latencia = self.latencia_lenta
+            return latencia, 200
+
+
+def gerar_conteudo(mensagens: list) -> str:
+    """
+    Resposta determinística para as mensagens recebidas.
+
+    Prompts de moderação recebem "SEGURO" (um "N: SEGURO" por texto numerado,
+    na moderação em lote); prompts de map-reduce recebem um
+    trecho curto do bloco; os demais, um eco curto da última mensagem.
+    """
+    sistema = ' '.join(m.get('content', '') for m in mensagens if m.get('role') == 'system')
+    usuario = next((m.get('content', '') for m in reversed(mensagens) if m.get('role') == 'user'), '')
+
+    if 'filtro de segurança' in sistema:
+        numeros = re.findall(r'^\[(\d+)\]', usuario, re.MULTILINE)
+        if numeros:
+            return '\n'.join(f'{n}: SEGURO' for n in numeros)
+        return 'SEGURO'
+    if 'Trecho:' in sistema:
+        return 'Resumo simulado: ' + ' '.join(sistema.split()[-40:])
+    return 'Resposta simulada: ' + ' '.join(usuario.split()[:40])
+
+
+def _uso(mensagens: list, conteudo: str) -> dict:
+    entrada = sum(len(m.get('content', '')) for m in mensagens) // 4
+    saida = len(conteudo) // 4
+    return {'prompt_tokens': entrada, 'completion_tokens': saida, 'total_tokens': entrada + saida}
+
+
+class _Manipulador(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _responder_json(self, status: int, corpo: dict, cabecalhos: Optional[dict] = None):
+        dados = json.dumps(corpo).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(dados)))
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._responder_json(404, {'error': {'message': 'rota desconhecida'}})
+            return
+
+        tamanho = int(self.headers.get('Content-Length', 0))
+        pedido = json.loads(self.rfile.read(tamanho) or b'{}')
+        servidor = self.server
+        servidor.contar()
+
+        latencia, status = servidor.configuracao.sortear()
+        if latencia:
+            time.sleep(latencia)
+
+        if status == 429:
+            self._responder_json(429, {'error': {'message': 'Rate limit reached', 'type': 'tokens'}},
+                                 {'retry-after': str(servidor.configuracao.retry_after)})
+            return
+        if status != 200:
+            self._responder_json(status, {'error': {'message': 'Erro simulado'}})
+            return
+
+        mensagens = pedido.get('messages', [])
+        conteudo = servidor.gerar(mensagens)
+        modelo = pedido.get('model', 'falso')
+        criado = int(time.time())
+
+        if pedido.get('stream'):
+            self._responder_stream(modelo, criado, conteudo, mensagens)
+            return
+
+        self._responder_json(200, {
+            'id': f'chatcmpl-falso-{servidor.requisicoes}',
+            'object': 'chat.completion',
+            'created': criado,
+            'model': modelo,
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': conteudo}}],
+            'usage': _uso(mensagens, conteudo),
+        })
+
+    def _responder_stream(self, modelo: str, criado: int, conteudo: str, mensagens: list):
+        """Resposta em server-sent events, uma palavra por evento."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        palavras = conteudo.split(' ')
+        for i, palavra in enumerate(palavras):
+            delta = {'content': palavra if i == 0 else ' ' + palavra}
+            if i == 0:
+                delta['role'] = 'assistant'
+            evento = {'id': 'chatcmpl-falso', 'object': 'chat.completion.chunk', 'created': criado,
+                      'model': modelo, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': None}]}
+            self.wfile.write(f"data: {json.dumps(evento)}\n\n".encode('utf-8'))
+
+        final = {'id': 'chatcmpl-falso', 'object': 'chat.completion.chunk', 'created': criado, 'model': modelo,
+                 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}],
+                 'x_groq': {'usage': _uso(mensagens, conteudo)}, 'usage': _uso(mensagens, conteudo)}
+        self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode('utf-8'))
+        self.wfile.flush()
+
+
+class ServidorFalso(ThreadingHTTPServer):
+    """
+    Servidor falso em uma thread de segundo plano.
+
+    Args:
+        configuracao: Latência e erros injetados
+        porta: Porta local (0 escolhe uma porta livre)
+        gerar: Função que recebe as mensagens e retorna o texto da resposta
+    """
+
+    daemon_threads = True
+
+    def __init__(self, configuracao: Optional[ConfiguracaoFalha] = None, porta: int = 0, gerar=gerar_conteudo):
+        super().__init__(('127.0.0.1', porta), _Manipulador)
+        self.configuracao = configuracao or ConfiguracaoFalha()
+        self.gerar = gerar
+        self.requisicoes = 0
+        self._trava = threading.Lock()
+        self._thread = None
+
+    def contar(self):
+        with self._trava:
+            self.requisicoes += 1
+
+    @property
+    def url(self) -> str:
+        """URL base para GROQ_API_BASE / base_url."""
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def iniciar(self) -> 'ServidorFalso':
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True, name="servidor-falso")
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *args):
+        self.parar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Servidor falso compatível com a API do Groq/OpenAI.')
+    parser.add_argument('--porta', type=int, default=8099)
+    parser.add_argument('--latencia', type=float, default=0.0, help='Latência base (s)')
+    parser.add_argument('--variacao', type=float, default=0.0, help='Variação somada à latência (s)')
+    parser.add_argument('--taxa-lenta', type=float, default=0.0, help='Fração de respostas lentas')
+    parser.add_argument('--latencia-lenta', type=float, default=5.0, help='Latência das respostas lentas (s)')
+    parser.add_argument('--taxa-erro', type=float, default=0.0, help='Fração de erros 500/503')
+    parser.add_argument('--taxa-limite', type=float, default=0.0, help='Fração de erros 429')
+    parser.add_argument('--semente', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    configuracao = ConfiguracaoFalha(args.latencia, args.variacao, args.taxa_lenta, args.latencia_lenta,
+                                     args.taxa_erro, args.taxa_limite, semente=args.semente)
+    servidor = ServidorFalso(configuracao, args.porta)
+    print(f"🧪 Servidor falso em {servidor.url} (Ctrl+C para encerrar)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
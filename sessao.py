@@ -0,0 +1,303 @@
+"""
+Módulo de sessões com várias fontes
+Uma conversa pode reunir vários documentos (PDFs, sites, vídeos), cada um
+com o próprio índice e resumos. A cada pergunta um roteador (BM25 no nível
+das fontes) escolhe as fontes com mais chance de conter a resposta e o
+limite de contexto é dividido entre elas, sem concatenar tudo em uma string
+
+A sessão segue as interfaces já usadas pelo bot: como documento (len() e
+indice.dividir_secoes, usados no map-reduce e no truncamento) e como índice
+(`selecionar`, o mesmo método de indice.IndiceSecoes).
+"""
+
+import os
+import bisect
+from collections import Counter
+from typing import Iterator, List, Optional, Tuple
+from armazenamento import armazenar_documento, DocumentoEmDisco, ReservaMemoria, ORCAMENTO_SESSAO
+from bot import truncar_documento
+from indice import IndiceLexico, IndiceSecoes, cabecalho_fonte, dividir_secoes, juntar_secoes
+from resumos import ConstrucaoResumos, RESUMOS_ATIVOS, precisa_resumos
+
+
+# Máximo de fontes consultadas por pergunta
+MAX_FONTES_PERGUNTA = int(os.getenv('NANDABOT_MAX_FONTES_PERGUNTA', '3'))
+
+# Fontes com pontuação abaixo desta fração da melhor não são consultadas
+FRACAO_ROTEAMENTO = 0.35
+
+
+class Fonte:
+    """
+    Um documento da sessão, com índice e resumos próprios.
+
+    Args:
+        documento: Documento carregado (string ou DocumentoEmDisco)
+        tipo: Tipo da fonte (site, pdf, youtube...)
+        origem: URL ou nome do arquivo
+        gerar_resumos: Se constrói a árvore de resumos em segundo plano (documentos
+                       que cabem no contexto só a constroem com outras fontes na sessão)
+        indice: Índice já construído (ex.: de um pacote de conhecimento)
+        reserva: Reserva do documento no orçamento de memória (ver armazenamento.armazenar_documento)
+    """
+
+    def __init__(self, documento, tipo: str, origem: str = '', gerar_resumos: bool = RESUMOS_ATIVOS,
+                 indice: Optional[IndiceSecoes] = None, reserva: Optional[ReservaMemoria] = None):
+        self.documento = documento
+        self.reserva = reserva
+        self.tipo = tipo
+        self.origem = origem
+        self.indice = indice or IndiceSecoes(documento)
+        self.resumos = ConstrucaoResumos(documento) if gerar_resumos and precisa_resumos(documento) else None
+        self._frequencias = None
+
+    def iniciar_resumos(self):
+        """Inicia a construção dos resumos, se ainda não existir (ex.: documento pequeno em uma sessão com várias fontes)."""
+        if self.resumos is None:
+            self.resumos = ConstrucaoResumos(self.documento)
+
+    @property
+    def frequencias(self) -> Counter:
+        """Frequências de termos da fonte inteira, usadas pelo roteador (calculadas na primeira consulta)."""
+        if self._frequencias is None:
+            self._frequencias = self.indice.termos()
+        return self._frequencias
+
+    @property
+    def rotulo(self) -> str:
+        """Identificação da fonte ("tipo | origem")."""
+        return f"{self.tipo} | {self.origem}" if self.origem else self.tipo
+
+    @property
+    def cabecalho(self) -> str:
+        """Marcador da fonte no contexto enviado ao modelo."""
+        return cabecalho_fonte(self.rotulo)
+
+    @property
+    def em_disco(self) -> bool:
+        return isinstance(self.documento, DocumentoEmDisco)
+
+    def __len__(self):
+        return len(self.documento)
+
+
+class SecoesSessao:
+    """Seções de todas as fontes da sessão, lidas sob demanda (ver indice.dividir_secoes)."""
+
+    def __init__(self, sessao: 'SessaoFontes'):
+        self.sessao = sessao
+        self._secoes = [dividir_secoes(fonte.documento) for fonte in sessao.fontes]
+        self._acumuladas = []
+        total = 0
+        for secoes in self._secoes:
+            total += len(secoes)
+            self._acumuladas.append(total)
+
+    def __len__(self):
+        return self._acumuladas[-1] if self._acumuladas else 0
+
+    def __getitem__(self, i: int) -> Tuple[str, str]:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        posicao = bisect.bisect_right(self._acumuladas, i)
+        anteriores = self._acumuladas[posicao - 1] if posicao else 0
+        return self.sessao._com_fonte(self.sessao.fontes[posicao], self._secoes[posicao][i - anteriores])
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        for fonte, secoes in zip(self.sessao.fontes, self._secoes):
+            for secao in secoes:
+                yield self.sessao._com_fonte(fonte, secao)
+
+
+class ArvoreSessao:
+    """Resumos de todas as fontes, usados em perguntas de visão geral (mesma interface de ArvoreResumos)."""
+
+    def __init__(self, fontes: List[Fonte]):
+        self.fontes = fontes
+
+    def contexto_visao_geral(self) -> str:
+        return '\n\n'.join(f"{fonte.cabecalho}\n\n{fonte.resumos.arvore.contexto_visao_geral()}"
+                           for fonte in self.fontes)
+
+
+class SessaoFontes:
+    """
+    Fontes de uma conversa e roteamento das perguntas entre elas.
+
+    Com uma única fonte, o comportamento é o mesmo de um documento sozinho.
+
+    Uso:
+        sessao = SessaoFontes()
+        sessao.adicionar(documento_pdf, 'pdf', 'contrato.pdf')
+        sessao.adicionar(documento_site, 'site', 'https://exemplo.com')
+        resposta = resposta_bot(mensagens, sessao, indice=sessao, arvore=sessao.arvore)
+
+    Args:
+        gerar_resumos: Se cada fonte constrói a própria árvore de resumos
+        orcamento_memoria: Bytes de documentos que a sessão mantém em memória
+            (o que passar disso fica em disco, ver armazenamento.py)
+    """
+
+    def __init__(self, gerar_resumos: bool = RESUMOS_ATIVOS, orcamento_memoria: int = ORCAMENTO_SESSAO):
+        self.fontes: List[Fonte] = []
+        self.gerar_resumos = gerar_resumos
+        self.orcamento_memoria = orcamento_memoria
+        self._roteador: Optional[IndiceLexico] = None
+
+    def adicionar(self, documento: str, tipo: str, origem: str = '') -> Optional[Fonte]:
+        """
+        Adiciona uma fonte à sessão (o histórico da conversa não é alterado).
+
+        Returns:
+            Optional[Fonte]: A fonte adicionada, ou None se o documento estiver vazio
+        """
+        if not documento:
+            return None
+        documento, reserva = armazenar_documento(documento, orcamento_sessao=self.memoria_disponivel())
+        fonte = Fonte(documento, tipo, origem, self.gerar_resumos, reserva=reserva)
+        self._incluir(fonte)
+        return fonte
+
+    def _incluir(self, fonte: Fonte):
+        """
+        Inclui a fonte na sessão.
+
+        A visão geral de uma sessão com várias fontes usa os resumos de todas,
+        então as fontes pequenas (sem árvore própria) passam a construí-la.
+        """
+        self.fontes.append(fonte)
+        self._roteador = None
+        if self.gerar_resumos and len(self.fontes) > 1:
+            for existente in self.fontes:
+                existente.iniciar_resumos()
+
+    def memoria_disponivel(self) -> int:
+        """Bytes do orçamento de memória da sessão ainda não usados pelas fontes em memória."""
+        em_memoria = sum(fonte.reserva.tamanho for fonte in self.fontes if fonte.reserva)
+        return max(0, self.orcamento_memoria - em_memoria)
+
+    def adicionar_pacote(self, pacote) -> Fonte:
+        """
+        Adiciona um pacote de conhecimento (pacotes.PacoteConhecimento) como fonte.
+
+        O texto e o índice já estão no pacote: nada é carregado nem indexado.
+        """
+        fonte = Fonte(pacote.documento, 'pacote', pacote.nome, self.gerar_resumos, indice=pacote.indice)
+        self._incluir(fonte)
+        return fonte
+
+    def remover(self, posicao: int):
+        """Remove a fonte da posição informada (interrompendo a construção dos seus resumos)."""
+        if self.fontes[posicao].resumos:
+            self.fontes[posicao].resumos.cancelar()
+        del self.fontes[posicao]
+        self._roteador = None
+
+    def limpar(self):
+        for fonte in self.fontes:
+            if fonte.resumos:
+                fonte.resumos.cancelar()
+        self.fontes = []
+        self._roteador = None
+
+    def __len__(self):
+        return sum(len(fonte) for fonte in self.fontes)
+
+    def __str__(self):
+        if len(self.fontes) == 1:
+            return str(self.fontes[0].documento)
+        return juntar_secoes(list(self.secoes()))
+
+    def _com_fonte(self, fonte: Fonte, secao: Tuple[str, str]) -> Tuple[str, str]:
+        """Inclui o marcador da fonte no cabeçalho da seção (apenas com mais de uma fonte)."""
+        if len(self.fontes) == 1:
+            return secao
+        cabecalho, texto = secao
+        return cabecalho_fonte(fonte.rotulo, cabecalho), texto
+
+    def secoes(self) -> SecoesSessao:
+        """Seções de todas as fontes, na ordem em que foram adicionadas."""
+        return SecoesSessao(self)
+
+    @property
+    def arvore(self):
+        """Árvore de resumos da sessão, se os resumos de todas as fontes estiverem prontos."""
+        if not self.fontes or not all(fonte.resumos and fonte.resumos.pronta for fonte in self.fontes):
+            return None
+        if len(self.fontes) == 1:
+            return self.fontes[0].resumos.arvore
+        return ArvoreSessao(self.fontes)
+
+    def rotear(self, consulta: str) -> List[Tuple[Fonte, float]]:
+        """
+        Escolhe as fontes consultadas para a pergunta.
+
+        As fontes são pontuadas com BM25 como se cada uma fosse um único texto;
+        ficam as melhores (até MAX_FONTES_PERGUNTA) com pelo menos
+        FRACAO_ROTEAMENTO da pontuação da primeira. Sem nenhuma relação com a
+        pergunta, todas as fontes são consultadas com o mesmo peso.
+
+        Returns:
+            List[Tuple[Fonte, float]]: (fonte, peso), da mais para a menos relevante
+        """
+        if len(self.fontes) <= 1:
+            return [(fonte, 1.0) for fonte in self.fontes]
+
+        if self._roteador is None:
+            self._roteador = IndiceLexico.de_frequencias(fonte.frequencias for fonte in self.fontes)
+        pontuacoes = self._roteador.pontuar(consulta)
+        melhor = max(pontuacoes)
+        if melhor <= 0:
+            return [(fonte, 1.0) for fonte in self.fontes]
+
+        ordem = sorted(range(len(self.fontes)), key=lambda i: pontuacoes[i], reverse=True)
+        return [(self.fontes[i], pontuacoes[i]) for i in ordem[:MAX_FONTES_PERGUNTA]
+                if pontuacoes[i] >= FRACAO_ROTEAMENTO * melhor]
+
+    def selecionar(self, consulta: str, max_caracteres: int) -> Tuple[List[Tuple[str, str]], int]:
+        """
+        Seleciona as seções relevantes das fontes roteadas (mesma interface de IndiceSecoes.selecionar).
+
+        O limite é dividido entre as fontes proporcionalmente ao peso; o que
+        uma fonte não usar fica para as seguintes. Uma fonte roteada sem seção
+        que caiba na cota (ex.: PDF sem marcadores) entra com o início do
+        texto, como em bot.truncar_documento. As seções de cada fonte vêm
+        depois do marcador da fonte, na ordem em que as fontes foram adicionadas.
+
+        Returns:
+            Tuple[List[Tuple[str, str]], int]: (seções selecionadas, seções omitidas)
+        """
+        if len(self.fontes) == 1:
+            fonte = self.fontes[0]
+            secoes, omitidas = fonte.indice.selecionar(consulta, max_caracteres)
+            if not secoes:
+                # Sem seção relacionada: o início do texto, que já traz o próprio aviso de truncamento
+                return [('', truncar_documento(fonte.documento, max_caracteres))], 0
+            return secoes, omitidas
+
+        roteadas = self.rotear(consulta)
+        restante = max_caracteres
+        peso_restante = sum(peso for _, peso in roteadas)
+        escolhidas = {}
+        for fonte, peso in roteadas:
+            cota = int(restante * peso / peso_restante) if peso_restante else restante
+            peso_restante -= peso
+            marcador = len(fonte.cabecalho) + 4
+            if cota <= marcador:
+                continue
+            secoes, _ = fonte.indice.selecionar(consulta, cota - marcador)
+            if not secoes:
+                secoes = [('', truncar_documento(fonte.documento, cota - marcador - 4))]
+            escolhidas[id(fonte)] = secoes
+            restante -= marcador + sum(len(cabecalho) + len(texto) + 4 for cabecalho, texto in secoes)
+
+        resultado = []
+        for fonte in self.fontes:
+            if id(fonte) in escolhidas:
+                resultado.append((fonte.cabecalho, ''))
+                resultado += escolhidas[id(fonte)]
+        selecionadas = sum(len(secoes) for secoes in escolhidas.values())
+        total = sum(len(fonte.indice.secoes) for fonte in self.fontes)
+        return resultado, total - selecionadas
@@ -4,11 +4,20 @@ NandaBot - Interface Web com Streamlit
 
 import streamlit as st
 import os
+import shutil
 import tempfile
-from pathlib import Path
-from bot import resposta_bot
-from carregadores import carrega_site, carrega_pdf, carrega_youtube
+from bot import resposta_bot, precisa_documento_inteiro, MAX_CARACTERES_CONTEXTO
+from armazenamento import descrever_armazenamento
+from resumos import RESUMOS_ATIVOS
+from sessao import SessaoFontes
+from pacotes import abrir_pacotes, descrever_pacote
+from roteamento import roteador, ESTAGIOS
+from backends import verificar_configuracao
 from guardrails import sanitizar_entrada_usuario, validar_conteudo_entrada, validar_resposta_saida
+import perfilador
+
+# Quantidade de mensagens exibidas por vez no histórico do chat
+JANELA_HISTORICO = 20
 
 # Configuração da página
 st.set_page_config(
@@ -50,188 +59,163 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Funções adaptadas para Streamlit (sem input())
-def extrair_links_internos(url_base, html_content):
-    """Extrai links internos de uma página HTML"""
-    from bs4 import BeautifulSoup
-    from urllib.parse import urljoin, urlparse
-    
-    soup = BeautifulSoup(html_content, 'html.parser')
-    links = set()
-    dominio_base = urlparse(url_base).netloc
-    
-    for tag in soup.find_all('a', href=True):
-        href = tag['href']
-        # Converte link relativo para absoluto
-        url_completa = urljoin(url_base, href)
-        parsed = urlparse(url_completa)
-        
-        # Verifica se é do mesmo domínio e não é um link de âncora
-        if parsed.netloc == dominio_base and not href.startswith('#'):
-            # Remove fragmentos e query strings desnecessárias
-            url_limpa = f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
-            if url_limpa and url_limpa not in links:
-                links.add(url_limpa)
+
+@st.cache_resource(show_spinner=False)
+def obter_loaders():
+    """
+    Importa uma única vez por processo o motor de carregamento.
+    
+    O Streamlit reexecuta o script a cada interação; com o cache de recurso
+    os módulos pesados (BeautifulSoup, PyPDF, YouTube) são compartilhados
+    entre reruns e sessões.
     
-    return list(links)
+    Returns:
+        module: Módulo carregadores
+    """
+    import carregadores
+    return carregadores
+
 
-def carrega_site_web(url, max_paginas=20):
+@st.cache_resource(show_spinner=False)
+def obter_pacotes():
     """
-    Carrega site completo com múltiplas páginas.
+    Abre uma única vez por processo os pacotes de conhecimento (NANDABOT_PACOTES).
     
-    Args:
-        url: URL inicial do site
-        max_paginas: Número máximo de páginas a carregar (padrão: 20)
+    Os pacotes são somente leitura e mapeados em memória: todas as sessões
+    usam os mesmos objetos, sem recarregar nem reindexar as fontes.
     
     Returns:
-        str: Conteúdo completo combinado de todas as páginas
+        list: Pacotes de conhecimento abertos
     """
-    from langchain_community.document_loaders import WebBaseLoader
-    import requests
-    from urllib.parse import urlparse
+    return abrir_pacotes()
+
+
+def adicionar_pacotes():
+    """Inclui na conversa os pacotes de conhecimento que ainda não fazem parte dela."""
+    sessao = st.session_state.sessao
+    presentes = {id(fonte.documento) for fonte in sessao.fontes}
+    for pacote in obter_pacotes():
+        if id(pacote.documento) not in presentes:
+            sessao.adicionar_pacote(pacote)
+
+
+class EventosStreamlit:
+    """
+    Exibe os eventos do motor de carregamento na interface web.
     
-    try:
-        # Carrega página inicial
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        urls_para_carregar = [url]
-        urls_carregadas = set()
-        documento_completo = ''
-        
-        total_paginas = 1
-        status_text.text(f"Carregando página 1/??: {url}")
-        
-        while urls_para_carregar and len(urls_carregadas) < max_paginas:
-            url_atual = urls_para_carregar.pop(0)
-            
-            # Evita carregar a mesma URL duas vezes
-            if url_atual in urls_carregadas:
-                continue
-            
-            try:
-                # Carrega a página
-                loader = WebBaseLoader(url_atual)
-                documentos = loader.load()
-                
-                if documentos:
-                    conteudo = ''
-                    for doc in documentos:
-                        conteudo += doc.page_content + '\n'
-                    
-                    documento_completo += f"\n\n=== PÁGINA: {url_atual} ===\n\n"
-                    documento_completo += conteudo
-                    
-                    urls_carregadas.add(url_atual)
-                    
-                    # Se ainda não atingiu o limite, extrai links desta página
-                    if len(urls_carregadas) < max_paginas:
-                        try:
-                            # Faz requisição para extrair links
-                            response = requests.get(url_atual, timeout=10, headers={
-                                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                            })
-                            if response.status_code == 200:
-                                links_encontrados = extrair_links_internos(url_atual, response.text)
-                                
-                                # Adiciona novos links à fila
-                                for link in links_encontrados:
-                                    if link not in urls_carregadas and link not in urls_para_carregar:
-                                        urls_para_carregar.append(link)
-                        except:
-                            pass  # Se falhar ao extrair links, continua
-                    
-                    # Atualiza progresso
-                    progresso = min(len(urls_carregadas) / max_paginas, 1.0)
-                    progress_bar.progress(progresso)
-                    status_text.text(f"Carregando página {len(urls_carregadas)}/{max_paginas}: {url_atual[:50]}...")
-                    
-            except Exception as e:
-                # Se uma página falhar, continua com as próximas
-                st.warning(f"⚠️ Não foi possível carregar {url_atual}: {str(e)[:50]}")
-                continue
-        
-        progress_bar.empty()
-        status_text.empty()
-        
-        if documento_completo:
-            st.info(f"✓ Carregadas {len(urls_carregadas)} página(s) do site")
-            return documento_completo
-        else:
-            st.error("❌ Não foi possível carregar nenhuma página do site.")
-            return None
-            
-    except Exception as e:
-        st.error(f"Erro ao carregar o site: {e}")
-        return None
+    Implementa a mesma interface de carregadores.EventosCarga, com barra de
+    progresso e mensagens do Streamlit.
+    """
+    
+    def __init__(self):
+        self.progress_bar = st.progress(0)
+        self.status_text = st.empty()
+    
+    def progresso(self, atual, total, mensagem):
+        self.progress_bar.progress(min(atual / total, 1.0) if total else 0.0)
+        self.status_text.text(mensagem[:80])
+    
+    def info(self, mensagem):
+        st.info(mensagem)
+    
+    def aviso(self, mensagem):
+        st.warning(f"⚠️ {mensagem}")
+    
+    def erro(self, mensagem):
+        st.error(f"❌ {mensagem}")
+    
+    def cancelado(self):
+        return False
+    
+    def finalizar(self):
+        """Remove a barra de progresso da tela."""
+        self.progress_bar.empty()
+        self.status_text.empty()
 
-def carrega_pdf_web(caminho):
-    """Carrega PDF com validação de segurança"""
-    from langchain_community.document_loaders import PyPDFLoader
-    from seguranca import validar_pdf_completo
+
+def carregar_com_progresso(funcao, *args, **kwargs):
+    """
+    Executa uma função do motor de carregamento exibindo o progresso.
     
-    # Validação de segurança
-    sucesso, erro = validar_pdf_completo(caminho)
-    if not sucesso:
-        st.error(f"PDF rejeitado por segurança: {erro}")
-        return None
+    Args:
+        funcao: Função de carregadores (carregar_site_url, carregar_pdf_arquivo, ...)
+        *args, **kwargs: Argumentos repassados à função
     
+    Returns:
+        str: Documento carregado ('' em caso de falha)
+    """
+    eventos = EventosStreamlit()
+    perfil = None
     try:
-        loader = PyPDFLoader(caminho)
-        lista_documentos = loader.load()
-        documento = ''
-        for doc in lista_documentos:
-            documento += doc.page_content
-        return documento
-    except Exception as e:
-        st.error(f"Erro ao carregar o PDF: {e}")
-        return None
-
-def carrega_youtube_web(url):
-    """Carrega YouTube sem usar input()"""
-    from youtube_transcript_api import YouTubeTranscriptApi
-    import re
-    
-    def extract_video_id(url):
-        match = re.search(r"(?:v=|\/)([0-9A-Za-z_-]{11})", url)
-        if match:
-            return match.group(1)
-        raise ValueError("ID do vídeo não encontrado na URL.")
+        with perfilador.perfilar(f"carga_{funcao.__name__}", ativo=st.session_state.perfilar) as perfil:
+            return funcao(*args, eventos=eventos, **kwargs)
+    finally:
+        eventos.finalizar()
+        if perfil:
+            st.session_state.ultimo_perfil = perfil
+
+
+def limpar_conversa():
+    """Limpa o histórico exibido e o histórico enviado ao modelo."""
+    st.session_state.mensagens = []
+    st.session_state.mensagens_bot = []
+    st.session_state.janela_historico = JANELA_HISTORICO
+
+
+def adicionar_fonte(documento, tipo_documento, origem=''):
+    """
+    Adiciona um documento às fontes da conversa, sem apagar o histórico.
     
-    try:
-        video_id = extract_video_id(url)
-        
-        # Tenta buscar em português primeiro
-        try:
-            transcript_data = YouTubeTranscriptApi.get_transcript(video_id, languages=['pt', 'pt-BR'])
-            documento = " ".join([item['text'] for item in transcript_data])
-            return documento
-        except:
-            # Se não encontrar em português, busca em qualquer idioma disponível
-            transcript_data = YouTubeTranscriptApi.get_transcript(video_id)
-            documento = " ".join([item['text'] for item in transcript_data])
-            return documento
-    except Exception as e:
-        st.error(f"Erro ao carregar transcrição: {e}")
-        return None
+    Cada fonte é indexada uma única vez aqui, no carregamento, e tem a própria
+    árvore de resumos; a cada pergunta a sessão escolhe as fontes relevantes e
+    consulta apenas os índices delas. Documentos acima do orçamento de memória
+    da sessão (ou do servidor) são mantidos em disco e lidos sob demanda.
+    
+    Args:
+        documento: Conteúdo completo do documento
+        tipo_documento: Rótulo exibido na interface ("Site", "PDF", "YouTube")
+        origem: URL ou nome do arquivo
+    """
+    sessao = st.session_state.sessao
+    sessao.gerar_resumos = st.session_state.get('gerar_resumos', RESUMOS_ATIVOS)
+    sessao.adicionar(documento, tipo_documento, origem)
+
 
 # Inicialização do estado da sessão
 if 'mensagens' not in st.session_state:
     st.session_state.mensagens = []
-if 'documento' not in st.session_state:
-    st.session_state.documento = None
-if 'documento_carregado' not in st.session_state:
-    st.session_state.documento_carregado = False
-if 'tipo_documento' not in st.session_state:
-    st.session_state.tipo_documento = None
+if 'mensagens_bot' not in st.session_state:
+    # Histórico no formato (role, content) esperado pelo bot, mantido
+    # incrementalmente para não ser reconstruído a cada pergunta
+    st.session_state.mensagens_bot = []
+if 'janela_historico' not in st.session_state:
+    st.session_state.janela_historico = JANELA_HISTORICO
+if 'sessao' not in st.session_state:
+    # Fontes da conversa (PDFs, sites, vídeos), cada uma com índice e resumos próprios
+    st.session_state.sessao = SessaoFontes()
+    adicionar_pacotes()
+if 'perfilar' not in st.session_state:
+    # Perfil por amostragem de cargas e turnos (NANDABOT_PERFIL ou opção da barra lateral)
+    st.session_state.perfilar = perfilador.ATIVO
+if 'ultimo_perfil' not in st.session_state:
+    st.session_state.ultimo_perfil = None
+
+@st.cache_data(ttl=60, show_spinner=False)
+def problemas_configuracao():
+    """Problemas dos backends de modelo (sem chave, servidor local fora do ar), verificados a cada minuto."""
+    return verificar_configuracao(ESTAGIOS)
+
 
 # Header
 st.markdown('<h1 class="main-header">🤖 NandaBot</h1>', unsafe_allow_html=True)
 st.markdown("---")
 
+for problema in problemas_configuracao():
+    st.warning(f"⚠️ {problema}")
+
 # Sidebar para carregar documentos
 with st.sidebar:
-    st.header("📄 Carregar Documento")
+    st.header("📄 Adicionar Documento")
     
     opcao = st.radio(
         "Escolha a fonte de dados:",
@@ -252,13 +236,12 @@ with st.sidebar:
             if url:
                 with st.spinner("Carregando conteúdo do site..."):
                     try:
-                        # Usa função adaptada para web que carrega múltiplas páginas
-                        documento = carrega_site_web(url, max_paginas=max_paginas)
+                        # Usa o motor compartilhado que carrega múltiplas páginas
+                        documento = carregar_com_progresso(
+                            obter_loaders().carregar_site_url, url, max_paginas=max_paginas
+                        )
                         if documento:
-                            st.session_state.documento = documento
-                            st.session_state.documento_carregado = True
-                            st.session_state.tipo_documento = "Site"
-                            st.session_state.mensagens = []  # Limpa histórico
+                            adicionar_fonte(documento, "Site", url)
                             st.success(f"✓ Site carregado! ({len(documento)} caracteres)")
                             st.rerun()
                         else:
@@ -280,17 +263,16 @@ with st.sidebar:
                     try:
                         # Salva arquivo temporário
                         with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                            tmp_file.write(uploaded_file.read())
+                            shutil.copyfileobj(uploaded_file, tmp_file)
                             tmp_path = tmp_file.name
                         
                         # Carrega PDF com validação
-                        documento = carrega_pdf_web(tmp_path)
+                        # PDFs acima do orçamento da sessão vão para o disco durante a extração
+                        documento = carregar_com_progresso(obter_loaders().carregar_pdf_arquivo, tmp_path,
+                                                           limite_memoria=st.session_state.sessao.memoria_disponivel())
                         
                         if documento:
-                            st.session_state.documento = documento
-                            st.session_state.documento_carregado = True
-                            st.session_state.tipo_documento = "PDF"
-                            st.session_state.mensagens = []  # Limpa histórico
+                            adicionar_fonte(documento, "PDF", uploaded_file.name)
                             st.success(f"✓ PDF carregado! ({len(documento)} caracteres)")
                             
                             # Remove arquivo temporário
@@ -313,12 +295,9 @@ with st.sidebar:
             if url_youtube:
                 with st.spinner("Carregando transcrição do YouTube..."):
                     try:
-                        documento = carrega_youtube_web(url_youtube)
+                        documento = carregar_com_progresso(obter_loaders().carregar_youtube_url, url_youtube)
                         if documento:
-                            st.session_state.documento = documento
-                            st.session_state.documento_carregado = True
-                            st.session_state.tipo_documento = "YouTube"
-                            st.session_state.mensagens = []  # Limpa histórico
+                            adicionar_fonte(documento, "YouTube", url_youtube)
                             st.success(f"✓ Transcrição carregada! ({len(documento)} caracteres)")
                             st.rerun()
                         else:
@@ -328,39 +307,122 @@ with st.sidebar:
             else:
                 st.warning("Por favor, digite uma URL válida do YouTube.")
     
+    st.checkbox(
+        "Pré-gerar resumos do documento",
+        value=RESUMOS_ATIVOS,
+        key="gerar_resumos",
+        help="Após o carregamento, gera em segundo plano resumos do documento usados em perguntas de visão geral."
+    )
+    
+    # Fontes da conversa, com o estado dos resumos de cada uma
+    fontes = st.session_state.sessao.fontes
+    if fontes:
+        st.markdown("---")
+        st.subheader("📚 Fontes da conversa")
+    for posicao, fonte in enumerate(fontes):
+        coluna_fonte, coluna_remover = st.columns([5, 1])
+        coluna_fonte.caption(f"**{fonte.tipo}** {fonte.origem} ({len(fonte):,} caracteres)")
+        if fonte.resumos is not None:
+            if fonte.resumos.pronta:
+                coluna_fonte.caption("✓ Resumos prontos")
+            elif fonte.resumos.erro:
+                coluna_fonte.caption("⚠️ Não foi possível gerar os resumos")
+            else:
+                coluna_fonte.caption("⏳ Gerando resumos...")
+        if coluna_remover.button("✖", key=f"remover_fonte_{id(fonte)}", help="Remover esta fonte"):
+            st.session_state.sessao.remover(posicao)
+            st.rerun()
+    
+    if len(obter_pacotes()) > sum(fonte.tipo == 'pacote' for fonte in fontes):
+        if st.button("📦 Usar pacotes de conhecimento", use_container_width=True):
+            adicionar_pacotes()
+            st.rerun()
+    
     st.markdown("---")
     if st.button("🔄 Limpar Conversa", use_container_width=True):
-        st.session_state.mensagens = []
+        limpar_conversa()
         st.rerun()
     
-    if st.button("📋 Limpar Documento", use_container_width=True):
-        st.session_state.documento = None
-        st.session_state.documento_carregado = False
-        st.session_state.tipo_documento = None
-        st.session_state.mensagens = []
+    if st.button("📋 Limpar Documentos", use_container_width=True):
+        st.session_state.sessao.limpar()
+        limpar_conversa()
         st.rerun()
+    
+    # Latência, tokens e custo por estágio (todas as sessões deste servidor)
+    relatorio_modelos = roteador.relatorio()
+    if relatorio_modelos:
+        with st.expander("📊 Uso do modelo por estágio"):
+            st.dataframe(
+                [{'estágio': estagio, **{k: v for k, v in dados.items() if k != 'modelos'},
+                  'modelos': ', '.join(f"{m} ({n})" for m, n in dados['modelos'].items())}
+                 for estagio, dados in relatorio_modelos.items()],
+                use_container_width=True
+            )
+    
+    # Perfil por amostragem da última carga ou turno (diagnóstico)
+    with st.expander("🔬 Perfil"):
+        st.checkbox("Perfilar cargas e turnos", key="perfilar",
+                    help="Amostra a pilha a cada poucos milissegundos e grava as pilhas colapsadas")
+        perfil = st.session_state.ultimo_perfil
+        if perfil:
+            st.caption(f"'{perfil.nome}': {perfil.amostras} amostras em {perfil.segundos:.2f}s")
+            st.dataframe(
+                [{'função': linha['funcao'], 'próprio %': round(linha['proprio'], 1),
+                  'total %': round(linha['total'], 1)} for linha in perfil.resumo()],
+                use_container_width=True
+            )
+            if perfil.caminho:
+                st.caption(f"Pilhas colapsadas em `{perfil.caminho}`")
 
-# Área principal - Status do documento
-if st.session_state.documento_carregado:
-    st.success(f"📄 Documento carregado: **{st.session_state.tipo_documento}** ({len(st.session_state.documento)} caracteres)")
+# Área principal - Status dos documentos
+if st.session_state.sessao.fontes:
+    fontes = st.session_state.sessao.fontes
+    if len(fontes) == 1:
+        st.success(f"📄 Documento carregado: **{fontes[0].tipo}** ({len(fontes[0])} caracteres)")
+    else:
+        st.success(f"📚 {len(fontes)} documentos carregados: "
+                   + ', '.join(f"**{fonte.tipo}**" for fonte in fontes)
+                   + f" ({len(st.session_state.sessao)} caracteres no total)")
+    for fonte in fontes:
+        if fonte.tipo == 'pacote':
+            st.caption(descrever_pacote(fonte.documento.pacote))
+        elif descrever_armazenamento(fonte.documento):
+            st.caption(descrever_armazenamento(fonte.documento))
     st.markdown("---")
 else:
     st.info("👈 Use a barra lateral para carregar um documento (Site, PDF ou YouTube)")
     st.markdown("---")
 
-# Área de chat
-if st.session_state.documento_carregado:
-    # Exibe histórico de mensagens
-    for mensagem in st.session_state.mensagens:
-        role = mensagem['role']
-        content = mensagem['content']
-        
-        if role == 'user':
-            with st.chat_message("user"):
-                st.markdown(content)
-        else:
-            with st.chat_message("assistant"):
-                st.markdown(content)
+
+def exibir_historico():
+    """
+    Exibe apenas a janela mais recente do histórico.
+    
+    Mensagens mais antigas ficam ocultas atrás de um botão de paginação,
+    mantendo constante o custo de renderização de cada nova pergunta.
+    """
+    mensagens = st.session_state.mensagens
+    inicio = max(0, len(mensagens) - st.session_state.janela_historico)
+    
+    if inicio > 0:
+        if st.button(f"⬆️ Mostrar mensagens anteriores ({inicio} ocultas)", key="mostrar_anteriores"):
+            st.session_state.janela_historico += JANELA_HISTORICO
+            st.rerun(scope="fragment")
+    
+    for mensagem in mensagens[inicio:]:
+        with st.chat_message(mensagem['role']):
+            st.markdown(mensagem['content'])
+
+
+@st.fragment
+def area_chat():
+    """
+    Área de chat executada como fragmento.
+    
+    Cada pergunta reexecuta apenas este trecho da página: CSS, cabeçalho e
+    barra lateral não são reconstruídos durante a conversa.
+    """
+    exibir_historico()
     
     # Input do usuário
     pergunta = st.chat_input("Digite sua pergunta sobre o documento...")
@@ -381,23 +443,29 @@ if st.session_state.documento_carregado:
         else:
             # Adiciona ao histórico
             st.session_state.mensagens.append({'role': 'user', 'content': pergunta_sanitizada})
-            
-            # Prepara mensagens no formato esperado pelo bot
-            mensagens_bot = []
-            for msg in st.session_state.mensagens:
-                if msg['role'] in ['user', 'assistant']:
-                    mensagens_bot.append((msg['role'], msg['content']))
+            st.session_state.mensagens_bot.append(('user', pergunta_sanitizada))
             
             # Gera resposta do bot
             with st.spinner("NandaBot está pensando..."):
                 try:
                     # Verifica tamanho do documento e avisa se foi truncado
-                    tamanho_original = len(st.session_state.documento)
-                    resposta = resposta_bot(mensagens_bot, st.session_state.documento)
+                    sessao = st.session_state.sessao
+                    tamanho_original = len(sessao)
+                    with perfilador.perfilar('turno', ativo=st.session_state.perfilar, novas_threads=True) as perfil:
+                        resposta = resposta_bot(
+                            st.session_state.mensagens_bot,
+                            sessao,
+                            indice=sessao,
+                            arvore=sessao.arvore
+                        )
+                    if perfil:
+                        st.session_state.ultimo_perfil = perfil
                     
                     # Se o documento original era muito grande, avisa o usuário
-                    if tamanho_original > 60000:
-                        st.info(f"ℹ️ Documento grande ({tamanho_original:,} caracteres). Apenas as primeiras páginas foram usadas para esta resposta.")
+                    if precisa_documento_inteiro(pergunta_sanitizada, sessao):
+                        st.info(f"ℹ️ Documento grande ({tamanho_original:,} caracteres). O documento inteiro foi analisado em partes (modo map-reduce).")
+                    elif tamanho_original > MAX_CARACTERES_CONTEXTO:
+                        st.info(f"ℹ️ Documento grande ({tamanho_original:,} caracteres). Apenas os trechos mais relevantes para a pergunta foram usados nesta resposta.")
                     
                     # Valida resposta do bot
                     seguro_resposta, resposta_final = validar_resposta_saida(resposta)
@@ -409,6 +477,7 @@ if st.session_state.documento_carregado:
                     # Adiciona resposta ao histórico se for segura
                     if seguro_resposta:
                         st.session_state.mensagens.append({'role': 'assistant', 'content': resposta_final})
+                        st.session_state.mensagens_bot.append(('assistant', resposta_final))
                     
                 except Exception as e:
                     with st.chat_message("assistant"):
@@ -416,6 +485,12 @@ if st.session_state.documento_carregado:
                     # Remove última mensagem em caso de erro
                     if st.session_state.mensagens:
                         st.session_state.mensagens.pop()
+                        st.session_state.mensagens_bot.pop()
+
+
+# Área de chat
+if st.session_state.sessao.fontes:
+    area_chat()
 
 # Footer
 st.markdown("---")
@@ -425,4 +500,3 @@ st.markdown(
     "</div>",
     unsafe_allow_html=True
 )
-
@@ -0,0 +1,299 @@
+"""
+Módulo de transcrições do YouTube
+Lista as legendas uma única vez, escolhe a melhor faixa e busca apenas ela,
+com cache em disco por vídeo/idioma
+"""
+
+import os
+import json
+import tempfile
+from pathlib import Path
+from typing import Optional, List, Tuple
+from metricas import contar
+
+
+# Idiomas preferidos, em ordem de prioridade
+IDIOMAS_PREFERIDOS = ['pt', 'pt-BR']
+
+# Duração padrão (segundos) de cada trecho do documento gerado
+DURACAO_JANELA = 120
+
+# Diretório do cache em disco (pode ser alterado por variável de ambiente)
+DIRETORIO_CACHE = Path(os.getenv('NANDABOT_CACHE_DIR', Path(__file__).parent / '.cache')) / 'transcricoes'
+
+
+def escolher_transcricao(transcricoes, idiomas: Optional[List[str]] = None):
+    """
+    Escolhe a melhor faixa de legenda a partir da lista já obtida.
+
+    Ordem de preferência: idiomas preferidos (legenda manual antes da
+    automática), depois qualquer legenda manual, depois qualquer automática.
+
+    Args:
+        transcricoes: Faixas retornadas pela listagem da API
+        idiomas: Códigos de idioma em ordem de prioridade
+
+    Returns:
+        Faixa escolhida ou None se a lista estiver vazia
+    """
+    idiomas = idiomas or IDIOMAS_PREFERIDOS
+    faixas = list(transcricoes)
+
+    if not faixas:
+        return None
+
+    # Manuais primeiro, mantendo a ordem original em caso de empate
+    faixas.sort(key=lambda t: bool(getattr(t, 'is_generated', False)))
+
+    for idioma in idiomas:
+        for faixa in faixas:
+            if faixa.language_code == idioma:
+                return faixa
+
+    return faixas[0]
+
+
+def _listar(api, video_id):
+    """Lista as legendas do vídeo (compatível com as versões 0.x e 1.x da API)."""
+    if hasattr(api, 'list_transcripts'):
+        return api.list_transcripts(video_id)
+    return api.list(video_id)
+
+
+def _normalizar_segmentos(dados) -> List[dict]:
+    """Converte o retorno de fetch() em uma lista de dicts text/start/duration."""
+    if hasattr(dados, 'to_raw_data'):
+        dados = dados.to_raw_data()
+
+    segmentos = []
+    for item in dados:
+        if not isinstance(item, dict):
+            item = {'text': item.text, 'start': item.start, 'duration': item.duration}
+        segmentos.append({
+            'text': item['text'],
+            'start': float(item.get('start', 0.0)),
+            'duration': float(item.get('duration', 0.0)),
+        })
+    return segmentos
+
+
+def _caminho_cache(diretorio: Path, video_id: str, idioma: str) -> Path:
+    return diretorio / f"{video_id}.{idioma}.json"
+
+
+def _codigos_disponiveis(transcricao: dict) -> List[str]:
+    """Códigos das legendas disponíveis na busca (idiomas_disponiveis tem o formato 'Nome (código)')."""
+    return [item.rsplit('(', 1)[-1].rstrip(')') for item in transcricao.get('idiomas_disponiveis', [])]
+
+
+def ler_cache(video_id: str, idiomas: Optional[List[str]] = None, diretorio: Path = DIRETORIO_CACHE) -> Optional[dict]:
+    """
+    Procura uma transcrição já salva em disco.
+
+    Procura primeiro pelos idiomas preferidos; se nenhum existir, aceita outra
+    faixa salva para o vídeo apenas se nenhum dos idiomas pedidos estava entre
+    as legendas disponíveis quando ela foi buscada (senão é preciso buscar a
+    faixa pedida na API).
+
+    Args:
+        video_id: ID do vídeo
+        idiomas: Códigos de idioma em ordem de prioridade
+        diretorio: Diretório do cache
+
+    Returns:
+        Optional[dict]: Transcrição salva ou None
+    """
+    idiomas = idiomas or IDIOMAS_PREFERIDOS
+    preferidos = [_caminho_cache(diretorio, video_id, idioma) for idioma in idiomas]
+    outros = sorted(diretorio.glob(f"{video_id}.*.json")) if diretorio.exists() else []
+
+    for caminho in preferidos + [caminho for caminho in outros if caminho not in preferidos]:
+        try:
+            with open(caminho, 'r', encoding='utf-8') as f:
+                transcricao = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue
+        if caminho in preferidos or not set(idiomas) & set(_codigos_disponiveis(transcricao)):
+            return transcricao
+
+    return None
+
+
+def salvar_cache(transcricao: dict, diretorio: Path = DIRETORIO_CACHE):
+    """
+    Grava a transcrição no cache de forma atômica (arquivo temporário + rename).
+
+    Args:
+        transcricao: Transcrição retornada por buscar_transcricao
+        diretorio: Diretório do cache
+    """
+    diretorio.mkdir(parents=True, exist_ok=True)
+    destino = _caminho_cache(diretorio, transcricao['video_id'], transcricao['idioma'])
+
+    fd, temporario = tempfile.mkstemp(dir=diretorio, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(transcricao, f, ensure_ascii=False)
+        os.replace(temporario, destino)
+    except Exception:
+        if os.path.exists(temporario):
+            os.unlink(temporario)
+        raise
+
+
+def buscar_transcricao(video_id: str, idiomas: Optional[List[str]] = None, api=None,
+                       diretorio_cache: Optional[Path] = DIRETORIO_CACHE) -> dict:
+    """
+    Obtém a transcrição de um vídeo com no máximo duas requisições à API.
+
+    Faz uma única listagem, escolhe a faixa e busca apenas ela. O resultado
+    é salvo em disco; chamadas seguintes para o mesmo vídeo não acessam a rede.
+
+    Args:
+        video_id: ID do vídeo do YouTube
+        idiomas: Códigos de idioma em ordem de prioridade (padrão: pt, pt-BR)
+        api: Implementação da API (padrão: YouTubeTranscriptApi). Qualquer objeto
+             com list()/list_transcripts() serve, ex.: ApiTranscricoesLocal
+        diretorio_cache: Diretório do cache (None desativa o cache)
+
+    Returns:
+        dict: video_id, idioma, nome_idioma, gerada, idiomas_disponiveis, segmentos
+
+    Raises:
+        ValueError: Se o vídeo não possuir nenhuma legenda
+    """
+    idiomas = idiomas or IDIOMAS_PREFERIDOS
+
+    if diretorio_cache is not None:
+        transcricao = ler_cache(video_id, idiomas, diretorio_cache)
+        contar('nandabot_cache_total', cache='transcricoes', resultado='acerto' if transcricao else 'falha')
+        if transcricao is not None:
+            transcricao['cache'] = True
+            return transcricao
+
+    if api is None:
+        from youtube_transcript_api import YouTubeTranscriptApi
+        api = YouTubeTranscriptApi()
+
+    faixas = list(_listar(api, video_id))
+    faixa = escolher_transcricao(faixas, idiomas)
+    if faixa is None:
+        raise ValueError("O vídeo não possui legendas disponíveis.")
+
+    transcricao = {
+        'video_id': video_id,
+        'idioma': faixa.language_code,
+        'nome_idioma': faixa.language,
+        'gerada': bool(getattr(faixa, 'is_generated', False)),
+        'idiomas_disponiveis': [f"{t.language} ({t.language_code})" for t in faixas],
+        'segmentos': _normalizar_segmentos(faixa.fetch()),
+    }
+
+    if diretorio_cache is not None:
+        try:
+            salvar_cache(transcricao, diretorio_cache)
+        except OSError as e:
+            print(f"⚠️ Aviso: Não foi possível salvar a transcrição em cache: {e}")
+
+    transcricao['cache'] = False
+    return transcricao
+
+
+def formatar_tempo(segundos: float) -> str:
+    """Formata segundos como HH:MM:SS."""
+    segundos = int(segundos)
+    return f"{segundos // 3600:02d}:{segundos % 3600 // 60:02d}:{segundos % 60:02d}"
+
+
+def agrupar_em_janelas(segmentos: List[dict], duracao_janela: float = DURACAO_JANELA) -> List[Tuple[float, float, str]]:
+    """
+    Agrupa os segmentos da transcrição em janelas de tempo.
+
+    Cada segmento pertence inteiro a uma única janela; uma nova janela começa
+    quando o segmento ultrapassaria a duração da janela atual.
+
+    Args:
+        segmentos: Segmentos com text/start/duration
+        duracao_janela: Duração aproximada de cada janela em segundos
+
+    Returns:
+        List[Tuple[float, float, str]]: (início, fim, texto) de cada janela
+    """
+    janelas = []
+    textos = []
+    inicio = fim = None
+
+    for segmento in segmentos:
+        texto = segmento['text'].replace('\n', ' ').strip()
+        if not texto:
+            continue
+
+        if inicio is not None and segmento['start'] - inicio >= duracao_janela:
+            janelas.append((inicio, fim, ' '.join(textos)))
+            textos = []
+            inicio = None
+
+        if inicio is None:
+            inicio = segmento['start']
+        fim = segmento['start'] + segmento['duration']
+        textos.append(texto)
+
+    if textos:
+        janelas.append((inicio, fim, ' '.join(textos)))
+
+    return janelas
+
+
+def transcricao_para_documento(transcricao: dict, duracao_janela: float = DURACAO_JANELA) -> str:
+    """
+    Gera o documento do bot com um trecho "=== TRECHO: [início - fim] ===" por janela.
+
+    Args:
+        transcricao: Transcrição retornada por buscar_transcricao
+        duracao_janela: Duração aproximada de cada trecho em segundos
+
+    Returns:
+        str: Documento com marcadores de tempo
+    """
+    documento = ''
+    for inicio, fim, texto in agrupar_em_janelas(transcricao['segmentos'], duracao_janela):
+        documento += f"\n\n=== TRECHO: [{formatar_tempo(inicio)} - {formatar_tempo(fim)}] ===\n\n"
+        documento += texto + '\n'
+    return documento
+
+
+class _FaixaLocal:
+    """Faixa de legenda da API local (mesmos atributos da API real)."""
+
+    def __init__(self, api, dados):
+        self._api = api
+        self.language_code = dados['idioma']
+        self.language = dados.get('nome', dados['idioma'])
+        self.is_generated = dados.get('gerada', False)
+        self._segmentos = dados['segmentos']
+
+    def fetch(self):
+        self._api.buscas += 1
+        return list(self._segmentos)
+
+
+class ApiTranscricoesLocal:
+    """
+    Substituto local da API do YouTube, sem acesso à rede.
+
+    Útil para testes e benchmarks: conta as listagens e buscas realizadas.
+
+    Args:
+        transcricoes: {video_id: [{'idioma', 'nome', 'gerada', 'segmentos'}, ...]}
+    """
+
+    def __init__(self, transcricoes: dict):
+        self.transcricoes = transcricoes
+        self.listagens = 0
+        self.buscas = 0
+
+    def list(self, video_id):
+        self.listagens += 1
+        if video_id not in self.transcricoes:
+            raise ValueError(f"Vídeo não encontrado: {video_id}")
+        return [_FaixaLocal(self, dados) for dados in self.transcricoes[video_id]]